@@ -0,0 +1,247 @@
+"""
+Autocomplete for the reference and translation options of /bible and /bibel.
+
+Discord asks for suggestions on every keystroke and gives up after a few
+seconds, so suggestions come only from indexes in memory, never from the
+network:
+
+    references      book aliases of every language (book_mappings), sorted for
+                    prefix lookups with bisect, shown with the book name of the
+                    command's language; chapter and verse hints from the canon table
+    translations    the codes in TRANSLATION_MAPPINGS, plus the translations of
+                    the API.Bible catalog once it has been loaded for another
+                    reason (e.g., /bible-list), grouped by language
+
+The translation index is rebuilt when a catalog is indexed; lookups only read it.
+"""
+
+import re
+from bisect import bisect_left
+from bible_api import CATALOG_CACHE, DISPLAY_NAMES, SHARED_CACHE, TRANSLATION_MAPPINGS
+from book_mappings import BOOK_ALIASES, BOOK_DISPLAY_NAMES
+from canon import BOOK_ORDER, chapter_count, verse_count
+
+# Most suggestions Discord shows for an option
+MAX_CHOICES = 25
+
+# Longest name and value Discord accepts for a suggestion
+MAX_CHOICE_LENGTH = 100
+
+# Separator between chapter and verse in suggestions, per language
+VERSE_SEPARATORS = {'en': ':', 'de': ','}
+
+# Catalog language codes (ISO 639-3) of the command languages
+CATALOG_LANGUAGES = {'en': 'eng', 'de': 'deu'}
+
+# Partial reference: book (with an optional number like "1." or "2 "), chapter, separator and verse
+_PARTIAL_REFERENCE = re.compile( r'^(?P<book>(?:[1-5]\.?\s*)?[^\d:,]*?)\s*(?:(?P<chapter>\d+)(?:(?P<sep>[:,])(?P<verse>\d*))?)?$' )
+
+_BOOK_POSITIONS = {book: position for position, book in enumerate( BOOK_ORDER )}
+
+# Lowercase aliases and their books, sorted for prefix lookups
+_ALIAS_KEYS = sorted( BOOK_ALIASES )
+_ALIAS_BOOKS = [BOOK_ALIASES[alias] for alias in _ALIAS_KEYS]
+
+
+def _normalize( text ):
+    """
+    Lowercases text and collapses whitespace, as the alias keys are stored.
+    """
+    return ' '.join( text.lower().split() )
+
+
+def book_name( book, language ):
+    """
+    Name of a book in a language, or the English name if the language has none.
+    """
+    return BOOK_DISPLAY_NAMES.get( language, {} ).get( book, book )
+
+
+def matching_books( prefix, limit=MAX_CHOICES ):
+    """
+    Books with an alias starting with a prefix, in canonical order.
+
+    Args:
+        prefix: What the user typed of the book name
+        limit: Most books returned
+
+    Returns:
+        A list of English book names
+    """
+    key = _normalize( prefix )
+    if not key:
+        return BOOK_ORDER[:limit]
+
+    found = set()
+    index = bisect_left( _ALIAS_KEYS, key )
+
+    while index < len( _ALIAS_KEYS ) and _ALIAS_KEYS[index].startswith( key ):
+        found.add( _ALIAS_BOOKS[index] )
+        index += 1
+
+    return sorted( found, key=_BOOK_POSITIONS.get )[:limit]
+
+
+def _numbers( typed, count, limit ):
+    """
+    Numbers from 1 to count starting with the typed digits (all of them if nothing is typed).
+    """
+    return [number for number in range( 1, count + 1 ) if str( number ).startswith( typed )][:limit]
+
+
+def suggest_references( value, language='en', limit=MAX_CHOICES ):
+    """
+    Suggestions for a partly typed reference option.
+
+    Only the last reference of a list (e.g., "Gen 1:1; John 3") is completed;
+    the ones before it are kept as typed.
+
+    Args:
+        value: The option's current text
+        language: 'en' or 'de'; chooses book names and the verse separator
+        limit: Most suggestions returned
+
+    Returns:
+        A list of reference strings
+    """
+    head, _, last = ( value or '' ).rpartition( ';' )
+    head = f"{head.strip()}; " if head.strip() else ''
+
+    match = _PARTIAL_REFERENCE.match( last.strip() )
+    if match is None:
+        return []
+
+    typed_book, chapter, separator, verse = match.group( 'book', 'chapter', 'sep', 'verse' )
+    book = BOOK_ALIASES.get( _normalize( typed_book ) )
+
+    if chapter is None:
+        # Books starting with the text, the one it already names first, then that book's chapters
+        books = matching_books( typed_book, limit )
+        if book is not None:
+            books = [book] + [other for other in books if other != book]
+            hints = [f"{book_name( book, language )} {number}" for number in _numbers( '', chapter_count( book ), limit )]
+        else:
+            hints = []
+        suggestions = [book_name( other, language ) for other in books] + hints
+
+    elif book is None:
+        return []
+
+    elif separator is None:
+        name = book_name( book, language )
+        suggestions = [f"{name} {number}" for number in _numbers( chapter, chapter_count( book ), limit )]
+
+    else:
+        name = book_name( book, language )
+        chapter = int( chapter )
+        separator = VERSE_SEPARATORS.get( language, separator ) if not verse else separator
+        suggestions = [
+            f"{name} {chapter}{separator}{number}" for number in _numbers( verse, verse_count( book, chapter ), limit )
+        ]
+
+    return [f"{head}{suggestion}" for suggestion in suggestions if len( head ) + len( suggestion ) <= MAX_CHOICE_LENGTH][:limit]
+
+
+class TranslationIndex:
+    """
+    Translations that can be suggested, grouped by command language.
+    """
+
+    def __init__( self ):
+        """
+        Initialize with the codes of TRANSLATION_MAPPINGS.
+        """
+        self._index = {}
+        self.index_catalog( [] )
+
+    def index_catalog( self, bibles ):
+        """
+        Rebuilds the index from the translation codes and a catalog.
+
+        Args:
+            bibles: Bible dictionaries from BibleAPI.get_available_bibles(), may be empty
+        """
+        german_id = TRANSLATION_MAPPINGS['DEFAULT_GERMAN']
+        entries = {language: [] for language in CATALOG_LANGUAGES}
+        seen = set()
+
+        for code, bible_id in TRANSLATION_MAPPINGS.items():
+            if code.startswith( 'DEFAULT_' ):
+                continue
+
+            language = 'de' if bible_id == german_id else 'en'
+            display = DISPLAY_NAMES.get( bible_id, code )
+            name = code if display.upper() == code else f"{code} ({display})"
+            entries[language].append( ( code.lower(), name.lower(), name, code ) )
+            seen.add( bible_id )
+
+        for bible in bibles:
+            bible_id = bible.get( 'id' )
+            catalog_language = ( bible.get( 'language' ) or {} ).get( 'id' )
+
+            for language, code in CATALOG_LANGUAGES.items():
+                if catalog_language != code or not bible_id or bible_id in seen:
+                    continue
+
+                abbreviation = bible.get( 'abbreviationLocal' ) or bible.get( 'abbreviation' ) or bible_id
+                name = f"{abbreviation} - {bible.get( 'name', '' )}".strip( ' -' )[:MAX_CHOICE_LENGTH]
+                entries[language].append( ( abbreviation.lower(), name.lower(), name, bible_id ) )
+                seen.add( bible_id )
+
+        # Sorted by code for prefix lookups with bisect; swapped in whole, so lookups never see a half-built index
+        index = {}
+        for language, language_entries in entries.items():
+            language_entries.sort()
+            index[language] = ( [entry[0] for entry in language_entries], language_entries )
+        self._index = index
+
+    def suggest( self, value, language='en', limit=MAX_CHOICES ):
+        """
+        Suggestions for a partly typed translation option.
+
+        Codes starting with the text come first, then translations whose name contains it.
+
+        Args:
+            value: The option's current text
+            language: 'en' or 'de'
+            limit: Most suggestions returned
+
+        Returns:
+            A list of (name, value) pairs; the value is a code or a Bible ID
+        """
+        typed = _normalize( value or '' )
+        keys, entries = self._index.get( language, ( [], [] ) )
+
+        prefixed = []
+        index = bisect_left( keys, typed )
+        while index < len( keys ) and keys[index].startswith( typed ) and len( prefixed ) < limit:
+            prefixed.append( entries[index][2:] )
+            index += 1
+
+        if len( prefixed ) >= limit:
+            return prefixed
+
+        contained = [( name, code ) for key, text, name, code in entries if typed in text and not key.startswith( typed )]
+        return ( prefixed + contained )[:limit]
+
+    def __len__( self ):
+        return sum( len( entries ) for _, entries in self._index.values() )
+
+
+def cached_catalog():
+    """
+    The translation catalog if this process or another one has loaded it already; never fetches it.
+
+    Returns:
+        A list of Bible dictionaries, empty if no catalog is cached
+    """
+    bibles = CATALOG_CACHE.get( 'bibles' )
+
+    if not bibles and SHARED_CACHE is not None:
+        bibles = SHARED_CACHE.get( 'catalog:bibles' )
+
+    return bibles or []
+
+
+# Translations suggested by the translation options
+TRANSLATION_INDEX = TranslationIndex()
@@ -0,0 +1,95 @@
+"""
+Benchmark for the autocomplete handlers of /bible and /bibel.
+
+Replays what users type key by key into the reference and translation
+options and reports the time per suggestion list. Discord sends one request
+per keystroke, so every answer should take well under a millisecond. The
+translation index is measured with the codes alone and with a synthetic
+catalog the size of API.Bible's.
+
+No API key or Discord connection required.
+Run with: python bench_autocomplete.py
+"""
+
+import time
+from autocomplete import TRANSLATION_INDEX, suggest_references
+
+# Inputs as they are finally typed; every prefix is measured
+ENGLISH_INPUTS = ["John 3:16", "Gen 1:1", "1 Cor 13:4", "Psalm 119:105", "Rom 8:28; Phil 4:13", "Revelation 21:4"]
+GERMAN_INPUTS = ["Johannes 3,16", "1. Mose 1,1", "1 Kor 13,4", "Psalm 119,105", "Röm 8,28; Phil 4,13", "Offenbarung 21,4"]
+TRANSLATION_INPUTS = ["KJV", "BSB", "Luther", "Elberfelder", "King James", "Bible"]
+
+# Size of the synthetic catalog (API.Bible lists a few thousand translations)
+CATALOG_SIZE = 2500
+
+
+def keystrokes( inputs ):
+    """
+    Every prefix of every input, as sent by Discord while typing.
+    """
+    return [text[:length] for text in inputs for length in range( len( text ) + 1 )]
+
+
+def synthetic_catalog( size ):
+    """
+    A catalog shaped like BibleAPI.get_available_bibles(), mostly in other languages.
+    """
+    languages = ['eng', 'deu', 'spa', 'fra', 'por', 'swh', 'hin', 'zho']
+    return [
+        {
+            'id': f"{number:016x}-01",
+            'abbreviation': f"B{number}",
+            'name': f"Bible Translation {number}",
+            'language': {'id': languages[number % len( languages )]}
+        }
+        for number in range( size )
+    ]
+
+
+def measure( name, func, inputs, rounds ):
+    """
+    Calls a function on every input for several rounds and prints the time per call.
+    """
+    start = time.perf_counter()
+    worst = 0.0
+
+    for _ in range( rounds ):
+        for text in inputs:
+            began = time.perf_counter()
+            func( text )
+            worst = max( worst, time.perf_counter() - began )
+
+    elapsed = time.perf_counter() - start
+    count = rounds * len( inputs )
+
+    print( f"{name:<40} {elapsed / count * 1_000_000:8.2f} µs/call   worst {worst * 1_000_000:8.2f} µs" )
+
+
+def main():
+    """
+    Runs the autocomplete benchmark.
+    """
+    rounds = 200
+    english = keystrokes( ENGLISH_INPUTS )
+    german = keystrokes( GERMAN_INPUTS )
+    translations = keystrokes( TRANSLATION_INPUTS )
+
+    print( "=" * 80 )
+    print( f"Autocomplete ({len( english ) + len( german )} reference and {len( translations )} translation keystrokes)" )
+    print( "=" * 80 )
+
+    measure( "references (English)", lambda text: suggest_references( text, 'en' ), english, rounds )
+    measure( "references (German)", lambda text: suggest_references( text, 'de' ), german, rounds )
+
+    TRANSLATION_INDEX.index_catalog( [] )
+    measure( f"translations ({len( TRANSLATION_INDEX )} codes)", lambda text: TRANSLATION_INDEX.suggest( text, 'en' ), translations, rounds )
+
+    start = time.perf_counter()
+    TRANSLATION_INDEX.index_catalog( synthetic_catalog( CATALOG_SIZE ) )
+    print( f"{f'index {CATALOG_SIZE:,} catalog entries':<40} {( time.perf_counter() - start ) * 1000:8.2f} ms" )
+
+    measure( f"translations ({len( TRANSLATION_INDEX )} indexed)", lambda text: TRANSLATION_INDEX.suggest( text, 'en' ), translations, rounds )
+
+
+if __name__ == '__main__':
+    main()
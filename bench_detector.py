@@ -0,0 +1,98 @@
+"""
+Benchmark for passive reference detection in chat messages.
+Measures how many messages per second find_references() can handle.
+
+No API key or Discord connection required.
+Run with: python bench_detector.py
+"""
+
+import random
+import time
+from reference_detector import find_references, might_contain_reference
+
+# Typical chat lines without references (including times and numbers)
+ORDINARY_MESSAGES = [
+    "good morning everyone!",
+    "anyone up for the study group tonight?",
+    "meeting moved to 5:30, see you there",
+    "Hat jemand Lust, heute Abend zu kommen?",
+    "Ich bin um 19:30 da",
+    "lol that was great",
+    "can you send me the link again",
+    "Danke, bis später 👋",
+    "the score was 3,2 in the end",
+    "I read chapter 12 of the book yesterday",
+    "Wir treffen uns am 5. Mai",
+    "prayer request: my grandmother is in hospital",
+]
+
+# Chat lines that mention references
+REFERENCE_MESSAGES = [
+    "as Paul says in Röm 8,28, everything works together for good",
+    "my favourite verse is John 3:16",
+    "lies mal 1. Mose 1,1-3 und Joh 3,16",
+    "Psalm 23:1 always comforts me",
+    "see Gen 1:1, 1 John 4:8 and Rev 21:4",
+]
+
+
+def build_corpus( size, reference_ratio=0.05, seed=42 ):
+    """
+    Builds a random corpus of chat messages.
+
+    Args:
+        size: Number of messages
+        reference_ratio: Share of messages that contain a reference
+        seed: Random seed for repeatable results
+
+    Returns:
+        A list of message strings
+    """
+    rng = random.Random( seed )
+    corpus = []
+
+    for _ in range( size ):
+        if rng.random() < reference_ratio:
+            corpus.append( rng.choice( REFERENCE_MESSAGES ) )
+        else:
+            corpus.append( rng.choice( ORDINARY_MESSAGES ) )
+
+    return corpus
+
+
+def measure( name, func, corpus ):
+    """
+    Runs a function over the corpus and prints messages per second.
+    """
+    start = time.perf_counter()
+    found = 0
+
+    for message in corpus:
+        if func( message ):
+            found += 1
+
+    elapsed = time.perf_counter() - start
+    rate = len( corpus ) / elapsed
+    per_message = elapsed / len( corpus ) * 1_000_000
+
+    print( f"{name:<28} {rate:>12,.0f} msg/s   {per_message:6.2f} µs/msg   ({found} matched)" )
+
+
+def main():
+    """
+    Runs the detection benchmark.
+    """
+    size = 200_000
+
+    print( "=" * 80 )
+    print( f"Passive reference detection ({size:,} messages)" )
+    print( "=" * 80 )
+
+    measure( "prefilter only", might_contain_reference, build_corpus( size ) )
+    measure( "full detection (5% refs)", find_references, build_corpus( size ) )
+    measure( "full detection (0% refs)", find_references, build_corpus( size, reference_ratio=0 ) )
+    measure( "full detection (100% refs)", find_references, build_corpus( size, reference_ratio=1 ) )
+
+
+if __name__ == '__main__':
+    main()
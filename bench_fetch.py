@@ -0,0 +1,130 @@
+"""
+Benchmark for fetching long passages in one request versus split into pieces.
+Runs against a local stand-in for API.Bible whose response time grows with
+the number of verses requested, like the real service under load.
+
+No API key or network access required.
+Run with: python bench_fetch.py
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import bible_api
+from book_mappings import get_book_id
+from canon import BOOK_ORDER, verse_count
+from reference_parser import parse_reference
+
+# Stand-in latency: fixed cost per request plus a cost per verse
+BASE_LATENCY = 0.030
+VERSE_LATENCY = 0.002
+
+PASSAGES = ["Ps 119", "Matt 5:3-7:12", "Gen 1-3", "1 Cor 13", "John 3:16"]
+
+_BOOKS_BY_ID = {get_book_id( book ): book for book in BOOK_ORDER}
+
+
+def _verses( api_ref ):
+    """
+    Lists the (chapter, verse) pairs of an API reference like "PSA.119.1-PSA.119.176".
+    """
+    first, _, last = api_ref.partition( '-' )
+    book_id, chapter, verse = first.split( '.' )
+    _, chapter_end, verse_end = ( last or first ).split( '.' )
+    book = _BOOKS_BY_ID[book_id]
+
+    chapter, verse, chapter_end, verse_end = int( chapter ), int( verse ), int( chapter_end ), int( verse_end )
+    verses = []
+
+    for current in range( chapter, chapter_end + 1 ):
+        start = verse if current == chapter else 1
+        end = verse_end if current == chapter_end else verse_count( book, current )
+        verses.extend( ( current, v ) for v in range( start, end + 1 ) )
+
+    return verses
+
+
+class StandInHandler( BaseHTTPRequestHandler ):
+    """
+    Answers /bibles/{id}/passages/{ref} like API.Bible, with size-dependent latency.
+    """
+
+    def do_GET( self ):
+        api_ref = self.path.split( '?' )[0].rsplit( '/', 1 )[-1]
+        verses = _verses( api_ref )
+
+        time.sleep( BASE_LATENCY + VERSE_LATENCY * len( verses ) )
+
+        book_id = api_ref.split( '.' )[0]
+        items = []
+        for chapter, verse in verses:
+            items.append( {'name': 'verse', 'type': 'tag', 'attrs': {'number': str( verse )}, 'items': []} )
+            items.append( {
+                'type': 'text',
+                'text': "Lorem ipsum dolor sit amet, consectetur adipiscing elit.",
+                'attrs': {'verseId': f"{book_id}.{chapter}.{verse}"}
+            } )
+
+        content = [{'name': 'para', 'type': 'tag', 'attrs': {'style': 'p'}, 'items': items}]
+        body = json.dumps( {'data': {'reference': api_ref, 'content': content}} ).encode( 'utf-8' )
+
+        self.send_response( 200 )
+        self.send_header( 'Content-Type', 'application/json' )
+        self.send_header( 'Content-Length', str( len( body ) ) )
+        self.end_headers()
+        self.wfile.write( body )
+
+    def log_message( self, format, *args ):
+        pass
+
+
+def measure( reference, split_verses, rounds ):
+    """
+    Fetches a passage with an empty cache several times and returns the median latency in ms.
+    A split_verses of 0 fetches every segment in a single request.
+    """
+    ref = parse_reference( reference )
+    timings = []
+
+    for _ in range( rounds ):
+        bible_api.PASSAGE_CACHE.clear()
+
+        start = time.perf_counter()
+        result = bible_api.fetch_verses( "bench-key", [ref], "BSB", split_verses=split_verses )[0]
+        timings.append( ( time.perf_counter() - start ) * 1000 )
+
+        if not result['success']:
+            raise RuntimeError( result['error'] )
+
+    return sorted( timings )[len( timings ) // 2]
+
+
+def main():
+    """
+    Runs the fetch benchmark.
+    """
+    server = ThreadingHTTPServer( ( '127.0.0.1', 0 ), StandInHandler )
+    threading.Thread( target=server.serve_forever, daemon=True ).start()
+    bible_api.API_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    rounds = 5
+
+    print( "=" * 80 )
+    print( f"Passage fetching against a local stand-in ({BASE_LATENCY * 1000:.0f} ms + {VERSE_LATENCY * 1000:.0f} ms/verse)" )
+    print( "=" * 80 )
+    print( f"{'passage':<16} {'single':>10} {'split 20':>10} {'split 40':>10} {'split 60':>10}" )
+
+    try:
+        for reference in PASSAGES:
+            single = measure( reference, 0, rounds )
+            split = [measure( reference, size, rounds ) for size in ( 20, 40, 60 )]
+            print( f"{reference:<16} {single:>8.0f}ms " + " ".join( f"{ms:>8.0f}ms" for ms in split ) )
+    finally:
+        server.shutdown()
+        bible_api.PASSAGE_CACHE.clear()
+
+
+if __name__ == '__main__':
+    main()
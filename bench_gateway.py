@@ -0,0 +1,263 @@
+"""
+Benchmark for the gateway profiles: startup time and memory per guild count.
+
+A local stand-in plays the part of the Discord gateway: it feeds READY, one
+GUILD_CREATE per guild and a round of traffic (component interactions,
+messages, typing, reactions) straight into the library's event parsers,
+sending only the events the profile's intents subscribe to, as Discord does.
+Each profile runs in its own process. Memory is reported as the Python
+heap still in use after the traffic round (what the caches keep), its peak,
+and the growth of resident memory.
+No Discord connection or token required.
+Run with: python bench_gateway.py [guild count]
+"""
+
+import asyncio
+import gc
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# Channels, roles, emojis and members per guild in the stand-in's GUILD_CREATE payloads
+CHANNELS_PER_GUILD = 20
+ROLES_PER_GUILD = 10
+EMOJIS_PER_GUILD = 10
+VOICE_MEMBERS_PER_GUILD = 3
+
+# Users per guild taking part in the traffic round
+ACTIVE_USERS_PER_GUILD = 20
+
+BOT_USER_ID = 1
+TIMESTAMP = "2024-01-01T00:00:00+00:00"
+
+# (profile, passive detection) combinations to compare
+VARIANTS = [
+    ( 'full', True ),
+    ( 'full', False ),
+    ( 'lean', True ),
+    ( 'lean', False ),
+]
+
+
+def rss_kb():
+    """
+    Current resident memory of this process in KiB (peak memory where /proc is unavailable).
+    """
+    try:
+        with open( '/proc/self/statm' ) as f:
+            return int( f.read().split()[1] ) * os.sysconf( 'SC_PAGE_SIZE' ) // 1024
+    except OSError:
+        return resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+
+
+def user_payload( user_id ):
+    return {'id': str( user_id ), 'username': f"user{user_id}", 'discriminator': '0', 'avatar': None, 'global_name': None}
+
+
+def member_payload( user_id ):
+    return {'user': user_payload( user_id ), 'roles': [], 'joined_at': TIMESTAMP, 'deaf': False, 'mute': False}
+
+
+def guild_payload( guild_id ):
+    """
+    Builds a GUILD_CREATE payload for a medium-sized guild.
+    """
+    base = guild_id * 1000
+    channels = [
+        {'id': str( base + i ), 'type': 0, 'name': f"channel-{i}", 'position': i, 'permission_overwrites': [], 'guild_id': str( guild_id )}
+        for i in range( CHANNELS_PER_GUILD )
+    ]
+    roles = [
+        {'id': str( guild_id if i == 0 else base + 100 + i ), 'name': f"role-{i}", 'permissions': '0', 'position': i,
+         'color': 0, 'colors': {'primary_color': 0, 'secondary_color': None, 'tertiary_color': None}, 'hoist': False, 'managed': False, 'mentionable': False}
+        for i in range( ROLES_PER_GUILD )
+    ]
+    emojis = [
+        {'id': str( base + 200 + i ), 'name': f"emoji{i}", 'animated': False, 'roles': [], 'require_colons': True,
+         'managed': False, 'available': True}
+        for i in range( EMOJIS_PER_GUILD )
+    ]
+    voice_members = [base + 300 + i for i in range( VOICE_MEMBERS_PER_GUILD )]
+
+    return {
+        'id': str( guild_id ),
+        'name': f"Guild {guild_id}",
+        'owner_id': str( base + 300 ),
+        'unavailable': False,
+        'large': False,
+        'member_count': 500,
+        'features': [],
+        'channels': channels,
+        'threads': [],
+        'roles': roles,
+        'emojis': emojis,
+        'stickers': [],
+        'members': [member_payload( BOT_USER_ID )] + [member_payload( user_id ) for user_id in voice_members],
+        'voice_states': [
+            {'user_id': str( user_id ), 'channel_id': str( base ), 'session_id': 'x', 'deaf': False, 'mute': False,
+             'self_deaf': False, 'self_mute': False, 'self_video': False, 'suppress': False, 'request_to_speak_timestamp': None}
+            for user_id in voice_members
+        ],
+        'presences': [],
+    }
+
+
+def traffic( guild_id, intents ):
+    """
+    Builds the events one guild produces in the traffic round, filtered by intents like the gateway does.
+    """
+    base = guild_id * 1000
+    events = []
+
+    for i in range( ACTIVE_USERS_PER_GUILD ):
+        user_id = base + 500 + i
+        channel_id = str( base + i % CHANNELS_PER_GUILD )
+        message_id = str( base * 1000 + i )
+
+        # Interactions arrive regardless of intents (a page turn on a message without a live view)
+        events.append( ( 'INTERACTION_CREATE', {
+            'id': str( base * 1000 + 500 + i ), 'application_id': str( BOT_USER_ID ), 'type': 3, 'token': 'x', 'version': 1,
+            'guild_id': str( guild_id ), 'channel_id': channel_id,
+            'member': dict( member_payload( user_id ), permissions='0' ),
+            'data': {'custom_id': 'stand-in', 'component_type': 2},
+        } ) )
+
+        if intents.guild_messages:
+            events.append( ( 'MESSAGE_CREATE', {
+                'id': message_id, 'channel_id': channel_id, 'guild_id': str( guild_id ),
+                'author': user_payload( user_id ), 'member': {'roles': [], 'joined_at': TIMESTAMP, 'deaf': False, 'mute': False},
+                'content': "As Paul says in Rom 8:28, all things work together" if intents.message_content else "",
+                'timestamp': TIMESTAMP, 'edited_timestamp': None, 'tts': False, 'mention_everyone': False,
+                'mentions': [], 'mention_roles': [], 'attachments': [], 'embeds': [], 'pinned': False, 'type': 0,
+            } ) )
+
+        if intents.guild_typing:
+            events.append( ( 'TYPING_START', {
+                'channel_id': channel_id, 'guild_id': str( guild_id ), 'user_id': str( user_id ),
+                'timestamp': 1700000000, 'member': member_payload( user_id ),
+            } ) )
+
+        if intents.guild_reactions:
+            events.append( ( 'MESSAGE_REACTION_ADD', {
+                'user_id': str( user_id ), 'channel_id': channel_id, 'message_id': message_id, 'guild_id': str( guild_id ),
+                'emoji': {'id': None, 'name': '🙏'}, 'member': member_payload( user_id ), 'burst': False, 'type': 0,
+            } ) )
+
+    return events
+
+
+async def run_profile( profile, passive, guild_count, trace ):
+    """
+    Feeds the stand-in gateway events into a bot with the given profile.
+
+    Returns:
+        Startup and traffic time in seconds, event count, resident memory growth
+        in KiB, cached members and messages, and (if traced) retained and peak
+        Python heap in bytes
+    """
+    import discord
+    from gateway_profile import client_options
+
+    gc.collect()
+    baseline = rss_kb()
+    if trace:
+        tracemalloc.start()
+
+    bot = discord.Bot( **client_options( profile, passive ) )
+
+    @bot.event
+    async def on_message( message ):
+        pass
+
+    # Replaces the command sync, which would need Discord's REST API
+    @bot.event
+    async def on_connect():
+        pass
+
+    state = bot._connection
+    parsers = state.parsers
+    intents = state._intents
+    guild_ids = range( 1, guild_count + 1 )
+
+    start = time.perf_counter()
+    parsers['READY']( {
+        'v': 10, 'user': dict( user_payload( BOT_USER_ID ), bot=True ), 'session_id': 'stand-in',
+        'guilds': [{'id': str( guild_id ), 'unavailable': True} for guild_id in guild_ids],
+        'application': {'id': str( BOT_USER_ID ), 'flags': 0},
+    } )
+    for guild_id in guild_ids:
+        parsers['GUILD_CREATE']( guild_payload( guild_id ) )
+    startup = time.perf_counter() - start
+
+    # Stop waiting for more guilds; the ready delay is the same for every profile
+    if state._ready_task:
+        state._ready_task.cancel()
+    del state._ready_state
+
+    event_count = 0
+    start = time.perf_counter()
+    for guild_id in guild_ids:
+        for event, data in traffic( guild_id, intents ):
+            parsers[event]( data )
+            event_count += 1
+
+        # Let the event handlers scheduled by dispatch() finish, as between gateway frames
+        while len( asyncio.all_tasks() ) > 1:
+            await asyncio.sleep( 0 )
+    traffic_time = time.perf_counter() - start
+
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory() if trace else ( 0, 0 )
+    members = sum( len( guild._members ) for guild in bot.guilds )
+    messages = len( state._messages ) if state._messages is not None else 0
+
+    return startup, traffic_time, event_count, rss_kb() - baseline, members, messages, retained, peak
+
+
+def measure( profile, passive, guild_count, trace ):
+    """
+    Runs one profile in a fresh process and returns its results.
+    """
+    output = subprocess.run(
+        [sys.executable, __file__, str( guild_count ), profile, 'on' if passive else 'off', 'trace' if trace else 'time'],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return [float( value ) for value in output.split()]
+
+
+def main():
+    """
+    Runs every profile in its own processes and prints a comparison table.
+    Times and resident memory come from an untraced run, heap sizes from a traced one.
+    """
+    guild_count = int( sys.argv[1] ) if len( sys.argv ) > 1 else 2000
+
+    if len( sys.argv ) > 4:
+        results = asyncio.run( run_profile( sys.argv[2], sys.argv[3] == 'on', guild_count, sys.argv[4] == 'trace' ) )
+        print( " ".join( str( value ) for value in results ) )
+        return
+
+    print( "=" * 104 )
+    print( f"Gateway profiles with {guild_count:,} guilds ({ACTIVE_USERS_PER_GUILD} active users each)" )
+    print( "=" * 104 )
+    print(
+        f"{'profile':<20} {'startup':>10} {'traffic':>10} {'events':>8} {'RSS growth':>11} "
+        f"{'heap kept':>10} {'heap peak':>10} {'members':>8} {'messages':>9}"
+    )
+
+    for profile, passive in VARIANTS:
+        startup, traffic_time, events, resident, members, messages, _, _ = measure( profile, passive, guild_count, False )
+        retained, peak = measure( profile, passive, guild_count, True )[6:]
+
+        name = f"{profile}, passive {'on' if passive else 'off'}"
+        print(
+            f"{name:<20} {startup * 1000:7.0f} ms {traffic_time * 1000:7.0f} ms {events:>8,.0f} {resident / 1024:7.1f} MiB "
+            f"{retained / 2**20:6.1f} MiB {peak / 2**20:6.1f} MiB {members:>8,.0f} {messages:>9,.0f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark for the /bible command handler, from invocation to the last ctx.respond().
+Reports handler time and Discord REST calls per command for response cache
+hits separately from misses.
+
+Upstream fetches are answered in-process without delay, so the numbers show
+the bot's own overhead. No API key or Discord connection required.
+Run with: python bench_handler.py
+"""
+
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+# The bot refuses to start without credentials; none are used here
+os.environ.setdefault( 'DISCORD_BOT_TOKEN', 'benchmark' )
+os.environ.setdefault( 'BIBLE_API_KEY', 'benchmark' )
+
+import bible_api
+import bible_bot
+from metrics import METRICS
+from passage_model import Passage
+from rate_limiter import RateLimiter, DEFAULT_RATE_LIMITS
+
+COMMANDS = [
+    ( "John 3:16", None, False ),
+    ( "Gen 1:1-3", "KJV", False ),
+    ( "Rom 8:28,31-39", None, False ),
+    ( "Ps 23", None, False ),
+    ( "Rom 3:23; Rom 6:23", None, False ),
+    ( "Johannes 3,16", None, True ),
+    ( "1. Mose 1,1-3", None, True ),
+    ( "Röm 8,28", "LUTHER", True ),
+]
+
+
+class BenchContext:
+    """
+    Minimal stand-in for a slash command context.
+    """
+
+    guild_id = 1
+    channel_id = 1
+    author = SimpleNamespace( id=1 )
+
+    async def defer( self ):
+        pass
+
+    async def respond( self, content=None, **kwargs ):
+        pass
+
+
+def stand_in_fetch( self, bible_id, api_ref, timeout=None ):
+    """
+    Answers a passage request in-process with placeholder verses.
+    """
+    first, _, last = api_ref.partition( '-' )
+    _, chapter, verse = first.split( '.' )
+    verse_end = int( last.split( '.' )[2] ) if last else int( verse )
+
+    verses = [( int( chapter ), v, "Lorem ipsum dolor sit amet, consectetur adipiscing elit." ) for v in range( int( verse ), verse_end + 1 )]
+    passage = Passage( api_ref, bible_api.DISPLAY_NAMES.get( bible_id, bible_id ), verses )
+
+    return {'success': True, 'passage': passage, 'reference': api_ref, 'translation': passage.translation}
+
+
+async def measure( name, rounds, before_each=None ):
+    """
+    Runs every command for several rounds and prints the mean handler time
+    and number of Discord REST calls.
+    """
+    ctx = BenchContext()
+    elapsed = 0.0
+    METRICS.reset()
+
+    for _ in range( rounds ):
+        for reference, translation, is_german in COMMANDS:
+            if before_each:
+                before_each()
+
+            start = time.perf_counter()
+            await bible_bot.send_passages( ctx, reference, translation, is_german )
+            elapsed += time.perf_counter() - start
+
+    count = rounds * len( COMMANDS )
+    rest_calls = METRICS.ratio( 'discord.rest_calls', 'commands' )
+    print( f"{name:<36} {elapsed / count * 1_000_000:10.1f} µs/command   {rest_calls:.2f} REST calls/command" )
+
+
+def clear_all():
+    """
+    Empties the response and passage caches.
+    """
+    bible_bot.RESPONSE_CACHE.clear()
+    bible_api.PASSAGE_CACHE.clear()
+
+
+async def run():
+    """
+    Measures cold misses, misses with cached passages, and response cache hits.
+    """
+    rounds = 200
+
+    print( "=" * 80 )
+    print( f"/bible handler time ({len( COMMANDS )} commands x {rounds} rounds)" )
+    print( "=" * 80 )
+
+    await measure( "miss (nothing cached)", rounds, clear_all )
+    await measure( "miss (passage cached)", rounds, bible_bot.RESPONSE_CACHE.clear )
+
+    # Fill the response cache once, then measure hits only
+    await measure( "warm-up", 1 )
+    await measure( "hit (response cached)", rounds )
+
+    cache = bible_bot.RESPONSE_CACHE
+    print( f"\nresponse cache: {len( cache )} entries, {cache.hits:,} hits, {cache.misses:,} misses" )
+
+
+def main():
+    """
+    Runs the handler benchmark.
+    """
+    original_fetch = bible_api.BibleAPI._fetch_passage
+    bible_api.BibleAPI._fetch_passage = stand_in_fetch
+    
+    # One user sends every command; keep the limiter's cost in but never reject
+    bible_bot.RATE_LIMITER = RateLimiter( limits={name: 1_000_000 for name in DEFAULT_RATE_LIMITS} )
+    
+    # Read-ahead would warm the next round's passages and blur the miss numbers
+    bible_bot.PREFETCH_ENABLED = False
+
+    try:
+        asyncio.run( run() )
+    finally:
+        bible_api.BibleAPI._fetch_passage = original_fetch
+        clear_all()
+
+
+if __name__ == '__main__':
+    main()
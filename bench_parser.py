@@ -0,0 +1,76 @@
+"""
+Benchmark for the reference parsing front-end.
+Reports parses per second on real English and German inputs, with and
+without the LRU memo.
+
+No API key or Discord connection required.
+Run with: python bench_parser.py
+"""
+
+import time
+from reference_parser import parse_reference, parse_references, extract_command_and_reference
+
+# Inputs as users type them into /bible and /bibel
+ENGLISH_INPUTS = [
+    "Gen 1:1", "Genesis 1:1-3", "John 3:16", "Rom 8:28", "Matt 5:3-7:12", "Psalm 23",
+    "John 3:16-", "Rom 8:28,31-39", "Ps 119:105", "1 Cor 13:4-7", "Rev 21:4", "Prov 3:5-6",
+    "Isa 40:31", "Phil 4:13", "Jer 29:11", "Heb 11:1", "Jas 1:2-4", "Song of Solomon 2:1",
+    "Rom 3:23; Rom 6:23; Rom 10:9-10", "Matt 5-7",
+]
+
+GERMAN_INPUTS = [
+    "1. Mose 1,1", "1.Mose 1,1-3", "Johannes 3,16", "Römer 8,28", "Matthäus 5,3-7,12", "Psalm 23",
+    "Joh 3,16ff", "Röm 8,28.31-39", "1 Kor 13", "1. Korinther 13,4-7", "Offenbarung 21,4",
+    "Sprüche 3,5-6", "Jesaja 40,31", "Philipper 4,13", "Jeremia 29,11", "Hebräer 11,1",
+    "Jakobus 1,2-4", "5. Mose 6,4-9", "Röm 3,23; Röm 6,23", "Mt 5-7",
+]
+
+COMMANDS = (
+    [f"!bible {text}" for text in ENGLISH_INPUTS[:10]] +
+    [f"!bible KJV {text}" for text in ENGLISH_INPUTS[10:]] +
+    [f"!bibel {text}" for text in GERMAN_INPUTS[:10]] +
+    [f"!bibel LUTHER {text}" for text in GERMAN_INPUTS[10:]]
+)
+
+
+def measure( name, func, inputs, rounds ):
+    """
+    Calls a function on every input for several rounds and prints parses per second.
+    """
+    start = time.perf_counter()
+
+    for _ in range( rounds ):
+        for text in inputs:
+            func( text )
+
+    elapsed = time.perf_counter() - start
+    count = rounds * len( inputs )
+
+    print( f"{name:<40} {count / elapsed:>12,.0f} parses/s   {elapsed / count * 1_000_000:6.2f} µs/parse" )
+
+
+def main():
+    """
+    Runs the parser benchmark.
+    """
+    rounds = 2000
+
+    print( "=" * 80 )
+    print( f"Reference parsing ({len( ENGLISH_INPUTS )} English, {len( GERMAN_INPUTS )} German inputs)" )
+    print( "=" * 80 )
+
+    # __wrapped__ bypasses the memo and measures the scanner itself
+    measure( "parse_reference (English, uncached)", parse_reference.__wrapped__, ENGLISH_INPUTS, rounds )
+    measure( "parse_reference (German, uncached)", parse_reference.__wrapped__, GERMAN_INPUTS, rounds )
+    measure( "extract_command_and_reference (uncached)", extract_command_and_reference.__wrapped__, COMMANDS, rounds )
+
+    measure( "parse_reference (memoized)", parse_reference, ENGLISH_INPUTS + GERMAN_INPUTS, rounds )
+    measure( "parse_references (memoized)", parse_references, ENGLISH_INPUTS + GERMAN_INPUTS, rounds )
+    measure( "extract_command_and_reference (memoized)", extract_command_and_reference, COMMANDS, rounds )
+
+    info = parse_reference.cache_info()
+    print( f"\nparse_reference memo: {info.hits:,} hits, {info.misses:,} misses, {info.currsize} entries" )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark for the full-text search index.
+
+Mirrors a synthetic translation with the verse counts of the whole canon
+(about 31,000 verses, words drawn from a Zipf distribution like real text),
+builds its index with one worker process per book, updates it after a new
+chapter, and measures query latency for rare, common and phrase queries.
+
+No API key or Discord connection required.
+Run with: python bench_search.py [workers]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from canon import BOOK_ORDER, VERSE_COUNTS
+from search_index import SearchIndex, index_path, store_chapter, update_index, _POSTINGS_CACHE, _RESULTS_CACHE
+
+# Distinct words in the synthetic translation, and their skew
+VOCABULARY = 12000
+ZIPF_EXPONENT = 1.05
+
+QUERIES = [
+    'faith hope love',
+    '"faith, hope, love"',
+    'the',
+    'the and of',
+    'w17 w230',
+    'w5000',
+    '"w1 w2"',
+    'nothingmatches',
+]
+
+
+def mirror_canon( directory, bible_id, seed=1 ):
+    """
+    Writes a synthetic translation for every chapter of the canon.
+
+    Returns:
+        The number of verses written
+    """
+    rng = random.Random( seed )
+    words = ['the', 'and', 'of'] + [f"w{n}" for n in range( VOCABULARY )]
+    weights = [1 / ( rank + 1 ) ** ZIPF_EXPONENT for rank in range( len( words ) )]
+    total = 0
+
+    for book in BOOK_ORDER:
+        for chapter, verses in enumerate( VERSE_COUNTS[book], 1 ):
+            texts = [
+                ( chapter, verse, ' '.join( rng.choices( words, weights, k=rng.randint( 8, 40 ) ) ) )
+                for verse in range( 1, verses + 1 )
+            ]
+            if book == '1 Corinthians' and chapter == 13:
+                texts[12] = ( 13, 13, "And now abide faith, hope, love, these three; but the greatest of these is love." )
+            store_chapter( directory, bible_id, book, chapter, texts )
+            total += verses
+
+    return total
+
+
+def main():
+    """
+    Runs the search benchmark.
+    """
+    workers = int( sys.argv[1] ) if len( sys.argv ) > 1 else os.cpu_count() or 1
+    bible_id = 'bench-01'
+
+    with tempfile.TemporaryDirectory() as directory:
+        verses = mirror_canon( directory, bible_id )
+
+        print( "=" * 80 )
+        print( f"Search index ({verses:,} verses, {len( BOOK_ORDER )} books, {workers} workers)" )
+        print( "=" * 80 )
+
+        start = time.perf_counter()
+        update_index( directory, bible_id, workers=workers )
+        print( f"{'Full build':<40} {time.perf_counter() - start:8.2f} s" )
+
+        size = os.path.getsize( index_path( directory, bible_id ) )
+        print( f"{'Index file':<40} {size / 1024 / 1024:8.2f} MiB" )
+
+        # A new chapter only tokenizes its own book again
+        time.sleep( 0.01 )
+        store_chapter( directory, bible_id, 'Jude', 1, [( 1, 1, "Jude, a servant of Jesus Christ" )] )
+        start = time.perf_counter()
+        rebuilt = update_index( directory, bible_id, workers=workers )
+        print( f"{'Update after one chapter':<40} {time.perf_counter() - start:8.2f} s   ({rebuilt} book tokenized)" )
+
+        index = SearchIndex( index_path( directory, bible_id ) )
+        print()
+
+        for query in QUERIES:
+            _POSTINGS_CACHE.clear()
+            _RESULTS_CACHE.clear()
+            start = time.perf_counter()
+            matches, total = index.search( query )
+            cold = time.perf_counter() - start
+
+            # Decoded postings stay cached; results are computed again
+            rounds = 50
+            start = time.perf_counter()
+            for _ in range( rounds ):
+                _RESULTS_CACHE.clear()
+                index.search( query )
+            warm = ( time.perf_counter() - start ) / rounds
+
+            print( f"{query:<28} {total:>7,} verses   cold {cold * 1000:7.2f} ms   warm {warm * 1000:7.2f} ms" )
+
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark for the cache shared between bot processes.
+
+Several processes stand in for shard clusters and look up passages at the
+same time, drawing references from the same popularity distribution, once
+with the shared cache and once without. Upstream fetches are answered
+in-process and counted, so the numbers show how many API.Bible requests one
+cluster saves another, and what the shared cache costs per process. A third
+run keeps the passages in shared memory (SHM_CACHE_FILE) instead.
+No API key or Discord connection required.
+Run with: python bench_shared_cache.py [processes] [lookups per process]
+"""
+
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BOOKS = ["Genesis", "Psalms", "Proverbs", "Isaiah", "Matthew", "John", "Romans", "Hebrews"]
+CHAPTERS = 15
+VERSES = 10
+
+# Skew of the reference popularity (higher = a few verses are asked for more often)
+ZIPF_EXPONENT = 1.1
+
+
+def rss_kb():
+    """
+    Current resident memory of this process in KiB, counting shared pages
+    proportionally (PSS) where the system reports it.
+    """
+    try:
+        with open( '/proc/self/smaps_rollup' ) as f:
+            for line in f:
+                if line.startswith( 'Pss:' ):
+                    return int( line.split()[1] )
+    except OSError:
+        pass
+
+    try:
+        with open( '/proc/self/statm' ) as f:
+            return int( f.read().split()[1] ) * os.sysconf( 'SC_PAGE_SIZE' ) // 1024
+    except OSError:
+        import resource
+        return resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+
+
+def run_cluster( seed, lookups ):
+    """
+    Looks up passages like one cluster would and returns its counters.
+
+    Returns:
+        Lookups, in-memory hits, shared cache hits, upstream fetches, seconds and resident memory in KiB
+    """
+    import bible_api
+    from passage_model import Passage
+    from reference_parser import parse_reference
+
+    fetches = []
+
+    def stand_in_fetch( self, bible_id, api_ref, timeout=None ):
+        fetches.append( api_ref )
+        passage = Passage( api_ref, 'BSB', [( 1, 1, "Lorem ipsum dolor sit amet, consectetur adipiscing elit." )] )
+        return {'success': True, 'passage': passage, 'reference': api_ref, 'translation': 'BSB'}
+
+    bible_api.BibleAPI._fetch_passage = stand_in_fetch
+
+    refs = [
+        parse_reference( f"{book} {chapter}:{verse}" )
+        for book in BOOKS for chapter in range( 1, CHAPTERS + 1 ) for verse in range( 1, VERSES + 1 )
+    ]
+    weights = [1 / rank ** ZIPF_EXPONENT for rank in range( 1, len( refs ) + 1 )]
+    stream = random.Random( seed ).choices( refs, weights, k=lookups )
+
+    api = bible_api.BibleAPI( 'benchmark' )
+    bible_id = bible_api.get_bible_id( None )
+
+    start = time.perf_counter()
+    for ref in stream:
+        api.get_verse( bible_id, ref )
+    elapsed = time.perf_counter() - start
+
+    shared_hits = bible_api.SHARED_CACHE.hits if bible_api.SHARED_CACHE else 0
+    return lookups, bible_api.PASSAGE_CACHE.hits, shared_hits, len( fetches ), elapsed, rss_kb()
+
+
+def run_all( processes, lookups, shared_file, shm_file=None ):
+    """
+    Runs the clusters at the same time and returns the counters of each.
+    """
+    env = dict( os.environ )
+    env.pop( 'SHARED_CACHE_FILE', None )
+    env.pop( 'SHM_CACHE_FILE', None )
+    if shared_file:
+        env['SHARED_CACHE_FILE'] = shared_file
+    if shm_file:
+        env['SHM_CACHE_FILE'] = shm_file
+
+    children = [
+        subprocess.Popen(
+            [sys.executable, __file__, 'cluster', str( seed ), str( lookups )],
+            env=env, stdout=subprocess.PIPE, text=True
+        )
+        for seed in range( processes )
+    ]
+
+    results = []
+    for child in children:
+        output, _ = child.communicate()
+        results.append( [float( value ) for value in output.split()] )
+
+    return results
+
+
+def report( name, results ):
+    """
+    Prints one line per cluster and a total.
+    """
+    print( f"\n{name}" )
+    print( f"{'cluster':<9} {'lookups':>8} {'memory hits':>12} {'shared hits':>12} {'upstream':>9} {'cross-shard':>12} {'µs/lookup':>10} {'PSS':>9}" )
+
+    totals = [0, 0, 0, 0]
+    for cluster, ( lookups, memory_hits, shared_hits, fetches, elapsed, rss ) in enumerate( results ):
+        misses = lookups - memory_hits
+        cross = shared_hits / misses if misses else 0.0
+        print(
+            f"{cluster:<9} {lookups:>8,.0f} {memory_hits:>12,.0f} {shared_hits:>12,.0f} {fetches:>9,.0f} "
+            f"{cross:>11.0%} {elapsed / lookups * 1_000_000:>10.1f} {rss / 1024:>5.1f} MiB"
+        )
+        for index, value in enumerate( ( lookups, memory_hits, shared_hits, fetches ) ):
+            totals[index] += value
+
+    lookups, memory_hits, shared_hits, fetches = totals
+    print( f"{'total':<9} {lookups:>8,.0f} {memory_hits:>12,.0f} {shared_hits:>12,.0f} {fetches:>9,.0f}" )
+    return fetches
+
+
+def main():
+    """
+    Runs the clusters with and without the shared cache and compares upstream fetches.
+    """
+    if len( sys.argv ) > 1 and sys.argv[1] == 'cluster':
+        print( " ".join( str( value ) for value in run_cluster( int( sys.argv[2] ), int( sys.argv[3] ) ) ) )
+        return
+
+    processes = int( sys.argv[1] ) if len( sys.argv ) > 1 else 4
+    lookups = int( sys.argv[2] ) if len( sys.argv ) > 2 else 5000
+
+    print( "=" * 84 )
+    print( f"{processes} clusters x {lookups:,} lookups over {len( BOOKS ) * CHAPTERS * VERSES:,} references" )
+    print( "=" * 84 )
+
+    with tempfile.TemporaryDirectory() as directory:
+        separate = report( "Separate in-memory caches", run_all( processes, lookups, None ) )
+        shared = report( "With shared cache", run_all( processes, lookups, os.path.join( directory, 'shared.sqlite3' ) ) )
+        shm = report(
+            "With shared memory cache (memory hits include other clusters' passages)",
+            run_all( processes, lookups, None, os.path.join( directory, 'passages' ) )
+        )
+
+    print( f"\nUpstream fetches: {separate:,.0f} -> {shared:,.0f} ({1 - shared / separate:.0%} fewer)" )
+    print( f"Upstream fetches with shared memory: {separate:,.0f} -> {shm:,.0f} ({1 - shm / separate:.0%} fewer)" )
+
+
+if __name__ == '__main__':
+    main()
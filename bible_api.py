@@ -2,9 +2,70 @@
 Bible API integration using API.Bible service.
 """
 
+import json
 import os
+import time
 import requests
-from reference_parser import format_api_reference
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from cache import LRUCache, ZlibCodec
+from deadline import Deadline
+from overload import OVERLOAD
+from passage_model import Passage
+from popularity import POPULARITY
+from prefetch import PREFETCH_TRACKER
+from reference_parser import format_api_reference, segment_verse_count, split_reference, split_segment
+from shared_cache import SharedCache, SHARED_CACHE_FILE
+from shm_cache import ShmCache, SHM_CACHE_FILE
+
+# Base URL of the API.Bible REST service (can point to a local stand-in for testing)
+API_BASE_URL = os.getenv( 'BIBLE_API_BASE_URL', 'https://rest.api.bible/v1' )
+
+# Segments longer than this many verses are fetched as several smaller requests
+SPLIT_FETCH_VERSES = int( os.getenv( 'SPLIT_FETCH_VERSES', '40' ) )
+
+# Maximum number of upstream requests in flight at once
+FETCH_CONCURRENCY = int( os.getenv( 'FETCH_CONCURRENCY', '8' ) )
+
+# Longest time a single upstream request may take, in seconds
+FETCH_TIMEOUT = 10
+
+# Seconds before a cached passage is fetched again; older copies are still used if the API is slow or down
+PASSAGE_MAX_AGE = int( os.getenv( 'PASSAGE_MAX_AGE', '86400' ) )
+
+# Cache of successfully fetched passages, keyed by (bible_id, api_reference);
+# kept in shared memory for all bot processes on this host if SHM_CACHE_FILE is set
+if SHM_CACHE_FILE:
+    PASSAGE_CACHE = ShmCache(
+        SHM_CACHE_FILE,
+        encode=lambda result: result['passage'].to_text(),
+        decode=lambda text: _passage_result( Passage.from_text( text ) ),
+        max_age=PASSAGE_MAX_AGE
+    )
+else:
+    PASSAGE_CACHE = LRUCache(
+        max_entries=2048,
+        max_age=PASSAGE_MAX_AGE,
+        name='passages',
+        codec=ZlibCodec(
+            encode=lambda result: result['passage'].to_text(),
+            decode=lambda text: _passage_result( Passage.from_text( text ) )
+        )
+    )
+
+# The translation catalog (several MB of JSON) and information on single translations
+CATALOG_CACHE = LRUCache(
+    max_entries=4,
+    max_age=PASSAGE_MAX_AGE,
+    name='catalog',
+    codec=ZlibCodec( encode=json.dumps, decode=json.loads, train_after=0 )
+)
+BIBLE_INFO_CACHE = LRUCache( max_entries=256, max_age=PASSAGE_MAX_AGE, name='bible_info' )
+
+# Passages and the translation catalog shared with the other bot processes (None if not configured)
+SHARED_CACHE = SharedCache( SHARED_CACHE_FILE, max_age=PASSAGE_MAX_AGE ) if SHARED_CACHE_FILE else None
+
+# Worker threads for fetching the segments of a reference concurrently
+_FETCH_POOL = ThreadPoolExecutor( max_workers=FETCH_CONCURRENCY, thread_name_prefix='bible-fetch' )
 
 
 class BibleAPI:
@@ -24,13 +85,11 @@ class BibleAPI:
         
         # Trim whitespace from API key
         self.api_key = api_key.strip()
-        self.base_url = "https://rest.api.bible/v1"
+        self.base_url = API_BASE_URL
         self.headers = {
             "api-key": self.api_key
         }
-        
-        # Cache for available Bibles
-        self._bibles_cache = None
+
     
     def get_available_bibles( self ):
         """
@@ -39,8 +98,16 @@ class BibleAPI:
         Returns:
             A list of dictionaries with Bible information
         """
-        if self._bibles_cache:
-            return self._bibles_cache
+        bibles = CATALOG_CACHE.get( 'bibles' )
+        if bibles:
+            return bibles
+        
+        # Another bot process may have fetched the catalog already
+        if SHARED_CACHE is not None:
+            bibles = SHARED_CACHE.get( 'catalog:bibles' )
+            if bibles:
+                CATALOG_CACHE.put( 'bibles', bibles )
+                return bibles
         
         try:
             response = requests.get(
@@ -51,8 +118,12 @@ class BibleAPI:
             
             if response.status_code == 200:
                 data = response.json()
-                self._bibles_cache = data.get( 'data', [] )
-                return self._bibles_cache
+                bibles = data.get( 'data', [] )
+                if bibles:
+                    CATALOG_CACHE.put( 'bibles', bibles )
+                    if SHARED_CACHE is not None:
+                        SHARED_CACHE.put( 'catalog:bibles', bibles )
+                return bibles
             else:
                 return []
         except Exception as e:
@@ -72,21 +143,33 @@ class BibleAPI:
         bibles = self.get_available_bibles()
         return [b for b in bibles if b.get( 'language', {} ).get( 'id' ) == language_code]
     
-    def get_verse( self, bible_id, reference ):
+    def get_verse( self, bible_id, reference, output_format='plain', deadline=None, track=True ):
         """
         Fetches a verse or passage from the Bible.
         
+        The upstream request is cut off when the deadline passes. If it fails,
+        or the bot is in degraded (cache-only) mode, an older cached copy is
+        returned instead when there is one.
+        
         Args:
             bible_id: The Bible translation ID (e.g., "de4e12af7f28f599-01" for KJV)
             reference: The parsed reference dictionary from reference_parser
+            output_format: How the text is rendered (see passage_model.FORMATS)
+            deadline: Optional Deadline for the request (FETCH_TIMEOUT if not given)
+            track: Whether the lookup counts towards popularity and read-ahead
+                (False for passages the user did not ask for, e.g., previews)
             
         Returns:
             A dictionary with:
             - text: The verse text
+            - passage: The structured Passage the text was rendered from
             - reference: The formatted reference
             - translation: The translation name
             - success: Boolean indicating if the fetch was successful
+            - stale: True if an older cached copy was used because the fetch failed
             - error: Error message if not successful
+            - timed_out: True if the request ran out of time
+            - degraded: True if the passage was not cached and the API was not asked because of overload
         """
         # Format the reference for the API
         api_ref = format_api_reference( reference )
@@ -97,25 +180,114 @@ class BibleAPI:
                 'error': 'Invalid reference format'
             }
         
+        key = ( bible_id, api_ref )
+        timeout = deadline.timeout( FETCH_TIMEOUT ) if deadline else FETCH_TIMEOUT
+        if track:
+            POPULARITY.record( bible_id, api_ref )
+            PREFETCH_TRACKER.looked_up( key )
+        
+        if timeout <= 0:
+            # No time left for an upstream request
+            result = _cached_passage( key ) or _timed_out_result()
+        else:
+            # Identical concurrent requests share one upstream call; joining one started
+            # by someone else (e.g., a read-ahead) still only waits for this request's budget.
+            # Only a miss in both caches asks the overload controller, so cache hits never
+            # use up the probe of degraded mode
+            try:
+                result = PASSAGE_CACHE.get_or_load(
+                    key,
+                    lambda: self._load_passage( bible_id, api_ref, timeout, guarded=True ),
+                    should_cache=lambda r: r['success'],
+                    timeout=timeout
+                )
+            except FutureTimeoutError:
+                result = _cached_passage( key ) or _timed_out_result()
+        
+        if not result['success']:
+            stale = PASSAGE_CACHE.get_stale( key ) or _shared_passage( key, stale=True )
+            if stale:
+                result = dict( stale, stale=True )
+        
+        result = dict( result )
+        if result['success']:
+            result['text'] = result['passage'].render( output_format )
+        return result
+    
+    def _load_passage( self, bible_id, api_ref, timeout=FETCH_TIMEOUT, guarded=False ):
+        """
+        Loads a passage missing from the in-memory cache: from the cache shared
+        with the other bot processes if possible, otherwise from API.Bible.
+        
+        Args:
+            bible_id: The Bible translation ID
+            api_ref: The API reference string (e.g., "GEN.1.1-GEN.1.3")
+            timeout: Seconds to wait for the API
+            guarded: Whether the overload controller decides if the API may be asked
+                (user lookups; warm-ups check allow_background() before they start)
+            
+        Returns:
+            A result dictionary as described in get_verse(), without the rendered text
+        """
+        key = ( bible_id, api_ref )
+        result = _shared_passage( key )
+        
+        if result is None and guarded and not OVERLOAD.allow_upstream():
+            # Degraded mode: answer from the caches only
+            result = _degraded_result()
+        elif result is None:
+            result = self._fetch_passage( bible_id, api_ref, timeout )
+            
+            if result['success'] and SHARED_CACHE is not None:
+                SHARED_CACHE.put( _shared_key( key ), result['passage'].to_dict() )
+        
+        return result
+    
+    def _fetch_passage( self, bible_id, api_ref, timeout=FETCH_TIMEOUT ):
+        """
+        Fetches a passage from API.Bible without consulting the cache.
+        
+        Args:
+            bible_id: The Bible translation ID
+            api_ref: The API reference string (e.g., "GEN.1.1-GEN.1.3")
+            timeout: Seconds to wait for the API
+            
+        Returns:
+            A result dictionary as described in get_verse(), without the rendered text
+        """
         try:
             # API.Bible uses passages endpoint for verses
             url = f"{self.base_url}/bibles/{bible_id}/passages/{api_ref}"
             
-            response = requests.get(
-                url,
-                headers=self.headers,
-                params={'content-type': 'text'},
-                timeout=10
-            )
+            # Report latency and quota to the overload controller, including failed requests
+            OVERLOAD.request_started()
+            start = time.monotonic()
+            response = None
+            
+            try:
+                response = requests.get(
+                    url,
+                    headers=self.headers,
+                    params={
+                        'content-type': 'json',
+                        'include-notes': 'false',
+                        'include-titles': 'false',
+                        'include-chapter-numbers': 'false',
+                        'include-verse-numbers': 'true'
+                    },
+                    timeout=timeout
+                )
+            finally:
+                OVERLOAD.request_finished(
+                    time.monotonic() - start,
+                    quota_remaining=_quota_remaining( response ),
+                    rate_limited=response is not None and response.status_code == 429
+                )
             
             if response.status_code == 200:
                 data = response.json()
                 passage_data = data.get( 'data', {} )
                 
-                # Clean up the text (remove HTML tags if present)
-                text = passage_data.get( 'content', '' )
-                text = self._clean_text( text )
-                
                 # Get display name for translation
                 from bible_api import DISPLAY_NAMES
                 translation_name = DISPLAY_NAMES.get( bible_id )
@@ -125,10 +297,14 @@ class BibleAPI:
                     bible_info = self._get_bible_info( bible_id )
                     translation_name = bible_info.get( 'abbreviation', bible_id ) if bible_info else bible_id
                 
+                # Parse the verse structure once; every output format is rendered from it
+                reference = passage_data.get( 'reference', '' )
+                passage = Passage.from_content( reference, translation_name, passage_data.get( 'content', [] ) )
+                
                 return {
                     'success': True,
-                    'text': text,
-                    'reference': passage_data.get( 'reference', '' ),
+                    'passage': passage,
+                    'reference': reference,
                     'translation': translation_name
                 }
             elif response.status_code == 404:
@@ -141,6 +317,11 @@ class BibleAPI:
                     'success': False,
                     'error': 'Invalid or expired API key. Please check your BIBLE_API_KEY at https://scripture.api.bible'
                 }
+            elif response.status_code == 429:
+                return {
+                    'success': False,
+                    'error': 'API.Bible request limit reached, please try again later'
+                }
             else:
                 return {
                     'success': False,
@@ -148,10 +329,7 @@ class BibleAPI:
                 }
                 
         except requests.exceptions.Timeout:
-            return {
-                'success': False,
-                'error': 'Request timed out'
-            }
+            return _timed_out_result()
         except Exception as e:
             return {
                 'success': False,
@@ -168,6 +346,10 @@ class BibleAPI:
         Returns:
             A dictionary with Bible information
         """
+        info = BIBLE_INFO_CACHE.get( bible_id )
+        if info:
+            return info
+        
         try:
             response = requests.get(
                 f"{self.base_url}/bibles/{bible_id}",
@@ -177,35 +359,15 @@ class BibleAPI:
             
             if response.status_code == 200:
                 data = response.json()
-                return data.get( 'data', {} )
+                info = data.get( 'data', {} )
+                if info:
+                    BIBLE_INFO_CACHE.put( bible_id, info )
+                return info
             else:
                 return {}
         except Exception as e:
             print( f"Error fetching Bible info: {e}" )
             return {}
-    
-    def _clean_text( self, text ):
-        """
-        Cleans up the verse text by removing HTML tags and extra whitespace.
-        
-        Args:
-            text: The raw text from the API
-            
-        Returns:
-            Cleaned text
-        """
-        import re
-        
-        # Remove HTML tags
-        text = re.sub( r'<[^>]+>', '', text )
-        
-        # Remove multiple spaces
-        text = re.sub( r'\s+', ' ', text )
-        
-        # Remove leading/trailing whitespace
-        text = text.strip()
-        
-        return text
 
 
 # Translation mappings for common abbreviations
@@ -265,7 +427,7 @@ def get_bible_id( translation_code, default='DEFAULT_ENGLISH' ):
     return TRANSLATION_MAPPINGS.get( code, TRANSLATION_MAPPINGS.get( default, TRANSLATION_MAPPINGS['DEFAULT_ENGLISH'] ) )
 
 
-def fetch_verse( api_key, reference, translation=None, is_german=False ):
+def fetch_verse( api_key, reference, translation=None, is_german=False, output_format='plain', deadline=None ):
     """
     Convenience function to fetch a verse.
     
@@ -274,18 +436,341 @@ def fetch_verse( api_key, reference, translation=None, is_german=False ):
         reference: The parsed reference dictionary
         translation: Optional translation code
         is_german: Whether to default to German translation
+        output_format: How the text is rendered (see passage_model.FORMATS)
+        deadline: Optional Deadline for the whole fetch
         
     Returns:
         A result dictionary with verse information
     """
+    return fetch_verses( api_key, [reference], translation, is_german, output_format=output_format, deadline=deadline )[0]
+
+
+def fetch_verses( api_key, references, translation=None, is_german=False, split_verses=None, output_format='plain',
+                  deadline=None, track=True ):
+    """
+    Fetches several references at once.
+    
+    All segments of all references are fetched concurrently (or served from
+    the passage cache), so the total latency is about that of the slowest one.
+    Long segments are split into pieces of at most split_verses verses that
+    are fetched and cached separately, then joined back in order.
+    
+    Args:
+        api_key: The API.Bible API key
+        references: A list of parsed reference dictionaries
+        translation: Optional translation code
+        is_german: Whether to default to German translation
+        split_verses: Split threshold in verses (defaults to SPLIT_FETCH_VERSES, 0 disables splitting)
+        output_format: How the text is rendered (see passage_model.FORMATS)
+        deadline: Optional Deadline shared by all requests (FETCH_TIMEOUT if not given)
+        track: Whether the lookups count towards popularity and read-ahead
+        
+    Returns:
+        A list of result dictionaries, one per reference and in the same order
+    """
     api = BibleAPI( api_key )
+    deadline = deadline or Deadline( FETCH_TIMEOUT )
+    
+    if split_verses is None:
+        split_verses = SPLIT_FETCH_VERSES
     
     # Determine which Bible ID to use
+    with deadline.stage( 'translation' ):
+        bible_id = _resolve_bible_id( translation, is_german )
+    
+    return _fetch_all( api, [bible_id] * len( references ), references, split_verses, output_format, deadline, track )
+
+
+def fetch_translations( api_key, reference, translations, output_format='plain', deadline=None ):
+    """
+    Fetches one reference in several translations at once.
+    
+    All translations (and all pieces of each) are fetched concurrently or
+    served from the passage cache, so the total latency is about that of
+    the slowest single fetch.
+    
+    Args:
+        api_key: The API.Bible API key
+        reference: A parsed reference dictionary
+        translations: Translation codes resolved with get_bible_id()
+        output_format: How the text is rendered (see passage_model.FORMATS)
+        deadline: Optional Deadline shared by all requests (FETCH_TIMEOUT if not given)
+        
+    Returns:
+        A list of result dictionaries, one per translation and in the same order
+    """
+    api = BibleAPI( api_key )
+    deadline = deadline or Deadline( FETCH_TIMEOUT )
+    
+    with deadline.stage( 'translation' ):
+        bible_ids = [get_bible_id( translation ) for translation in translations]
+    
+    return _fetch_all( api, bible_ids, [reference] * len( translations ), SPLIT_FETCH_VERSES, output_format, deadline )
+
+
+def _fetch_all( api, bible_ids, references, split_verses, output_format, deadline, track=True ):
+    """
+    Fetches every piece of every reference concurrently and joins the results per reference.
+    
+    Args:
+        api: The BibleAPI client
+        bible_ids: The Bible ID of each reference
+        references: The parsed reference dictionaries
+        split_verses: Split threshold in verses (0 disables splitting)
+        output_format: How the text is rendered
+        deadline: The Deadline shared by all requests
+        track: Whether the lookups count towards popularity and read-ahead
+        
+    Returns:
+        A list of result dictionaries, one per reference and in the same order
+    """
+    # Flatten every piece of every segment so they all run at the same time
+    jobs = _plan_jobs( references, split_verses )
+    
+    def fetch( job ):
+        return api.get_verse( bible_ids[job[0]], job[2], output_format, deadline, track )
+    
+    with deadline.stage( 'fetch' ):
+        if len( jobs ) == 1:
+            fetched = [fetch( jobs[0] )]
+        else:
+            fetched = list( _FETCH_POOL.map( fetch, jobs ) )
+    
+    # Join the pieces of each segment, then the segments of each reference, in order;
+    # the text is rendered once from the joined structure
+    grouped = [{} for _ in references]
+    for ( index, segment_index, _ ), result in zip( jobs, fetched ):
+        grouped[index].setdefault( segment_index, [] ).append( result )
+    
+    with deadline.stage( 'render' ):
+        return [
+            _render_result( _join_results( [_join_results( pieces, separate=False ) for pieces in segments.values()] ), output_format )
+            for segments in grouped
+        ]
+
+
+def is_known_translation( translation_code ):
+    """
+    Whether get_bible_id() knows a translation code, rather than falling back to the default.
+    
+    Args:
+        translation_code: The translation abbreviation or Bible ID
+        
+    Returns:
+        True for mapped codes and Bible IDs
+    """
+    if not translation_code:
+        return False
+    
+    return '-' in translation_code or translation_code.upper() in TRANSLATION_MAPPINGS
+
+
+def _resolve_bible_id( translation, is_german ):
+    """
+    Bible ID for a translation code, or the default translation of the command's language.
+    """
     if translation:
-        bible_id = get_bible_id( translation )
-    else:
-        default = 'DEFAULT_GERMAN' if is_german else 'DEFAULT_ENGLISH'
-        bible_id = get_bible_id( None, default )
+        return get_bible_id( translation )
+    
+    return get_bible_id( None, 'DEFAULT_GERMAN' if is_german else 'DEFAULT_ENGLISH' )
+
+
+def _plan_jobs( references, split_verses ):
+    """
+    Splits references into the pieces fetched (and cached) separately.
+    
+    Returns:
+        A list of (reference index, segment index, piece) tuples in reading order
+    """
+    jobs = []
+    
+    for index, reference in enumerate( references ):
+        segments = ( reference.get( 'segments' ) if reference else None ) or [reference]
+        
+        for segment_index, segment in enumerate( segments ):
+            if segment and split_verses and segment_verse_count( segment ) > split_verses:
+                pieces = split_segment( segment, split_verses )
+            else:
+                pieces = [segment]
+            
+            jobs.extend( ( index, segment_index, piece ) for piece in pieces )
+    
+    return jobs
+
+
+def prefetch_passage( api_key, reference, translation=None, is_german=False ):
+    """
+    Loads a passage into the cache the way a command for it would fetch it
+    (only the first page of a long passage), without counting a lookup.
+    
+    Args:
+        api_key: The API.Bible key
+        reference: The parsed reference dictionary
+        translation: Optional translation code
+        is_german: Whether the German command is used
+        
+    Returns:
+        The number of API requests made
+    """
+    bible_id = _resolve_bible_id( translation, is_german )
+    first_page = split_reference( reference )[0]
+    fetched = 0
+    
+    for _, _, piece in _plan_jobs( [first_page], SPLIT_FETCH_VERSES ):
+        api_ref = format_api_reference( piece )
+        
+        if api_ref and warm_passage( api_key, bible_id, api_ref ):
+            PREFETCH_TRACKER.prefetched( ( bible_id, api_ref ) )
+            fetched += 1
+    
+    return fetched
+
+
+def warm_passage( api_key, bible_id, api_ref ):
+    """
+    Loads a passage into the passage cache unless it is cached already
+    (used to warm the cache; does not count as a lookup for popularity).
+    
+    Args:
+        api_key: The API.Bible key
+        bible_id: The Bible translation ID
+        api_ref: The API reference string (e.g., "JHN.3.16")
+        
+    Returns:
+        True if API.Bible was asked for the passage
+    """
+    key = ( bible_id, api_ref )
+    
+    if _cached_passage( key ) is not None:
+        return False
+    
+    api = BibleAPI( api_key )
+    PASSAGE_CACHE.get_or_load(
+        key,
+        lambda: api._load_passage( bible_id, api_ref ),
+        should_cache=lambda r: r['success']
+    )
+    return True
+
+
+def _join_results( results, separate=True ):
+    """
+    Joins the results of several fetches into one result.
+    
+    Args:
+        results: Result dictionaries from get_verse(), in reading order
+        separate: Whether each result starts a new paragraph (False for pieces of one segment)
+        
+    Returns:
+        A single result dictionary, or the first failed result
+    """
+    if len( results ) == 1:
+        return results[0]
+    
+    for result in results:
+        if not result['success']:
+            return result
+    
+    return {
+        'success': True,
+        'passage': Passage.join( [r['passage'] for r in results], separate ),
+        'reference': '; '.join( r['reference'] for r in results ),
+        'translation': results[0]['translation'],
+        'stale': any( r.get( 'stale' ) for r in results )
+    }
+
+
+def _timed_out_result():
+    """
+    Result returned when a passage could not be fetched in time.
+    """
+    return {
+        'success': False,
+        'error': 'Request timed out',
+        'timed_out': True
+    }
+
+
+def _shared_key( key ):
+    """
+    Shared cache key for a passage cache key (bible_id, api_reference).
+    """
+    return f"passage:{key[0]}:{key[1]}"
+
+
+def _shared_passage( key, stale=False ):
+    """
+    Reads a passage from the cache shared with the other bot processes.
+    
+    Args:
+        key: The passage cache key (bible_id, api_reference)
+        stale: Whether to accept an entry older than PASSAGE_MAX_AGE
+        
+    Returns:
+        A successful result dictionary, or None
+    """
+    if SHARED_CACHE is None:
+        return None
+    
+    name = _shared_key( key )
+    data = SHARED_CACHE.get_stale( name ) if stale else SHARED_CACHE.get( name )
     
-    return api.get_verse( bible_id, reference )
+    if data is None:
+        return None
+    
+    return _passage_result( Passage.from_dict( data ) )
+
+
+def _passage_result( passage ):
+    """
+    Successful result dictionary for a cached passage.
+    """
+    return {'success': True, 'passage': passage, 'reference': passage.reference, 'translation': passage.translation}
+
+
+def _cached_passage( key ):
+    """
+    Reads a fresh passage from the in-memory cache, then the shared cache, without calling the API.
+    
+    Returns:
+        A successful result dictionary, or None
+    """
+    result = PASSAGE_CACHE.get( key )
+    
+    if result is None:
+        result = _shared_passage( key )
+        if result is not None:
+            PASSAGE_CACHE.put( key, result )
+    
+    return result
 
+
+def _degraded_result():
+    """
+    Result returned for an uncached passage while the bot is in degraded (cache-only) mode.
+    """
+    return {
+        'success': False,
+        'error': 'The Bible service is overloaded and this passage is not cached yet',
+        'degraded': True
+    }
+
+
+def _quota_remaining( response ):
+    """
+    Remaining request quota reported in the rate limit headers of a response, if any.
+    """
+    if response is None:
+        return None
+    
+    value = response.headers.get( 'X-RateLimit-Remaining' )
+    return int( value ) if value and value.isdigit() else None
+
+
+def _render_result( result, output_format ):
+    """
+    Adds the rendered text to a (possibly joined) result.
+    """
+    if result['success']:
+        result = dict( result, text=result['passage'].render( output_format ) )
+    return result
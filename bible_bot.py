@@ -3,10 +3,31 @@ Discord Bible Bot - Responds to /bible and /bibel slash commands with Bible vers
 """
 
 import os
+import json
+import math
+import asyncio
 import discord
+from functools import lru_cache, partial
 from dotenv import load_dotenv
-from reference_parser import extract_command_and_reference, format_reference
-from bible_api import fetch_verse, BibleAPI, DISPLAY_NAMES
+from reference_parser import extract_command_and_reference, format_reference, parse_reference, parse_references, segment_verse_count, split_reference, MAX_REFERENCES
+from bible_api import fetch_verse, fetch_verses, fetch_translations, get_bible_id, is_known_translation, prefetch_passage, warm_passage, BibleAPI, DISPLAY_NAMES, PASSAGE_MAX_AGE
+from cache import LRUCache, ZlibCodec
+from deadline import Deadline, COMMAND_BUDGET
+from metrics import METRICS
+from scheduler import SCHEDULER, JobShed, LANE_INTERACTIVE, LANE_LIST, LANE_BACKGROUND
+from rate_limiter import RateLimiter, KIND_HIT, KIND_MISS, KIND_PREFETCH
+from pagination import pack_blocks, PassagePager
+from passage_model import render_parallel
+from reference_detector import find_references
+from guild_settings import GuildSettings
+from popularity import POPULARITY, POPULARITY_SAVE_INTERVAL, warm_up
+from prefetch import PREFETCH_ENABLED, prefetch_next
+from search_index import SEARCH_INDEXES, SEARCH_PAGE_SIZE, parse_query, snippet
+from xref import get_cross_references, related_references
+from votd import VOTD_SETTING, VotdScheduler, get_zone, parse_time
+from autocomplete import TRANSLATION_INDEX, cached_catalog, suggest_references
+from gateway_profile import client_options, shard_options, GATEWAY_PROFILE, PASSIVE_DETECTION
+from book_mappings import ALIAS_TABLE_STATS
 
 # Load environment variables
 load_dotenv()
@@ -14,6 +35,23 @@ load_dotenv()
 # Configuration
 DISCORD_TOKEN = os.getenv( 'DISCORD_BOT_TOKEN' )
 BIBLE_API_KEY = os.getenv( 'BIBLE_API_KEY' )
+GUILD_SETTINGS_FILE = os.getenv( 'GUILD_SETTINGS_FILE', 'guild_settings.json' )
+RESPONSE_CACHE_SIZE = int( os.getenv( 'RESPONSE_CACHE_SIZE', '4096' ) )
+METRICS_FILE = os.getenv( 'METRICS_FILE' )
+METRICS_INTERVAL = int( os.getenv( 'METRICS_INTERVAL', '60' ) )
+
+# Discord expects an answer within 3 seconds; slower work is deferred after this many seconds
+DEFER_AFTER = float( os.getenv( 'DEFER_AFTER', '1.5' ) )
+
+# How passage text is rendered in replies (see passage_model.FORMATS)
+PASSAGE_FORMAT = 'plain'
+
+# Most translations and verses in one /bible-compare command
+COMPARE_MAX_TRANSLATIONS = int( os.getenv( 'COMPARE_MAX_TRANSLATIONS', '5' ) )
+COMPARE_MAX_VERSES = int( os.getenv( 'COMPARE_MAX_VERSES', '10' ) )
+
+# Characters of each related passage shown by /bible-xref
+XREF_PREVIEW_LENGTH = 100
 
 if not DISCORD_TOKEN:
     raise ValueError( "DISCORD_BOT_TOKEN not found in environment variables" )
@@ -22,10 +60,117 @@ if not BIBLE_API_KEY:
     raise ValueError( "BIBLE_API_KEY not found in environment variables" )
 
 
-# Set up Discord bot with necessary intents
-intents = discord.Intents.default()
-intents.message_content = True  # Required to read message content
-bot = discord.Bot( intents=intents )
+# User-facing messages for the English (/bible) and German (/bibel) commands
+MESSAGES = {
+    'en': {
+        'parse_error': (
+            "❌ I couldn't understand that reference. Please use a format like:\n"
+            "`Gen 1:1` or `John 3:16` or `Gen 1:1-3`"
+        ),
+        'too_many': "❌ Please ask for at most {max} references at once.",
+        'loading': "⏳ Still loading **{reference}**… I'll update this message.",
+        'busy': "⏳ I'm very busy right now. Please try again in a moment.",
+        'rate_limited': "⏳ You're looking up passages faster than I can keep up with. Please try again in {seconds} seconds.",
+        'degraded': (
+            "The Bible service is overloaded right now, so I can only answer from my cache, "
+            "and this passage isn't in it yet. Please try again in a few minutes."
+        ),
+        'auto_on': "✅ I will now reply to Bible references mentioned in this channel.",
+        'auto_off': "✅ I will no longer reply to Bible references in this channel.",
+        'auto_unavailable': "❌ Automatic replies are turned off for this bot.",
+        'prefetch_on': "✅ I will load the next passage in advance after each lookup in this server.",
+        'prefetch_off': "✅ I will no longer load passages in advance in this server.",
+        'compare_one': "❌ Please compare one reference at a time.",
+        'compare_unknown': "❌ Unknown translation code(s): {codes}. Use /bible-list to see the available ones.",
+        'compare_count': "❌ Please give between 2 and {max} different translations, e.g. `KJV, ASV, BSB`.",
+        'compare_too_long': "❌ Please compare at most {max} verses at once.",
+        'compare_timed_out': "⏳ {code} is still loading. Please try again in a moment.",
+        'search_empty_query': "❌ Please give at least one word to search for, e.g. `faith hope love` or `\"love is patient\"`.",
+        'search_unavailable': "❌ Searching is not available for {translation} yet.",
+        'search_no_results': "🔎 No verses in {translation} contain **{query}**.",
+        'search_header': "🔎 **{query}** ({translation}) · {total} verses",
+        'xref_one': "❌ Please look up cross references for one reference at a time.",
+        'xref_unavailable': "❌ Cross references are not installed for this bot.",
+        'xref_none': "🔗 No cross references found for **{reference}**.",
+        'xref_header': "🔗 **{reference}** · related passages",
+        'votd_title': "📖 **Verse of the day**",
+        'votd_on': "✅ I will post the verse of the day in <#{channel}> every day at {time} ({timezone}).",
+        'votd_off': "✅ I will no longer post the verse of the day in this server.",
+        'votd_bad_time': "❌ Please give the time as `HH:MM`, e.g. `07:30`.",
+        'votd_bad_timezone': "❌ Unknown time zone `{timezone}`. Please use a name like `Europe/London` or `America/New_York`.",
+        'votd_unknown_translation': "❌ Unknown translation code: {code}. Use /bible-list to see the available ones.",
+    },
+    'de': {
+        'parse_error': (
+            "❌ Ich konnte diese Stelle nicht verstehen. Bitte verwende ein Format wie:\n"
+            "`1. Mose 1,1` oder `Johannes 3,16` oder `1. Mose 1,1-3`"
+        ),
+        'too_many': "❌ Bitte frage nach höchstens {max} Stellen auf einmal.",
+        'loading': "⏳ **{reference}** wird noch geladen… Ich aktualisiere diese Nachricht.",
+        'busy': "⏳ Ich bin gerade sehr beschäftigt. Bitte versuche es gleich noch einmal.",
+        'rate_limited': "⏳ Du fragst schneller nach Bibelstellen, als ich nachkomme. Bitte versuche es in {seconds} Sekunden noch einmal.",
+        'degraded': (
+            "Der Bibel-Dienst ist gerade überlastet, deshalb kann ich nur aus meinem Zwischenspeicher antworten, "
+            "und diese Stelle ist dort noch nicht vorhanden. Bitte versuche es in ein paar Minuten noch einmal."
+        ),
+        'auto_on': "✅ Ich antworte ab jetzt auf Bibelstellen, die in diesem Kanal erwähnt werden.",
+        'auto_off': "✅ Ich antworte nicht mehr auf Bibelstellen in diesem Kanal.",
+        'auto_unavailable': "❌ Automatische Antworten sind für diesen Bot ausgeschaltet.",
+        'prefetch_on': "✅ Ich lade in diesem Server nach jeder Abfrage die nächste Stelle im Voraus.",
+        'prefetch_off': "✅ Ich lade in diesem Server keine Stellen mehr im Voraus.",
+        'compare_one': "❌ Bitte vergleiche nur eine Stelle auf einmal.",
+        'compare_unknown': "❌ Unbekannte Übersetzung(en): {codes}. Mit /bibel-list siehst du die verfügbaren.",
+        'compare_count': "❌ Bitte gib zwischen 2 und {max} verschiedene Übersetzungen an, z.B. `LUTHER, KJV`.",
+        'compare_too_long': "❌ Bitte vergleiche höchstens {max} Verse auf einmal.",
+        'compare_timed_out': "⏳ {code} wird noch geladen. Bitte versuche es gleich noch einmal.",
+        'search_empty_query': "❌ Bitte gib mindestens ein Suchwort an, z.B. `Glaube Hoffnung Liebe` oder `\"die Liebe ist langmütig\"`.",
+        'search_unavailable': "❌ Die Suche ist für {translation} noch nicht verfügbar.",
+        'search_no_results': "🔎 Keine Verse in {translation} enthalten **{query}**.",
+        'search_header': "🔎 **{query}** ({translation}) · {total} Verse",
+        'xref_one': "❌ Bitte frage nach Querverweisen für nur eine Stelle auf einmal.",
+        'xref_unavailable': "❌ Querverweise sind für diesen Bot nicht installiert.",
+        'xref_none': "🔗 Keine Querverweise für **{reference}** gefunden.",
+        'xref_header': "🔗 **{reference}** · verwandte Stellen",
+        'votd_title': "📖 **Vers des Tages**",
+        'votd_on': "✅ Ich poste den Vers des Tages ab jetzt täglich um {time} ({timezone}) in <#{channel}>.",
+        'votd_off': "✅ Ich poste in diesem Server keinen Vers des Tages mehr.",
+        'votd_bad_time': "❌ Bitte gib die Uhrzeit als `HH:MM` an, z.B. `07:30`.",
+        'votd_bad_timezone': "❌ Unbekannte Zeitzone `{timezone}`. Bitte verwende einen Namen wie `Europe/Berlin`.",
+        'votd_unknown_translation': "❌ Unbekannte Übersetzung: {code}. Mit /bibel-list siehst du die verfügbaren.",
+    },
+}
+
+
+# Set up Discord bot with the intents and caches of the configured gateway profile,
+# running all shards of this process over one connection each
+bot = discord.AutoShardedBot( **client_options(), **shard_options() )
+
+# Per-guild settings (e.g., channels with passive reference detection)
+guild_settings = GuildSettings( GUILD_SETTINGS_FILE )
+
+# Per-user, per-channel and per-guild limits; guilds can override them with a "rate_limits" setting
+RATE_LIMITER = RateLimiter( guild_limits=lambda guild_id: guild_settings.get( guild_id, 'rate_limits', {} ) )
+
+# Final reply messages of successful commands, keyed by response_cache_key(); they expire
+# with the passages they were rendered from, so refreshed passages reach the replies too
+RESPONSE_CACHE = LRUCache(
+    max_entries=RESPONSE_CACHE_SIZE,
+    max_age=PASSAGE_MAX_AGE,
+    name='responses',
+    codec=ZlibCodec( encode=json.dumps, decode=json.loads )
+)
+
+# Replies still being completed after the command budget ran out
+_BACKGROUND_TASKS = set()
+
+# Periodic metrics export, started once the bot is connected
+_metrics_task = None
+
+# Cache warm-up and periodic saving of the popularity scores, started once the bot is connected
+_popularity_task = None
+
+# Verse of the day deliveries, started once the bot is connected
+_votd_task = None
 
 
 @bot.event
@@ -34,8 +179,139 @@ async def on_ready():
     Called when the bot is ready and connected to Discord.
     """
     print( f'Bot logged in as {bot.user}' )
-    print( f'Connected to {len( bot.guilds )} server(s)' )
+    print( f'Connected to {len( bot.guilds )} server(s) on shard(s) {sorted( bot.shards )} of {bot.shard_count}' )
+    print( f'Using the {GATEWAY_PROFILE} gateway profile' )
     print( 'Ready to respond to Bible slash commands!' )
+    
+    # on_ready runs again after reconnects; start the export only once
+    global _metrics_task
+    if METRICS_FILE and _metrics_task is None:
+        _metrics_task = asyncio.create_task( export_metrics() )
+    
+    global _popularity_task
+    if _popularity_task is None:
+        _popularity_task = asyncio.create_task( track_popularity() )
+    
+    global _votd_task
+    if _votd_task is None:
+        _votd_task = asyncio.create_task( VOTD.run() )
+
+
+async def export_metrics():
+    """
+    Writes the metrics (counters, queue depths, wait times) to METRICS_FILE periodically.
+    """
+    while True:
+        await asyncio.to_thread( METRICS.write, METRICS_FILE )
+        await asyncio.sleep( METRICS_INTERVAL )
+
+
+async def track_popularity():
+    """
+    Loads the most popular passages into the cache, then saves the popularity scores periodically.
+    """
+    await warm_up( partial( warm_passage, BIBLE_API_KEY ), POPULARITY )
+    
+    while True:
+        await asyncio.sleep( POPULARITY_SAVE_INTERVAL )
+        await asyncio.to_thread( POPULARITY.save )
+
+
+async def defer( ctx ):
+    """
+    Shows the "thinking" indicator, giving the bot up to 15 minutes to reply.
+    
+    Args:
+        ctx: Discord context
+    """
+    METRICS.increment( 'discord.rest_calls' )
+    METRICS.increment( 'discord.defers' )
+    await ctx.defer()
+
+
+async def respond( ctx, content, **kwargs ):
+    """
+    Replies to a command (as the first response, or as a follow-up after defer()).
+    
+    Args:
+        ctx: Discord context
+        content: The message text
+        **kwargs: Passed on to ctx.respond() (e.g., view)
+    """
+    METRICS.increment( 'discord.rest_calls' )
+    await ctx.respond( content, **kwargs )
+
+
+async def edit_reply( ctx, content, **kwargs ):
+    """
+    Replaces the first reply to a command (e.g., a "still loading" message).
+    
+    Args:
+        ctx: Discord context
+        content: The new message text
+        **kwargs: Passed on to ctx.edit() (e.g., view)
+    """
+    METRICS.increment( 'discord.rest_calls' )
+    await ctx.edit( content=content, **kwargs )
+
+
+def run_in_background( coroutine ):
+    """
+    Runs a coroutine without waiting for it, keeping a reference until it is done.
+    """
+    task = asyncio.create_task( coroutine )
+    _BACKGROUND_TASKS.add( task )
+    task.add_done_callback( _BACKGROUND_TASKS.discard )
+
+
+async def run_blocking( ctx, func, *args, lane=LANE_INTERACTIVE, **kwargs ):
+    """
+    Runs blocking work through the scheduler, deferring the interaction only if it is slow.
+    
+    Work that finishes within DEFER_AFTER seconds (e.g., served from a cache)
+    is answered directly, saving the defer round-trip to Discord.
+    
+    Args:
+        ctx: Discord context
+        func: The blocking function
+        *args, **kwargs: Passed on to func
+        lane: The scheduler lane (see scheduler.LANES)
+        
+    Returns:
+        The return value of func
+        
+    Raises:
+        JobShed: If the scheduler dropped the work under overload
+    """
+    task = asyncio.ensure_future( SCHEDULER.run( func, *args, lane=lane, guild_id=ctx.guild_id, **kwargs ) )
+    done, _ = await asyncio.wait( {task}, timeout=DEFER_AFTER )
+    
+    if not done:
+        await defer( ctx )
+    
+    return await task
+
+
+async def within_rate_limit( ctx, kind, messages ):
+    """
+    Counts a command against the rate limits, replying privately if it is over one.
+    
+    Args:
+        ctx: Discord context
+        kind: KIND_HIT for answers from the response cache, KIND_MISS otherwise
+        messages: The MESSAGES entry for the command language
+        
+    Returns:
+        True if the command may be answered
+    """
+    retry_after = RATE_LIMITER.check( kind, ctx.author.id, ctx.channel_id, ctx.guild_id )
+    
+    if not retry_after:
+        return True
+    
+    METRICS.increment( 'commands.rate_limited' )
+    await respond( ctx, messages['rate_limited'].format( seconds=math.ceil( retry_after ) ), ephemeral=True )
+    return False
 
 
 def get_translations_list( language='English' ):
@@ -51,6 +327,10 @@ def get_translations_list( language='English' ):
     api = BibleAPI( BIBLE_API_KEY )
     bibles = api.get_available_bibles()
     
+    # The translation options suggest the catalog's translations from now on
+    if bibles:
+        TRANSLATION_INDEX.index_catalog( bibles )
+    
     # Filter by language
     if language == 'German':
         filtered = [b for b in bibles if 'German' in b.get( 'language', {} ).get( 'name', '' )]
@@ -80,134 +360,1262 @@ def get_translations_list( language='English' ):
     return "\n".join( lines )
 
 
-@bot.slash_command( name="bible", description="Get a Bible verse in English" )
-async def bible_command( 
-    ctx,
-    reference: discord.Option( str, "Bible reference (e.g., Gen 1:1, John 3:16)", required=True ),
-    translation: discord.Option( str, "Translation code (e.g., KJV, ASV, BSB)", required=False, default=None )
-):
+def localize_result( result, is_german ):
     """
-    Slash command to fetch English Bible verses.
+    Replaces the error of a result that was not fetched because of overload with the localized message.
     
     Args:
-        ctx: Discord context
-        reference: Bible reference string
+        result: A result dictionary from fetch_verse() or fetch_verses()
+        is_german: Whether this is for the German command
+        
+    Returns:
+        The result, or a copy with the localized error
+    """
+    if result.get( 'degraded' ):
+        return dict( result, error=MESSAGES['de' if is_german else 'en']['degraded'] )
+    return result
+
+
+def fetch_chunk( chunk, translation, is_german, deadline=None ):
+    """
+    Loads one chunk of a long passage for a PassagePager.
+    
+    Args:
+        chunk: The parsed reference dictionary of the chunk
         translation: Optional translation code
+        is_german: Whether this is the German command
+        deadline: Optional Deadline for the request
+        
+    Returns:
+        The result dictionary from fetch_verse(), with a localized overload error
+    """
+    result = fetch_verse( BIBLE_API_KEY, chunk, translation, is_german, PASSAGE_FORMAT, deadline )
+    return localize_result( result, is_german )
+
+
+def format_passage_block( ref, result, show_reference_on_error=False ):
     """
-    await ctx.defer()  # Show "thinking" indicator
+    Formats one fetched reference for a Discord message.
     
-    # Parse the reference
-    from reference_parser import parse_reference
-    ref = parse_reference( reference )
+    Args:
+        ref: The parsed reference dictionary
+        result: The result dictionary from fetch_verses()
+        show_reference_on_error: Whether to name the reference in error messages
+        
+    Returns:
+        The formatted text block
+    """
+    formatted_ref = format_reference( ref )
     
-    if not ref:
-        await ctx.respond(
-            "❌ I couldn't understand that reference. Please use a format like:\n"
-            "`Gen 1:1` or `John 3:16` or `Gen 1:1-3`"
-        )
-        return
+    if result['success']:
+        return f"**{formatted_ref}** ({result['translation']})\n\n{result['text']}"
     
-    # Fetch the verse
-    result = fetch_verse( BIBLE_API_KEY, ref, translation, is_german=False )
+    if show_reference_on_error:
+        return f"❌ **{formatted_ref}**: {result['error']}"
     
-    # Send the response
-    if result['success']:
-        formatted_ref = format_reference( ref )
-        response = f"**{formatted_ref}** ({result['translation']})\n\n{result['text']}"
+    return f"❌ {result['error']}"
+
+
+class PassagePageView( discord.ui.View ):
+    """
+    Previous/next buttons for paging through a long passage.
+    Pages beyond those already loaded are fetched when "next" is pressed.
+    """
+    
+    def __init__( self, pager ):
+        super().__init__( timeout=900 )
+        self.pager = pager
+        self.index = 0
+        self._update_buttons()
+    
+    def _update_buttons( self ):
+        self.previous_button.disabled = not self.pager.has_page( self.index - 1 )
+        self.next_button.disabled = not self.pager.has_page( self.index + 1 )
+    
+    async def _show( self, interaction, index ):
+        # Pages that are already loaded are shown in a single call
+        if self.pager.is_ready( index ):
+            page = self._move_to( index, self.pager.get_page( index ) ) or self.pager.get_page( self.index )
+            METRICS.increment( 'discord.rest_calls' )
+            await interaction.response.edit_message( content=page, view=self )
+            return
         
-        # Discord has a 2000 character limit
-        if len( response ) > 2000:
-            response = response[:1997] + "..."
+        # Fetching the next chunk may take a while, so acknowledge the click first
+        METRICS.increment( 'discord.rest_calls', 2 )
+        await interaction.response.defer()
         
-        await ctx.respond( response )
-    else:
-        await ctx.respond( f"❌ {result['error']}" )
+        try:
+            page = await SCHEDULER.run( self.pager.get_page, index, guild_id=interaction.guild_id )
+            page = self._move_to( index, page ) or await SCHEDULER.run( self.pager.get_page, self.index )
+        except JobShed:
+            # Too busy; the click is acknowledged and the page stays as it is
+            return
+        
+        await interaction.edit_original_response( content=page, view=self )
+    
+    def _move_to( self, index, page ):
+        """
+        Moves to a page if it exists and updates the buttons.
+        
+        Returns:
+            The page, or None if it does not exist
+        """
+        if page is not None:
+            self.index = index
+        self._update_buttons()
+        return page
+    
+    @discord.ui.button( label="◀", style=discord.ButtonStyle.secondary )
+    async def previous_button( self, button, interaction ):
+        await self._show( interaction, self.index - 1 )
+    
+    @discord.ui.button( label="▶", style=discord.ButtonStyle.secondary )
+    async def next_button( self, button, interaction ):
+        await self._show( interaction, self.index + 1 )
+    
+    async def on_timeout( self ):
+        self.disable_all_items()
+        if self.message:
+            await self.message.edit( view=self )
 
 
-@bot.slash_command( name="bibel", description="Hol dir einen Bibelvers auf Deutsch" )
-async def bibel_command( 
-    ctx,
-    reference: discord.Option( str, "Bibelstelle (z.B., 1. Mose 1,1 oder Johannes 3,16)", required=True ),
-    translation: discord.Option( str, "Übersetzung (z.B., Elberfelder, Luther)", required=False, default=None )
-):
+def first_page_reply( pager, page ):
     """
-    Slash command to fetch German Bible verses.
+    Builds the reply for the first page of a passage.
+    
+    Args:
+        pager: The PassagePager
+        page: The rendered first page, or None if it could not be loaded
+        
+    Returns:
+        A tuple (content, kwargs for respond()/edit_reply())
+    """
+    if page is None:
+        return f"❌ {pager.error or 'Request timed out'}", {}
+    
+    if pager.complete and pager.page_count == 1:
+        return page, {}
+    
+    return page, {'view': PassagePageView( pager )}
+
+
+async def send_paged_passage( ctx, ref, translation, is_german, deadline ):
+    """
+    Sends one passage, splitting it into pages if it is too long for one message.
+    
+    Long passages are fetched chunk by chunk: the first page is sent as soon as
+    its chunk is available, the rest is fetched when the user turns the page.
+    If the first chunk does not arrive before the deadline, a "still loading"
+    reply is sent and edited once the passage is there.
     
     Args:
         ctx: Discord context
-        reference: Bible reference string
+        ref: The parsed reference dictionary
         translation: Optional translation code
+        is_german: Whether this is the German command
+        deadline: The command's Deadline
+        
+    Returns:
+        The sent messages if the reply can be reused from the response cache, otherwise None
     """
-    await ctx.defer()  # Show "thinking" indicator
+    chunks = [
+        ( format_reference( chunk ), partial( fetch_chunk, chunk, translation, is_german ) )
+        for chunk in split_reference( ref )
+    ]
+    pager = PassagePager( format_reference( ref ), chunks )
     
-    # Parse the reference
-    from reference_parser import parse_reference
-    ref = parse_reference( reference )
+    first_page = await run_blocking( ctx, pager.get_page, 0, deadline )
     
-    if not ref:
-        await ctx.respond(
-            "❌ Ich konnte diese Stelle nicht verstehen. Bitte verwende ein Format wie:\n"
-            "`1. Mose 1,1` oder `Johannes 3,16` oder `1. Mose 1,1-3`"
+    if first_page is None and pager.timed_out:
+        await send_loading( ctx, pager.title, is_german )
+        run_in_background( finish_paged_passage( ctx, pager ) )
+        return None
+    
+    content, kwargs = first_page_reply( pager, first_page )
+    await respond( ctx, content, **kwargs )
+    
+    # Expired copies used because the fetch failed are shown, but not reused
+    if first_page is not None and not kwargs and not pager.stale:
+        return ( first_page, )
+    
+    return None
+
+
+async def finish_paged_passage( ctx, pager ):
+    """
+    Loads the first page without the command budget and replaces the "still loading" reply.
+    """
+    try:
+        first_page = await SCHEDULER.run( pager.get_page, 0, guild_id=ctx.guild_id )
+    except JobShed:
+        first_page = None
+    
+    content, kwargs = first_page_reply( pager, first_page )
+    await edit_reply( ctx, content, **kwargs )
+
+
+async def send_loading( ctx, reference, is_german ):
+    """
+    Sends a quick "still loading" reply when the command budget runs out.
+    
+    Args:
+        ctx: Discord context
+        reference: The formatted reference being loaded
+        is_german: Whether this is the German command
+    """
+    METRICS.increment( 'deadline.loading_replies' )
+    messages = MESSAGES['de' if is_german else 'en']
+    await respond( ctx, messages['loading'].format( reference=reference ) )
+
+
+def render_passages( refs, results, is_german ):
+    """
+    Renders several fetched references into as few messages as Discord allows.
+    
+    Args:
+        refs: The parsed reference dictionaries
+        results: The result dictionaries from fetch_verses()
+        is_german: Whether this is the German command
+        
+    Returns:
+        A tuple (messages, complete) where complete is False if any reference failed
+        or was served from an expired cache entry
+    """
+    blocks = [
+        format_passage_block( ref, localize_result( result, is_german ), show_reference_on_error=True )
+        for ref, result in zip( refs, results )
+    ]
+    return tuple( pack_blocks( blocks ) ), all( result['success'] and not result.get( 'stale' ) for result in results )
+
+
+async def finish_passages( ctx, refs, translation, is_german ):
+    """
+    Fetches several references without the command budget and replaces the "still loading" reply.
+    """
+    try:
+        results = await SCHEDULER.run(
+            fetch_verses, BIBLE_API_KEY, refs, translation, is_german,
+            output_format=PASSAGE_FORMAT, guild_id=ctx.guild_id
         )
+    except JobShed:
+        await edit_reply( ctx, MESSAGES['de' if is_german else 'en']['busy'] )
         return
     
-    # Fetch the verse
-    result = fetch_verse( BIBLE_API_KEY, ref, translation, is_german=True )
+    rendered, _ = render_passages( refs, results, is_german )
     
-    # Send the response
-    if result['success']:
-        formatted_ref = format_reference( ref )
-        response = f"**{formatted_ref}** ({result['translation']})\n\n{result['text']}"
-        
-        # Discord has a 2000 character limit
-        if len( response ) > 2000:
-            response = response[:1997] + "..."
+    await edit_reply( ctx, rendered[0] )
+    for text in rendered[1:]:
+        await respond( ctx, text )
+
+
+@lru_cache( maxsize=RESPONSE_CACHE_SIZE )
+def response_cache_key( reference, translation, is_german ):
+    """
+    Builds the response cache key for a command, or None if the input is invalid.
+    
+    Different spellings of the same request ("Joh 3:16", "John 3:16") share a key
+    made of the canonical references, the Bible ID, the locale and the output
+    format. Memoized, so a repeated command costs one lookup here.
+    
+    Args:
+        reference: Reference string as typed by the user
+        translation: Optional translation code
+        is_german: Whether this is the German command
         
-        await ctx.respond( response )
-    else:
-        await ctx.respond( f"❌ {result['error']}" )
+    Returns:
+        A hashable key, or None
+    """
+    refs = parse_references( reference )
+    
+    if not refs or len( refs ) > MAX_REFERENCES:
+        return None
+    
+    default = 'DEFAULT_GERMAN' if is_german else 'DEFAULT_ENGLISH'
+    
+    return (
+        tuple( format_reference( ref ) for ref in refs ),
+        get_bible_id( translation, default ),
+        'de' if is_german else 'en',
+        PASSAGE_FORMAT
+    )
 
 
-@bot.slash_command( name="bible-list", description="List available English Bible translations" )
-async def bible_list_command( ctx ):
+async def send_passages( ctx, reference, translation, is_german ):
     """
-    Slash command to list available English translations.
+    Parses one or more references, fetches them concurrently and replies.
+    
+    Successful replies that fit in plain messages are kept in the response
+    cache, so a repeated command is answered without parsing or rendering,
+    and without deferring first.
+    
+    Every stage runs against one Deadline of COMMAND_BUDGET seconds. Upstream
+    requests are cut off when it passes; older cached copies are used where
+    available, otherwise a "still loading" reply is sent and edited later.
+    
+    Cache hits and misses are counted against separate rate limits, since
+    only misses can use the API.Bible quota.
+    
+    Args:
+        ctx: Discord context
+        reference: Reference string, possibly with several references (e.g., "Rom 3:23; Rom 6:23")
+        translation: Optional translation code
+        is_german: Whether this is the German command
     """
-    await ctx.defer()
-    translations_list = get_translations_list( 'English' )
-    await ctx.respond( translations_list )
+    deadline = Deadline( COMMAND_BUDGET )
+    messages = MESSAGES['de' if is_german else 'en']
+    METRICS.increment( 'commands' )
+    
+    with deadline.stage( 'parse' ):
+        key = response_cache_key( reference, translation, is_german )
+    
+    with deadline.stage( 'cache' ):
+        cached = RESPONSE_CACHE.get( key ) if key else None
+    
+    # Answer from memory without the defer round-trip
+    if cached:
+        if not await within_rate_limit( ctx, KIND_HIT, messages ):
+            return
+        
+        METRICS.increment( 'commands.cached' )
+        for text in cached:
+            await respond( ctx, text )
+        read_ahead( ctx, parse_references( reference ), translation, is_german )
+        return
+    
+    # Parse all references in one pass
+    with deadline.stage( 'parse' ):
+        refs = parse_references( reference )
+    
+    if not refs:
+        await respond( ctx, messages['parse_error'] )
+        return
+    
+    if len( refs ) > MAX_REFERENCES:
+        await respond( ctx, messages['too_many'].format( max=MAX_REFERENCES ) )
+        return
+    
+    if not await within_rate_limit( ctx, KIND_MISS, messages ):
+        return
+    
+    try:
+        rendered = await fetch_and_send( ctx, refs, translation, is_german, deadline )
+    except JobShed:
+        METRICS.increment( 'commands.shed' )
+        await respond( ctx, messages['busy'] )
+        return
+    
+    if rendered:
+        RESPONSE_CACHE.put( key, rendered )
+    
+    read_ahead( ctx, refs, translation, is_german )
 
 
-@bot.slash_command( name="bibel-list", description="Liste verfügbarer deutscher Bibelübersetzungen" )
-async def bibel_list_command( ctx ):
+def read_ahead( ctx, refs, translation, is_german ):
     """
-    Slash command to list available German translations.
+    Starts loading the passage that follows the last reference in the background,
+    unless the guild turned read-ahead off or its read-ahead rate limit is reached.
+    
+    Args:
+        ctx: Discord context
+        refs: The parsed reference dictionaries of the command
+        translation: Optional translation code
+        is_german: Whether this is the German command
     """
-    await ctx.defer()
-    translations_list = get_translations_list( 'German' )
-    await ctx.respond( translations_list )
+    if not PREFETCH_ENABLED or not refs:
+        return
+    
+    if ctx.guild_id is not None and not guild_settings.get( ctx.guild_id, 'prefetch', True ):
+        return
+    
+    if RATE_LIMITER.check( KIND_PREFETCH, ctx.author.id, ctx.channel_id, ctx.guild_id ):
+        return
+    
+    run_in_background( prefetch_next(
+        partial( prefetch_passage, BIBLE_API_KEY ), refs[-1], translation, is_german, ctx.guild_id
+    ) )
 
 
-@bot.event
-async def on_application_command_error( ctx, error ):
+async def fetch_and_send( ctx, refs, translation, is_german, deadline ):
     """
-    Called when a slash command error occurs.
+    Fetches parsed references and replies with them.
     
     Args:
         ctx: Discord context
-        error: The error that occurred
+        refs: The parsed reference dictionaries
+        translation: Optional translation code
+        is_german: Whether this is the German command
+        deadline: The command's Deadline
+        
+    Returns:
+        The sent messages if the reply can be reused from the response cache, otherwise None
     """
-    import traceback
-    print( f'Slash command error:' )
-    traceback.print_exc()
-    await ctx.respond( f"❌ An error occurred: {str( error )}" )
+    if len( refs ) == 1:
+        return await send_paged_passage( ctx, refs[0], translation, is_german, deadline )
+    
+    # Fetch all references concurrently without blocking the event loop
+    results = await run_blocking(
+        ctx, fetch_verses, BIBLE_API_KEY, refs, translation, is_german,
+        output_format=PASSAGE_FORMAT, deadline=deadline
+    )
+    
+    if any( result.get( 'timed_out' ) for result in results ):
+        await send_loading( ctx, "; ".join( format_reference( ref ) for ref in refs ), is_german )
+        run_in_background( finish_passages( ctx, refs, translation, is_german ) )
+        return None
+    
+    with deadline.stage( 'render' ):
+        rendered, complete = render_passages( refs, results, is_german )
+    
+    for text in rendered:
+        await respond( ctx, text )
+    
+    # Errors may be temporary and expired copies are refreshed later, so only complete answers are reused
+    return rendered if complete else None
 
 
-def main():
+def reference_choices( ctx, language ):
     """
-    Main entry point for the bot.
+    Autocomplete suggestions for a reference option, from the book alias and canon tables only.
+    
+    Args:
+        ctx: The AutocompleteContext; ctx.value is the text typed so far
+        language: 'en' or 'de'
+        
+    Returns:
+        A list of reference strings
     """
-    print( 'Starting Discord Bible Bot...' )
+    METRICS.increment( 'autocomplete.references' )
+    return suggest_references( ctx.value, language )
+
+
+def translation_choices( ctx, language ):
+    """
+    Autocomplete suggestions for a translation option, from the translation index only.
+    
+    Args:
+        ctx: The AutocompleteContext; ctx.value is the text typed so far
+        language: 'en' or 'de'
+        
+    Returns:
+        A list of OptionChoices
+    """
+    METRICS.increment( 'autocomplete.translations' )
+    return [discord.OptionChoice( name=name, value=value ) for name, value in TRANSLATION_INDEX.suggest( ctx.value, language )]
+
+
+async def reference_choices_en( ctx ):
+    """
+    Autocomplete for the reference option of the English command.
+    """
+    return reference_choices( ctx, 'en' )
+
+
+async def reference_choices_de( ctx ):
+    """
+    Autocomplete for the reference option of the German command.
+    """
+    return reference_choices( ctx, 'de' )
+
+
+async def translation_choices_en( ctx ):
+    """
+    Autocomplete for the translation option of the English command.
+    """
+    return translation_choices( ctx, 'en' )
+
+
+async def translation_choices_de( ctx ):
+    """
+    Autocomplete for the translation option of the German command.
+    """
+    return translation_choices( ctx, 'de' )
+
+
+@bot.slash_command( name="bible", description="Get a Bible verse in English" )
+async def bible_command( 
+    ctx,
+    reference: discord.Option( str, "Bible reference(s) (e.g., Gen 1:1, John 3:16; Rom 8:28)", required=True, autocomplete=reference_choices_en ),
+    translation: discord.Option( str, "Translation code (e.g., KJV, ASV, BSB)", required=False, default=None, autocomplete=translation_choices_en )
+):
+    """
+    Slash command to fetch English Bible verses.
+    
+    Args:
+        ctx: Discord context
+        reference: Bible reference string
+        translation: Optional translation code
+    """
+    await send_passages( ctx, reference, translation, is_german=False )
+
+
+@bot.slash_command( name="bibel", description="Hol dir einen Bibelvers auf Deutsch" )
+async def bibel_command( 
+    ctx,
+    reference: discord.Option( str, "Bibelstelle(n) (z.B., 1. Mose 1,1 oder Johannes 3,16; Röm 8,28)", required=True, autocomplete=reference_choices_de ),
+    translation: discord.Option( str, "Übersetzung (z.B., Elberfelder, Luther)", required=False, default=None, autocomplete=translation_choices_de )
+):
+    """
+    Slash command to fetch German Bible verses.
+    
+    Args:
+        ctx: Discord context
+        reference: Bible reference string
+        translation: Optional translation code
+    """
+    await send_passages( ctx, reference, translation, is_german=True )
+
+
+def parse_translation_codes( text ):
+    """
+    Splits a list of translation codes (e.g., "KJV, ASV BSB") and drops
+    codes that resolve to the same Bible as an earlier one.
+    
+    Returns:
+        A tuple (codes, unknown): the usable codes in order, and codes get_bible_id() does not know
+    """
+    codes = []
+    unknown = []
+    seen = set()
+    
+    for code in text.replace( ',', ' ' ).replace( ';', ' ' ).split():
+        if not is_known_translation( code ):
+            unknown.append( code )
+            continue
+        
+        bible_id = get_bible_id( code )
+        if bible_id not in seen:
+            seen.add( bible_id )
+            codes.append( code )
+    
+    return codes, unknown
+
+
+def render_comparison( ref, codes, results, is_german ):
+    """
+    Renders one reference in several translations, verse by verse, in as few messages as Discord allows.
+    
+    Translations that ran out of time are named with a note instead of
+    being waited for; the others are shown as usual.
+    
+    Args:
+        ref: The parsed reference dictionary
+        codes: The translation codes, in the order of the results
+        results: The result dictionaries from fetch_translations()
+        is_german: Whether this is the German command
+        
+    Returns:
+        A list of message strings
+    """
+    messages = MESSAGES['de' if is_german else 'en']
+    fetched = [result for result in results if result['success']]
+    labels = [result['translation'] for result in fetched]
+    
+    blocks = [f"**{format_reference( ref )}** · {' · '.join( labels )}"] if fetched else []
+    blocks.extend( render_parallel( [result['passage'] for result in fetched], labels ) )
+    
+    for code, result in zip( codes, results ):
+        if result.get( 'timed_out' ):
+            blocks.append( messages['compare_timed_out'].format( code=code ) )
+        elif not result['success']:
+            blocks.append( f"❌ {localize_result( result, is_german )['error']}" )
+    
+    return pack_blocks( blocks )
+
+
+async def send_comparison( ctx, reference, translations, is_german ):
+    """
+    Fetches one reference in several translations concurrently and replies with them side by side.
+    
+    Args:
+        ctx: Discord context
+        reference: Reference string with a single reference
+        translations: Translation codes separated by commas or spaces
+        is_german: Whether this is the German command
+    """
+    messages = MESSAGES['de' if is_german else 'en']
+    METRICS.increment( 'commands' )
+    METRICS.increment( 'commands.compare' )
+    
+    refs = parse_references( reference )
+    if not refs:
+        await respond( ctx, messages['parse_error'] )
+        return
+    
+    if len( refs ) > 1:
+        await respond( ctx, messages['compare_one'] )
+        return
+    
+    codes, unknown = parse_translation_codes( translations )
+    if unknown:
+        await respond( ctx, messages['compare_unknown'].format( codes=', '.join( unknown ) ) )
+        return
+    
+    if not 2 <= len( codes ) <= COMPARE_MAX_TRANSLATIONS:
+        await respond( ctx, messages['compare_count'].format( max=COMPARE_MAX_TRANSLATIONS ) )
+        return
+    
+    ref = refs[0]
+    if sum( segment_verse_count( segment ) for segment in ref.get( 'segments' ) or [ref] ) > COMPARE_MAX_VERSES:
+        await respond( ctx, messages['compare_too_long'].format( max=COMPARE_MAX_VERSES ) )
+        return
+    
+    if not await within_rate_limit( ctx, KIND_MISS, messages ):
+        return
+    
+    deadline = Deadline( COMMAND_BUDGET )
+    
+    try:
+        results = await run_blocking(
+            ctx, fetch_translations, BIBLE_API_KEY, ref, codes,
+            output_format=PASSAGE_FORMAT, deadline=deadline
+        )
+    except JobShed:
+        METRICS.increment( 'commands.shed' )
+        await respond( ctx, messages['busy'] )
+        return
+    
+    if any( result.get( 'timed_out' ) for result in results ):
+        METRICS.increment( 'deadline.compare_timeouts' )
+    
+    for text in render_comparison( ref, codes, results, is_german ):
+        await respond( ctx, text )
+
+
+@bot.slash_command( name="bible-compare", description="Compare a Bible passage in several translations" )
+async def bible_compare_command(
+    ctx,
+    reference: discord.Option( str, "Bible reference (e.g., John 3:16)", required=True ),
+    translations: discord.Option( str, "Translation codes separated by commas (e.g., KJV, ASV, BSB)", required=True )
+):
+    """
+    Slash command to compare translations (English).
+    """
+    await send_comparison( ctx, reference, translations, is_german=False )
+
+
+@bot.slash_command( name="bibel-vergleich", description="Eine Bibelstelle in mehreren Übersetzungen vergleichen" )
+async def bibel_vergleich_command(
+    ctx,
+    reference: discord.Option( str, "Bibelstelle (z.B., Johannes 3,16)", required=True ),
+    translations: discord.Option( str, "Übersetzungen, durch Kommas getrennt (z.B., LUTHER, KJV)", required=True )
+):
+    """
+    Slash command to compare translations (German).
+    """
+    await send_comparison( ctx, reference, translations, is_german=True )
+
+
+def render_search_page( index, query, matches, total, page, translation, is_german ):
+    """
+    Renders one page of search results.
+    
+    Args:
+        index: The SearchIndex the matches come from
+        query: The query as the user typed it
+        matches: The ranked verse numbers from SearchIndex.search()
+        total: The number of matching verses
+        page: The page number (0-based)
+        translation: The translation name
+        is_german: Whether this is the German command
+        
+    Returns:
+        The message text
+    """
+    messages = MESSAGES['de' if is_german else 'en']
+    terms = {term for group in parse_query( query ) for term in group}
+    pages = math.ceil( len( matches ) / SEARCH_PAGE_SIZE )
+    
+    header = messages['search_header'].format( query=query[:100], translation=translation, total=total )
+    if pages > 1:
+        header += f" · {page + 1}/{pages}"
+    
+    lines = [header, ""]
+    for number in matches[page * SEARCH_PAGE_SIZE:( page + 1 ) * SEARCH_PAGE_SIZE]:
+        book, chapter, verse, text = index.verse( number )
+        lines.append( f"**{book} {chapter}:{verse}** {snippet( text, terms )}" )
+    
+    return "\n".join( lines )
+
+
+class SearchPageView( discord.ui.View ):
+    """
+    Previous/next buttons for paging through search results.
+    The results are kept, so pages are rendered from the index without searching again.
+    """
+    
+    def __init__( self, render, pages ):
+        super().__init__( timeout=900 )
+        self.render = render
+        self.pages = pages
+        self.index = 0
+        self._update_buttons()
+    
+    def _update_buttons( self ):
+        self.previous_button.disabled = self.index <= 0
+        self.next_button.disabled = self.index >= self.pages - 1
+    
+    async def _show( self, interaction, index ):
+        self.index = max( 0, min( index, self.pages - 1 ) )
+        self._update_buttons()
+        METRICS.increment( 'discord.rest_calls' )
+        await interaction.response.edit_message( content=self.render( self.index ), view=self )
+    
+    @discord.ui.button( label="◀", style=discord.ButtonStyle.secondary )
+    async def previous_button( self, button, interaction ):
+        await self._show( interaction, self.index - 1 )
+    
+    @discord.ui.button( label="▶", style=discord.ButtonStyle.secondary )
+    async def next_button( self, button, interaction ):
+        await self._show( interaction, self.index + 1 )
+    
+    async def on_timeout( self ):
+        self.disable_all_items()
+        if self.message:
+            await self.message.edit( view=self )
+
+
+async def send_search( ctx, query, translation, is_german ):
+    """
+    Searches a mirrored translation and replies with the best matching verses, a page at a time.
+    No API.Bible requests are made.
+    
+    Args:
+        ctx: Discord context
+        query: Words to search for; quoted words must occur as a phrase
+        translation: Optional translation code
+        is_german: Whether this is the German command
+    """
+    messages = MESSAGES['de' if is_german else 'en']
+    METRICS.increment( 'commands' )
+    METRICS.increment( 'commands.search' )
+    
+    bible_id = get_bible_id( translation, 'DEFAULT_GERMAN' if is_german else 'DEFAULT_ENGLISH' )
+    name = DISPLAY_NAMES.get( bible_id, translation or bible_id )
+    
+    if not parse_query( query ):
+        await respond( ctx, messages['search_empty_query'] )
+        return
+    
+    index = SEARCH_INDEXES.get( bible_id ) if not translation or is_known_translation( translation ) else None
+    if index is None:
+        await respond( ctx, messages['search_unavailable'].format( translation=name ) )
+        return
+    
+    if not await within_rate_limit( ctx, KIND_HIT, messages ):
+        return
+    
+    try:
+        matches, total = await run_blocking( ctx, index.search, query )
+    except JobShed:
+        METRICS.increment( 'commands.shed' )
+        await respond( ctx, messages['busy'] )
+        return
+    
+    if not matches:
+        await respond( ctx, messages['search_no_results'].format( translation=name, query=query[:100] ) )
+        return
+    
+    render = partial( render_search_page, index, query, matches, total, translation=name, is_german=is_german )
+    pages = math.ceil( len( matches ) / SEARCH_PAGE_SIZE )
+    
+    if pages == 1:
+        await respond( ctx, render( 0 ) )
+    else:
+        await respond( ctx, render( 0 ), view=SearchPageView( render, pages ) )
+
+
+@bot.slash_command( name="bible-search", description="Search the Bible for words or a phrase" )
+async def bible_search_command(
+    ctx,
+    query: discord.Option( str, "Words to find (e.g., faith hope love); use quotes for a phrase", required=True ),
+    translation: discord.Option( str, "Translation code (e.g., KJV)", required=False, default=None )
+):
+    """
+    Slash command to search the Bible (English).
+    """
+    await send_search( ctx, query, translation, is_german=False )
+
+
+@bot.slash_command( name="bibel-suche", description="Die Bibel nach Wörtern oder einem Satz durchsuchen" )
+async def bibel_suche_command(
+    ctx,
+    query: discord.Option( str, "Gesuchte Wörter (z.B., Glaube Hoffnung Liebe); Anführungszeichen für einen Satz", required=True ),
+    translation: discord.Option( str, "Übersetzung (z.B., LUTHER)", required=False, default=None )
+):
+    """
+    Slash command to search the Bible (German).
+    """
+    await send_search( ctx, query, translation, is_german=True )
+
+
+def lookup_cross_references( ref, translation, is_german, deadline=None ):
+    """
+    Finds the passages related to a reference and the text of their first verses.
+    Blocking; the previews are fetched concurrently and served from the passage cache where possible.
+    Previews still missing when the deadline passes are left out, and fetching them
+    does not count as looking the passages up (popularity, read-ahead).
+    
+    Args:
+        ref: The parsed reference dictionary
+        translation: Optional translation code for the previews
+        is_german: Whether this is the German command
+        deadline: Optional Deadline for the previews
+        
+    Returns:
+        A list of (reference dictionary, preview result) tuples, most relevant first,
+        or None if no cross reference dataset is installed
+    """
+    xrefs = get_cross_references()
+    
+    if xrefs is None:
+        return None
+    
+    targets = [target for target, _ in related_references( xrefs, ref )]
+    first_verses = [parse_reference( f"{target['book']} {target['chapter']}:{target['verse_start']}" ) for target in targets]
+    previews = fetch_verses(
+        BIBLE_API_KEY, first_verses, translation, is_german,
+        output_format='compact', deadline=deadline, track=False
+    ) if targets else []
+    
+    return list( zip( targets, previews ) )
+
+
+def render_cross_references( ref, related, is_german ):
+    """
+    Renders the related passages of a reference with a short preview of each.
+    
+    Args:
+        ref: The parsed reference dictionary
+        related: The list from lookup_cross_references()
+        is_german: Whether this is the German command
+        
+    Returns:
+        A list of message strings
+    """
+    messages = MESSAGES['de' if is_german else 'en']
+    lines = [messages['xref_header'].format( reference=format_reference( ref ) )]
+    
+    for target, preview in related:
+        line = f"**{format_reference( target )}**"
+        
+        if preview['success']:
+            text = preview['text']
+            if len( text ) > XREF_PREVIEW_LENGTH:
+                text = text[:text.rfind( ' ', 0, XREF_PREVIEW_LENGTH ) + 1 or XREF_PREVIEW_LENGTH].rstrip() + "…"
+            line += f" — {text}"
+        
+        lines.append( line )
+    
+    return pack_blocks( ["\n".join( lines )] )
+
+
+async def send_cross_references( ctx, reference, translation, is_german ):
+    """
+    Replies with the passages related to a reference.
+    
+    Args:
+        ctx: Discord context
+        reference: Reference string with a single reference
+        translation: Optional translation code for the previews
+        is_german: Whether this is the German command
+    """
+    messages = MESSAGES['de' if is_german else 'en']
+    METRICS.increment( 'commands' )
+    METRICS.increment( 'commands.xref' )
+    
+    refs = parse_references( reference )
+    if not refs:
+        await respond( ctx, messages['parse_error'] )
+        return
+    
+    if len( refs ) > 1:
+        await respond( ctx, messages['xref_one'] )
+        return
+    
+    if not await within_rate_limit( ctx, KIND_MISS, messages ):
+        return
+    
+    deadline = Deadline( COMMAND_BUDGET )
+    
+    try:
+        related = await run_blocking( ctx, lookup_cross_references, refs[0], translation, is_german, deadline )
+    except JobShed:
+        METRICS.increment( 'commands.shed' )
+        await respond( ctx, messages['busy'] )
+        return
+    
+    if related is None:
+        await respond( ctx, messages['xref_unavailable'] )
+    elif not related:
+        await respond( ctx, messages['xref_none'].format( reference=format_reference( refs[0] ) ) )
+    else:
+        for text in render_cross_references( refs[0], related, is_german ):
+            await respond( ctx, text )
+
+
+@bot.slash_command( name="bible-xref", description="List passages related to a Bible verse" )
+async def bible_xref_command(
+    ctx,
+    reference: discord.Option( str, "Bible reference (e.g., John 3:16)", required=True ),
+    translation: discord.Option( str, "Translation code for the previews (e.g., KJV)", required=False, default=None )
+):
+    """
+    Slash command to list cross references (English).
+    """
+    await send_cross_references( ctx, reference, translation, is_german=False )
+
+
+@bot.slash_command( name="bibel-verweise", description="Verwandte Stellen zu einem Bibelvers anzeigen" )
+async def bibel_verweise_command(
+    ctx,
+    reference: discord.Option( str, "Bibelstelle (z.B., Johannes 3,16)", required=True ),
+    translation: discord.Option( str, "Übersetzung für die Vorschau (z.B., LUTHER)", required=False, default=None )
+):
+    """
+    Slash command to list cross references (German).
+    """
+    await send_cross_references( ctx, reference, translation, is_german=True )
+
+
+def votd_subscriptions():
+    """
+    Verse of the day subscriptions of the guilds this process serves
+    (each shard cluster delivers to its own guilds).
+    
+    Returns:
+        A list of (guild_id, settings) pairs
+    """
+    return [
+        ( guild_id, settings ) for guild_id, settings in guild_settings.items( VOTD_SETTING )
+        if settings and bot.get_guild( guild_id ) is not None
+    ]
+
+
+async def render_votd( reference, translation, language ):
+    """
+    Loads a verse of the day (once for all channels that get it) and renders its message.
+    
+    Args:
+        reference: The reference string from votd.VOTD_PASSAGES
+        translation: Optional translation code
+        language: 'en' or 'de'
+        
+    Returns:
+        The message text, or None if the passage could not be loaded in time
+        (the scheduler tries again on its next tick)
+    """
+    ref = parse_reference( reference )
+    
+    try:
+        result = await SCHEDULER.run(
+            fetch_verse, BIBLE_API_KEY, ref, translation, language == 'de', PASSAGE_FORMAT,
+            deadline=Deadline( COMMAND_BUDGET ), lane=LANE_BACKGROUND
+        )
+    except JobShed:
+        return None
+    
+    if not result['success']:
+        return None
+    
+    block = format_passage_block( ref, result )
+    return pack_blocks( [f"{MESSAGES[language]['votd_title']}\n{block}"] )[0]
+
+
+async def send_votd( channel_id, content ):
+    """
+    Posts a verse of the day message to a channel.
+    
+    Returns:
+        True if the message was sent
+    """
+    channel = bot.get_channel( channel_id )
+    METRICS.increment( 'discord.rest_calls' )
+    
+    try:
+        if channel is None:
+            channel = await bot.fetch_channel( channel_id )
+            METRICS.increment( 'discord.rest_calls' )
+        await channel.send( content )
+    except ( discord.Forbidden, discord.NotFound ) as e:
+        print( f"Cannot post verse of the day to channel {channel_id}: {e}" )
+        return False
+    
+    return True
+
+
+# Daily verse deliveries of this process
+VOTD = VotdScheduler( votd_subscriptions, render_votd, send_votd )
+
+
+async def set_verse_of_the_day( ctx, enabled, channel, time, translation, timezone, language ):
+    """
+    Subscribes the server to the verse of the day, or cancels the subscription.
+    
+    Args:
+        ctx: Discord context
+        enabled: Whether to post the verse of the day
+        channel: The channel to post in, or None for the command's channel
+        time: Local time of day as "HH:MM"
+        translation: Optional translation code
+        timezone: IANA time zone name of the time
+        language: 'en' or 'de'
+    """
+    messages = MESSAGES[language]
+    
+    if not enabled:
+        guild_settings.set( ctx.guild_id, VOTD_SETTING, None )
+        await respond( ctx, messages['votd_off'] )
+        return
+    
+    at = parse_time( time )
+    if at is None:
+        await respond( ctx, messages['votd_bad_time'] )
+        return
+    
+    if get_zone( timezone ) is None:
+        await respond( ctx, messages['votd_bad_timezone'].format( timezone=timezone ) )
+        return
+    
+    if translation and not is_known_translation( translation ):
+        await respond( ctx, messages['votd_unknown_translation'].format( code=translation ) )
+        return
+    
+    channel_id = channel.id if channel else ctx.channel_id
+    guild_settings.set( ctx.guild_id, VOTD_SETTING, {
+        'channel_id': channel_id,
+        'time': at.strftime( '%H:%M' ),
+        'timezone': timezone,
+        'translation': translation.upper() if translation else None,
+        'language': language
+    } )
+    await respond( ctx, messages['votd_on'].format( channel=channel_id, time=at.strftime( '%H:%M' ), timezone=timezone ) )
+
+
+@bot.slash_command( name="bible-votd", description="Post a verse of the day to a channel every day" )
+@discord.guild_only()
+@discord.default_permissions( manage_guild=True )
+async def bible_votd_command(
+    ctx,
+    enabled: discord.Option( bool, "Turn the verse of the day on or off for this server", required=True ),
+    time: discord.Option( str, "Time of day (HH:MM)", required=False, default="08:00" ),
+    channel: discord.Option( discord.TextChannel, "Channel to post in (default: this channel)", required=False, default=None ),
+    translation: discord.Option( str, "Translation code (e.g., KJV)", required=False, default=None ),
+    timezone: discord.Option( str, "Time zone (e.g., America/New_York)", required=False, default="UTC" )
+):
+    """
+    Slash command to set up the verse of the day (English).
+    """
+    await set_verse_of_the_day( ctx, enabled, channel, time, translation, timezone, 'en' )
+
+
+@bot.slash_command( name="bibel-tagesvers", description="Jeden Tag einen Vers des Tages in einem Kanal posten" )
+@discord.guild_only()
+@discord.default_permissions( manage_guild=True )
+async def bibel_tagesvers_command(
+    ctx,
+    enabled: discord.Option( bool, "Vers des Tages für diesen Server ein- oder ausschalten", required=True ),
+    time: discord.Option( str, "Uhrzeit (HH:MM)", required=False, default="08:00" ),
+    channel: discord.Option( discord.TextChannel, "Kanal (Standard: dieser Kanal)", required=False, default=None ),
+    translation: discord.Option( str, "Übersetzung (z.B., LUTHER)", required=False, default=None ),
+    timezone: discord.Option( str, "Zeitzone (z.B., Europe/Berlin)", required=False, default="Europe/Berlin" )
+):
+    """
+    Slash command to set up the verse of the day (German).
+    """
+    await set_verse_of_the_day( ctx, enabled, channel, time, translation, timezone, 'de' )
+
+
+@bot.slash_command( name="bible-auto", description="Reply to Bible references mentioned in this channel" )
+@discord.guild_only()
+@discord.default_permissions( manage_channels=True )
+async def bible_auto_command(
+    ctx,
+    enabled: discord.Option( bool, "Turn automatic replies on or off", required=True )
+):
+    """
+    Slash command to turn passive reference detection on or off (English).
+    """
+    await set_auto_replies( ctx, enabled, 'en' )
+
+
+@bot.slash_command( name="bibel-auto", description="Auf Bibelstellen antworten, die in diesem Kanal erwähnt werden" )
+@discord.guild_only()
+@discord.default_permissions( manage_channels=True )
+async def bibel_auto_command(
+    ctx,
+    enabled: discord.Option( bool, "Automatische Antworten ein- oder ausschalten", required=True )
+):
+    """
+    Slash command to turn passive reference detection on or off (German).
+    """
+    await set_auto_replies( ctx, enabled, 'de' )
+
+
+async def set_auto_replies( ctx, enabled, language ):
+    """
+    Turns passive reference detection on or off for the command's channel.
+    
+    Uses only the IDs sent with the interaction, so it works without cached guilds or channels.
+    
+    Args:
+        ctx: Discord context
+        enabled: Whether to turn detection on
+        language: 'en' or 'de'
+    """
+    # Without the message content intent the bot never sees the messages
+    if not PASSIVE_DETECTION:
+        await respond( ctx, MESSAGES[language]['auto_unavailable'] )
+        return
+    
+    guild_settings.set_passive( ctx.guild_id, ctx.channel_id, language if enabled else None )
+    await respond( ctx, MESSAGES[language]['auto_on' if enabled else 'auto_off'] )
+
+
+@bot.slash_command( name="bible-prefetch", description="Load the next passage in advance after each lookup" )
+@discord.guild_only()
+@discord.default_permissions( manage_guild=True )
+async def bible_prefetch_command(
+    ctx,
+    enabled: discord.Option( bool, "Turn read-ahead on or off for this server", required=True )
+):
+    """
+    Slash command to turn read-ahead on or off for the server (English).
+    """
+    guild_settings.set( ctx.guild_id, 'prefetch', enabled )
+    await respond( ctx, MESSAGES['en']['prefetch_on' if enabled else 'prefetch_off'] )
+
+
+@bot.slash_command( name="bibel-prefetch", description="Nach jeder Abfrage die nächste Stelle im Voraus laden" )
+@discord.guild_only()
+@discord.default_permissions( manage_guild=True )
+async def bibel_prefetch_command(
+    ctx,
+    enabled: discord.Option( bool, "Vorausladen für diesen Server ein- oder ausschalten", required=True )
+):
+    """
+    Slash command to turn read-ahead on or off for the server (German).
+    """
+    guild_settings.set( ctx.guild_id, 'prefetch', enabled )
+    await respond( ctx, MESSAGES['de']['prefetch_on' if enabled else 'prefetch_off'] )
+
+
+@bot.event
+async def on_message( message ):
+    """
+    Replies to Bible references mentioned in channels with passive detection turned on.
+    
+    Args:
+        message: The Discord message
+    """
+    if message.author.bot:
+        return
+    
+    language = guild_settings.passive_language( message.channel.id )
+    if not language:
+        return
+    
+    # The detector's prefilters reject ordinary messages before any parsing
+    refs = find_references( message.content )
+    if not refs:
+        return
+    
+    # Automatic replies are skipped silently when over a limit
+    guild_id = message.guild.id if message.guild else None
+    if RATE_LIMITER.check( KIND_MISS, message.author.id, message.channel.id, guild_id ):
+        return
+    
+    try:
+        results = await SCHEDULER.run(
+            fetch_verses, BIBLE_API_KEY, refs, None, language == 'de',
+            lane=LANE_BACKGROUND, guild_id=guild_id
+        )
+    except JobShed:
+        return
+    
+    # Stay quiet about errors; the user did not ask the bot directly
+    blocks = [format_passage_block( ref, result ) for ref, result in zip( refs, results ) if result['success']]
+    
+    for text in pack_blocks( blocks ):
+        METRICS.increment( 'discord.rest_calls' )
+        await message.reply( text, mention_author=False )
+
+
+async def send_translations_list( ctx, language ):
+    """
+    Replies with the list of translations, fetching it only if it is not cached.
+    
+    Args:
+        ctx: Discord context
+        language: The language to list ('English' or 'German')
+    """
+    METRICS.increment( 'commands' )
+    
+    key = ( 'translations', language )
+    translations_list = RESPONSE_CACHE.get( key )
+    
+    if translations_list:
+        METRICS.increment( 'commands.cached' )
+    else:
+        try:
+            translations_list = await run_blocking( ctx, get_translations_list, language, lane=LANE_LIST )
+        except JobShed:
+            METRICS.increment( 'commands.shed' )
+            await respond( ctx, MESSAGES['de' if language == 'German' else 'en']['busy'] )
+            return
+        
+        if not translations_list.startswith( "❌" ):
+            RESPONSE_CACHE.put( key, translations_list )
+    
+    await respond( ctx, translations_list )
+
+
+@bot.slash_command( name="bible-list", description="List available English Bible translations" )
+async def bible_list_command( ctx ):
+    """
+    Slash command to list available English translations.
+    """
+    await send_translations_list( ctx, 'English' )
+
+
+@bot.slash_command( name="bibel-list", description="Liste verfügbarer deutscher Bibelübersetzungen" )
+async def bibel_list_command( ctx ):
+    """
+    Slash command to list available German translations.
+    """
+    await send_translations_list( ctx, 'German' )
+
+
+@bot.event
+async def on_application_command_error( ctx, error ):
+    """
+    Called when a slash command error occurs.
+    
+    Args:
+        ctx: Discord context
+        error: The error that occurred
+    """
+    import traceback
+    print( f'Slash command error:' )
+    traceback.print_exc()
+    await respond( ctx, f"❌ An error occurred: {str( error )}" )
+
+
+def main():
+    """
+    Main entry point for the bot.
+    """
+    print( 'Starting Discord Bible Bot...' )
+    print(
+        f"Loaded {ALIAS_TABLE_STATS['aliases']} book aliases for {ALIAS_TABLE_STATS['languages']} languages "
+        f"in {ALIAS_TABLE_STATS['load_ms']:.1f} ms ({ALIAS_TABLE_STATS['source']})"
+    )
+    
+    # Loads the cross reference snapshot (or builds it from the dataset) before the first /bible-xref
+    get_cross_references()
+    
+    # Suggests the translations of a catalog another process already fetched, without fetching it
+    TRANSLATION_INDEX.index_catalog( cached_catalog() )
+    print( f"Indexed {len( TRANSLATION_INDEX )} translations for autocomplete" )
     print( 'Press Ctrl+C to stop the bot' )
     
     try:
@@ -216,6 +1624,8 @@ def main():
         print( '\nBot stopped by user' )
     except Exception as e:
         print( f'Error running bot: {e}' )
+    finally:
+        POPULARITY.save()
 
 
 if __name__ == '__main__':
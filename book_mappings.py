@@ -1,489 +1,209 @@
 """
-Book name mappings for German and English Bible books.
+Book name mappings for German, English and other languages.
 Handles various abbreviations and formats.
+
+Book names and abbreviations for each language live in book_aliases/<language>.json.
+At startup they are compiled into one immutable lookup table; the compiled
+table is cached as a snapshot so later starts only read a single file.
 """
 
-# Maps German book names and abbreviations to standard English book names
-GERMAN_TO_ENGLISH = {
-    # Old Testament / Altes Testament
-    # Torah / Pentateuch
-    "1. mose": "Genesis",
-    "1 mose": "Genesis",
-    "1.mose": "Genesis",
-    "1mose": "Genesis",
-    "gen": "Genesis",
-    "genesis": "Genesis",
-    
-    "2. mose": "Exodus",
-    "2 mose": "Exodus",
-    "2.mose": "Exodus",
-    "2mose": "Exodus",
-    "ex": "Exodus",
-    "exod": "Exodus",
-    "exodus": "Exodus",
-    
-    "3. mose": "Leviticus",
-    "3 mose": "Leviticus",
-    "3.mose": "Leviticus",
-    "3mose": "Leviticus",
-    "lev": "Leviticus",
-    "leviticus": "Leviticus",
-    
-    "4. mose": "Numbers",
-    "4 mose": "Numbers",
-    "4.mose": "Numbers",
-    "4mose": "Numbers",
-    "num": "Numbers",
-    "numbers": "Numbers",
-    
-    "5. mose": "Deuteronomy",
-    "5 mose": "Deuteronomy",
-    "5.mose": "Deuteronomy",
-    "5mose": "Deuteronomy",
-    "dtn": "Deuteronomy",
-    "deut": "Deuteronomy",
-    "deuteronomy": "Deuteronomy",
-    
-    # Historical Books
-    "josua": "Joshua",
-    "jos": "Joshua",
-    "josh": "Joshua",
-    "joshua": "Joshua",
-    
-    "richter": "Judges",
-    "ri": "Judges",
-    "judg": "Judges",
-    "judges": "Judges",
-    
-    "rut": "Ruth",
-    "ruth": "Ruth",
-    
-    "1. samuel": "1 Samuel",
-    "1 samuel": "1 Samuel",
-    "1.samuel": "1 Samuel",
-    "1samuel": "1 Samuel",
-    "1. sam": "1 Samuel",
-    "1 sam": "1 Samuel",
-    "1sam": "1 Samuel",
-    
-    "2. samuel": "2 Samuel",
-    "2 samuel": "2 Samuel",
-    "2.samuel": "2 Samuel",
-    "2samuel": "2 Samuel",
-    "2. sam": "2 Samuel",
-    "2 sam": "2 Samuel",
-    "2sam": "2 Samuel",
-    
-    "1. könige": "1 Kings",
-    "1 könige": "1 Kings",
-    "1.könige": "1 Kings",
-    "1könige": "1 Kings",
-    "1. kön": "1 Kings",
-    "1 kön": "1 Kings",
-    "1kön": "1 Kings",
-    "1. koenige": "1 Kings",
-    "1 koenige": "1 Kings",
-    "1koenige": "1 Kings",
-    "1. kgs": "1 Kings",
-    "1 kgs": "1 Kings",
-    "1kgs": "1 Kings",
-    
-    "2. könige": "2 Kings",
-    "2 könige": "2 Kings",
-    "2.könige": "2 Kings",
-    "2könige": "2 Kings",
-    "2. kön": "2 Kings",
-    "2 kön": "2 Kings",
-    "2kön": "2 Kings",
-    "2. koenige": "2 Kings",
-    "2 koenige": "2 Kings",
-    "2koenige": "2 Kings",
-    "2. kgs": "2 Kings",
-    "2 kgs": "2 Kings",
-    "2kgs": "2 Kings",
-    
-    "1. chronik": "1 Chronicles",
-    "1 chronik": "1 Chronicles",
-    "1.chronik": "1 Chronicles",
-    "1chronik": "1 Chronicles",
-    "1. chr": "1 Chronicles",
-    "1 chr": "1 Chronicles",
-    "1chr": "1 Chronicles",
-    
-    "2. chronik": "2 Chronicles",
-    "2 chronik": "2 Chronicles",
-    "2.chronik": "2 Chronicles",
-    "2chronik": "2 Chronicles",
-    "2. chr": "2 Chronicles",
-    "2 chr": "2 Chronicles",
-    "2chr": "2 Chronicles",
-    
-    "esra": "Ezra",
-    "esr": "Ezra",
-    "ezra": "Ezra",
-    
-    "nehemia": "Nehemiah",
-    "neh": "Nehemiah",
-    "nehemiah": "Nehemiah",
-    
-    "ester": "Esther",
-    "est": "Esther",
-    "esther": "Esther",
-    
-    # Wisdom Books
-    "hiob": "Job",
-    "ijob": "Job",
-    "job": "Job",
-    
-    "psalm": "Psalms",
-    "psalmen": "Psalms",
-    "ps": "Psalms",
-    "psa": "Psalms",
-    "psalms": "Psalms",
-    
-    "sprüche": "Proverbs",
-    "sprichwörter": "Proverbs",
-    "spr": "Proverbs",
-    "prov": "Proverbs",
-    "proverbs": "Proverbs",
-    
-    "prediger": "Ecclesiastes",
-    "kohelet": "Ecclesiastes",
-    "pred": "Ecclesiastes",
-    "eccl": "Ecclesiastes",
-    "ecclesiastes": "Ecclesiastes",
-    
-    "hohelied": "Song of Solomon",
-    "hoheslied": "Song of Solomon",
-    "hld": "Song of Solomon",
-    "song": "Song of Solomon",
-    "songs": "Song of Solomon",
-    
-    # Major Prophets
-    "jesaja": "Isaiah",
-    "jes": "Isaiah",
-    "isa": "Isaiah",
-    "isaiah": "Isaiah",
-    
-    "jeremia": "Jeremiah",
-    "jer": "Jeremiah",
-    "jeremiah": "Jeremiah",
-    
-    "klagelieder": "Lamentations",
-    "klagl": "Lamentations",
-    "klgl": "Lamentations",
-    "lam": "Lamentations",
-    "lamentations": "Lamentations",
-    
-    "hesekiel": "Ezekiel",
-    "ezechiel": "Ezekiel",
-    "hes": "Ezekiel",
-    "ezek": "Ezekiel",
-    "ezekiel": "Ezekiel",
-    
-    "daniel": "Daniel",
-    "dan": "Daniel",
-    
-    # Minor Prophets
-    "hosea": "Hosea",
-    "hos": "Hosea",
-    
-    "joel": "Joel",
-    
-    "amos": "Amos",
-    
-    "obadja": "Obadiah",
-    "obd": "Obadiah",
-    "obad": "Obadiah",
-    "obadiah": "Obadiah",
-    
-    "jona": "Jonah",
-    "jon": "Jonah",
-    "jonah": "Jonah",
-    
-    "micha": "Micah",
-    "mi": "Micah",
-    "mic": "Micah",
-    "micah": "Micah",
-    
-    "nahum": "Nahum",
-    "nah": "Nahum",
-    
-    "habakuk": "Habakkuk",
-    "hab": "Habakkuk",
-    "habakkuk": "Habakkuk",
-    
-    "zefanja": "Zephaniah",
-    "zeph": "Zephaniah",
-    "zephaniah": "Zephaniah",
-    
-    "haggai": "Haggai",
-    "hag": "Haggai",
-    
-    "sacharja": "Zechariah",
-    "sach": "Zechariah",
-    "zech": "Zechariah",
-    "zechariah": "Zechariah",
-    
-    "maleachi": "Malachi",
-    "mal": "Malachi",
-    "malachi": "Malachi",
-    
-    # New Testament / Neues Testament
-    # Gospels
-    "matthäus": "Matthew",
-    "matt": "Matthew",
-    "mt": "Matthew",
-    "mat": "Matthew",
-    "matthew": "Matthew",
-    
-    "markus": "Mark",
-    "mark": "Mark",
-    "mk": "Mark",
-    "mar": "Mark",
-    
-    "lukas": "Luke",
-    "luk": "Luke",
-    "lk": "Luke",
-    "luke": "Luke",
-    
-    "johannes": "John",
-    "joh": "John",
-    "john": "John",
-    
-    # Acts and Epistles
-    "apostelgeschichte": "Acts",
-    "apg": "Acts",
-    "acts": "Acts",
-    
-    "römer": "Romans",
-    "roemer": "Romans",
-    "röm": "Romans",
-    "roem": "Romans",
-    "rom": "Romans",
-    "romans": "Romans",
-    
-    "1. korinther": "1 Corinthians",
-    "1 korinther": "1 Corinthians",
-    "1.korinther": "1 Corinthians",
-    "1korinther": "1 Corinthians",
-    "1. kor": "1 Corinthians",
-    "1 kor": "1 Corinthians",
-    "1kor": "1 Corinthians",
-    "1. cor": "1 Corinthians",
-    "1 cor": "1 Corinthians",
-    "1cor": "1 Corinthians",
-    
-    "2. korinther": "2 Corinthians",
-    "2 korinther": "2 Corinthians",
-    "2.korinther": "2 Corinthians",
-    "2korinther": "2 Corinthians",
-    "2. kor": "2 Corinthians",
-    "2 kor": "2 Corinthians",
-    "2kor": "2 Corinthians",
-    "2. cor": "2 Corinthians",
-    "2 cor": "2 Corinthians",
-    "2cor": "2 Corinthians",
-    
-    "galater": "Galatians",
-    "gal": "Galatians",
-    "galatians": "Galatians",
-    
-    "epheser": "Ephesians",
-    "eph": "Ephesians",
-    "ephesians": "Ephesians",
-    
-    "philipper": "Philippians",
-    "phil": "Philippians",
-    "philippians": "Philippians",
-    
-    "kolosser": "Colossians",
-    "kol": "Colossians",
-    "col": "Colossians",
-    "colossians": "Colossians",
-    
-    "1. thessalonicher": "1 Thessalonians",
-    "1 thessalonicher": "1 Thessalonians",
-    "1.thessalonicher": "1 Thessalonians",
-    "1thessalonicher": "1 Thessalonians",
-    "1. thess": "1 Thessalonians",
-    "1 thess": "1 Thessalonians",
-    "1thess": "1 Thessalonians",
-    
-    "2. thessalonicher": "2 Thessalonians",
-    "2 thessalonicher": "2 Thessalonians",
-    "2.thessalonicher": "2 Thessalonians",
-    "2thessalonicher": "2 Thessalonians",
-    "2. thess": "2 Thessalonians",
-    "2 thess": "2 Thessalonians",
-    "2thess": "2 Thessalonians",
+import glob
+import json
+import os
+import pickle
+import re
+import time
+from types import MappingProxyType
+
+# Directory with one alias file per language
+ALIASES_DIR = os.getenv( 'BOOK_ALIASES_DIR', os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'book_aliases' ) )
+
+# Precompiled snapshot of all alias files
+SNAPSHOT_PATH = os.getenv( 'BOOK_ALIASES_SNAPSHOT', os.path.join( ALIASES_DIR, 'compiled.pickle' ) )
+
+# When two languages use the same abbreviation for different books, the earlier language wins.
+# Languages not listed here follow in alphabetical order.
+LANGUAGE_PRIORITY = ['de', 'en', 'es', 'fr', 'nl']
+
+# Bump when the compiled format changes so old snapshots are ignored
+_SNAPSHOT_VERSION = 1
+
+# Numbered books can be written "1. Mose", "1 Mose", "1.Mose" or "1Mose"
+_NUMBERED_ALIAS = re.compile( r'^([1-5])\.?\s*(.+)$' )
+
+
+def _alias_variants( alias ):
+    """
+    Expands an alias into all accepted spellings of its book number.
     
-    "1. timotheus": "1 Timothy",
-    "1 timotheus": "1 Timothy",
-    "1.timotheus": "1 Timothy",
-    "1timotheus": "1 Timothy",
-    "1. tim": "1 Timothy",
-    "1 tim": "1 Timothy",
-    "1tim": "1 Timothy",
+    Args:
+        alias: A lowercase alias (e.g., "1. mose")
+        
+    Returns:
+        A list of spellings (e.g., ["1. mose", "1 mose", "1.mose", "1mose"])
+    """
+    match = _NUMBERED_ALIAS.match( alias )
     
-    "2. timotheus": "2 Timothy",
-    "2 timotheus": "2 Timothy",
-    "2.timotheus": "2 Timothy",
-    "2timotheus": "2 Timothy",
-    "2. tim": "2 Timothy",
-    "2 tim": "2 Timothy",
-    "2tim": "2 Timothy",
+    if not match:
+        return [alias]
     
-    "titus": "Titus",
-    "tit": "Titus",
+    number, name = match.groups()
+    return [f"{number}. {name}", f"{number} {name}", f"{number}.{name}", f"{number}{name}"]
+
+
+def _alias_files():
+    """
+    Lists the alias files in priority order.
     
-    "philemon": "Philemon",
-    "phlm": "Philemon",
+    Returns:
+        A list of (language, path) tuples
+    """
+    paths = {
+        os.path.splitext( os.path.basename( path ) )[0]: path
+        for path in glob.glob( os.path.join( ALIASES_DIR, '*.json' ) )
+    }
     
-    "hebräer": "Hebrews",
-    "hebraeer": "Hebrews",
-    "hebr": "Hebrews",
-    "heb": "Hebrews",
-    "hebrews": "Hebrews",
+    order = [lang for lang in LANGUAGE_PRIORITY if lang in paths]
+    order += sorted( lang for lang in paths if lang not in LANGUAGE_PRIORITY )
     
-    "jakobus": "James",
-    "jak": "James",
-    "jas": "James",
-    "james": "James",
+    return [( lang, paths[lang] ) for lang in order]
+
+
+def _fingerprint( files ):
+    """
+    Identifies the current alias files by name, size and modification time.
+    """
+    result = [_SNAPSHOT_VERSION]
     
-    "1. petrus": "1 Peter",
-    "1 petrus": "1 Peter",
-    "1.petrus": "1 Peter",
-    "1petrus": "1 Peter",
-    "1. petr": "1 Peter",
-    "1 petr": "1 Peter",
-    "1petr": "1 Peter",
-    "1. pet": "1 Peter",
-    "1 pet": "1 Peter",
-    "1pet": "1 Peter",
+    for lang, path in files:
+        stat = os.stat( path )
+        result.append( ( lang, stat.st_size, stat.st_mtime_ns ) )
     
-    "2. petrus": "2 Peter",
-    "2 petrus": "2 Peter",
-    "2.petrus": "2 Peter",
-    "2petrus": "2 Peter",
-    "2. petr": "2 Peter",
-    "2 petr": "2 Peter",
-    "2petr": "2 Peter",
-    "2. pet": "2 Peter",
-    "2 pet": "2 Peter",
-    "2pet": "2 Peter",
+    return tuple( result )
+
+
+def compile_alias_tables( files ):
+    """
+    Compiles alias files into a single lookup table.
     
-    "1. johannes": "1 John",
-    "1 johannes": "1 John",
-    "1.johannes": "1 John",
-    "1johannes": "1 John",
-    "1. joh": "1 John",
-    "1 joh": "1 John",
-    "1joh": "1 John",
+    Args:
+        files: A list of (language, path) tuples in priority order
+        
+    Returns:
+        A dictionary with:
+        - aliases: lowercase alias -> English book name
+        - display_names: language -> {English book name -> display name}
+        - conflicts: a list of (alias, kept_language, kept_book, ignored_language, ignored_book)
+    """
+    aliases = {}
+    owners = {}
+    display_names = {}
+    conflicts = []
+    
+    for lang, path in files:
+        with open( path, 'r', encoding='utf-8' ) as f:
+            data = json.load( f )
+        
+        names = {}
+        
+        for book, book_aliases in data.get( 'books', {} ).items():
+            if not book_aliases:
+                continue
+            
+            # The first entry is how the book is written in this language
+            names[book] = book_aliases[0]
+            
+            for alias in book_aliases:
+                for variant in _alias_variants( ' '.join( alias.lower().split() ) ):
+                    existing = aliases.get( variant )
+                    
+                    if existing is None:
+                        aliases[variant] = book
+                        owners[variant] = lang
+                    elif existing != book:
+                        conflicts.append( ( variant, owners[variant], existing, lang, book ) )
+        
+        display_names[lang] = names
     
-    "2. johannes": "2 John",
-    "2 johannes": "2 John",
-    "2.johannes": "2 John",
-    "2johannes": "2 John",
-    "2. joh": "2 John",
-    "2 joh": "2 John",
-    "2joh": "2 John",
+    # Full English book names always work
+    for book in display_names.get( 'en', {} ):
+        aliases.setdefault( book.lower(), book )
     
-    "3. johannes": "3 John",
-    "3 johannes": "3 John",
-    "3.johannes": "3 John",
-    "3johannes": "3 John",
-    "3. joh": "3 John",
-    "3 joh": "3 John",
-    "3joh": "3 John",
+    return {
+        'aliases': aliases,
+        'display_names': display_names,
+        'conflicts': conflicts
+    }
+
+
+def load_alias_tables():
+    """
+    Loads the compiled alias tables, using the snapshot when it is up to date.
     
-    "judas": "Jude",
-    "jud": "Jude",
-    "jude": "Jude",
+    Returns:
+        A tuple of (tables, stats) where tables is the result of compile_alias_tables()
+        and stats describes how long loading took and where the data came from
+    """
+    start = time.perf_counter()
+    files = _alias_files()
+    fingerprint = _fingerprint( files )
     
-    "offenbarung": "Revelation",
-    "offb": "Revelation",
-    "off": "Revelation",
-    "rev": "Revelation",
-    "revelation": "Revelation",
-}
+    try:
+        with open( SNAPSHOT_PATH, 'rb' ) as f:
+            snapshot = pickle.load( f )
+        
+        if snapshot.get( 'fingerprint' ) == fingerprint:
+            return snapshot['tables'], {
+                'source': 'snapshot',
+                'load_ms': ( time.perf_counter() - start ) * 1000,
+                'languages': len( files )
+            }
+    except Exception:
+        pass  # Missing or unreadable snapshot, compile from the alias files
+    
+    tables = compile_alias_tables( files )
+    compile_ms = ( time.perf_counter() - start ) * 1000
+    
+    for alias, kept_lang, kept_book, ignored_lang, ignored_book in tables['conflicts']:
+        print( f"Book alias conflict: '{alias}' is {kept_book} ({kept_lang}), ignoring {ignored_book} ({ignored_lang})" )
+    
+    try:
+        # Several bot processes may compile at the same time; each writes its own temp file
+        temp_path = f"{SNAPSHOT_PATH}.{os.getpid()}.tmp"
+        with open( temp_path, 'wb' ) as f:
+            pickle.dump( {'fingerprint': fingerprint, 'tables': tables}, f, protocol=pickle.HIGHEST_PROTOCOL )
+        os.replace( temp_path, SNAPSHOT_PATH )
+    except Exception as e:
+        print( f"Could not write book alias snapshot: {e}" )
+    
+    return tables, {
+        'source': 'compiled',
+        'load_ms': compile_ms,
+        'languages': len( files )
+    }
 
-# Common English abbreviations to full book names
-ENGLISH_ABBREVIATIONS = {
-    "gen": "Genesis",
-    "exod": "Exodus",
-    "ex": "Exodus",
-    "lev": "Leviticus",
-    "num": "Numbers",
-    "deut": "Deuteronomy",
-    "dtn": "Deuteronomy",
-    "josh": "Joshua",
-    "judg": "Judges",
-    "1sam": "1 Samuel",
-    "2sam": "2 Samuel",
-    "1kgs": "1 Kings",
-    "2kgs": "2 Kings",
-    "1chr": "1 Chronicles",
-    "2chr": "2 Chronicles",
-    "neh": "Nehemiah",
-    "est": "Esther",
-    "ps": "Psalms",
-    "psa": "Psalms",
-    "prov": "Proverbs",
-    "eccl": "Ecclesiastes",
-    "song": "Song of Solomon",
-    "isa": "Isaiah",
-    "jer": "Jeremiah",
-    "lam": "Lamentations",
-    "ezek": "Ezekiel",
-    "dan": "Daniel",
-    "hos": "Hosea",
-    "obad": "Obadiah",
-    "mic": "Micah",
-    "nah": "Nahum",
-    "hab": "Habakkuk",
-    "zeph": "Zephaniah",
-    "hag": "Haggai",
-    "zech": "Zechariah",
-    "mal": "Malachi",
-    "matt": "Matthew",
-    "mat": "Matthew",
-    "mt": "Matthew",
-    "mk": "Mark",
-    "lk": "Luke",
-    "jn": "John",
-    "rom": "Romans",
-    "1cor": "1 Corinthians",
-    "2cor": "2 Corinthians",
-    "gal": "Galatians",
-    "eph": "Ephesians",
-    "phil": "Philippians",
-    "col": "Colossians",
-    "1thess": "1 Thessalonians",
-    "1th": "1 Thessalonians",
-    "2thess": "2 Thessalonians",
-    "2th": "2 Thessalonians",
-    "1tim": "1 Timothy",
-    "2tim": "2 Timothy",
-    "tit": "Titus",
-    "phlm": "Philemon",
-    "heb": "Hebrews",
-    "jas": "James",
-    "1pet": "1 Peter",
-    "1pt": "1 Peter",
-    "2pet": "2 Peter",
-    "2pt": "2 Peter",
-    "1jn": "1 John",
-    "2jn": "2 John",
-    "3jn": "3 John",
-    "rev": "Revelation",
-}
+
+_tables, ALIAS_TABLE_STATS = load_alias_tables()
+
+# Lowercase alias in any language -> standard English book name (read-only)
+BOOK_ALIASES = MappingProxyType( _tables['aliases'] )
+
+# Language -> {English book name -> book name in that language} (read-only)
+BOOK_DISPLAY_NAMES = MappingProxyType( {
+    lang: MappingProxyType( names ) for lang, names in _tables['display_names'].items()
+} )
+
+# Ambiguous abbreviations found while compiling, as (alias, kept_language, kept_book, ignored_language, ignored_book)
+ALIAS_CONFLICTS = tuple( tuple( conflict ) for conflict in _tables['conflicts'] )
+
+ALIAS_TABLE_STATS['aliases'] = len( BOOK_ALIASES )
+ALIAS_TABLE_STATS['conflicts'] = len( ALIAS_CONFLICTS )
 
 
 def normalize_book_name( book_name ):
     """
     Normalizes a book name to its standard English form.
-    Handles German and English names and abbreviations.
+    Handles names and abbreviations in every language with an alias file.
     
     Args:
         book_name: The book name or abbreviation to normalize
@@ -494,24 +214,18 @@ def normalize_book_name( book_name ):
     if not book_name:
         return None
     
-    # Convert to lowercase and strip whitespace
-    normalized = book_name.lower().strip()
-    
-    # Try German mappings first (they're more comprehensive)
-    if normalized in GERMAN_TO_ENGLISH:
-        return GERMAN_TO_ENGLISH[normalized]
-    
-    # Try English abbreviations
-    if normalized in ENGLISH_ABBREVIATIONS:
-        return ENGLISH_ABBREVIATIONS[normalized]
-    
-    # Check if it's already a full English book name
-    all_books = set( GERMAN_TO_ENGLISH.values() )
-    for book in all_books:
-        if book.lower() == normalized:
-            return book
+    # Convert to lowercase and collapse whitespace
+    return BOOK_ALIASES.get( ' '.join( book_name.lower().split() ) )
+
+
+def get_all_aliases():
+    """
+    Gets every book name and abbreviation that normalize_book_name() understands.
     
-    return None
+    Returns:
+        A set of lowercase aliases
+    """
+    return set( BOOK_ALIASES )
 
 
 def get_book_id( book_name ):
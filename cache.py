@@ -0,0 +1,572 @@
+"""
+In-memory caches for the Bible API layer.
+
+Every cache accounts for the bytes it holds. Caches share one memory budget
+per process (CACHE_MEMORY_MB): when the caches together exceed it, entries
+are evicted from whichever cache holds the coldest large entry. Caches with
+a codec compress their large entries in the background.
+"""
+
+import os
+import sys
+import threading
+import time
+import weakref
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from metrics import METRICS
+
+# Memory all caches of this process may hold together, in MiB
+CACHE_MEMORY_MB = int( os.getenv( 'CACHE_MEMORY_MB', '256' ) )
+
+# Entries at least this large (in bytes) are compressed, in caches with a codec
+COMPRESS_MIN_BYTES = int( os.getenv( 'COMPRESS_MIN_BYTES', '4096' ) )
+
+# Least recently used entries compared when evicting by size
+_EVICTION_SAMPLE = 4
+
+# Bytes counted per compressed entry besides the compressed data
+_PACKED_OVERHEAD = 100
+
+# Decompressed values kept per cache, so repeated hits on large entries return the same
+# object (and whatever it memoized, e.g. a passage's renderings) instead of decoding again
+_DECODED_ENTRIES = 32
+
+# Compression runs off the request path, one value at a time
+_COMPRESSOR = ThreadPoolExecutor( max_workers=1, thread_name_prefix='cache-compress' )
+
+
+def estimate_size( value, _seen=None ):
+    """
+    Estimates the memory held by a value, following containers and object attributes.
+
+    Args:
+        value: Any value
+
+    Returns:
+        The approximate size in bytes
+    """
+    if _seen is None:
+        _seen = set()
+
+    if id( value ) in _seen:
+        return 0
+    _seen.add( id( value ) )
+
+    size = sys.getsizeof( value )
+
+    if isinstance( value, dict ):
+        return size + sum( estimate_size( k, _seen ) + estimate_size( v, _seen ) for k, v in value.items() )
+
+    if isinstance( value, ( list, tuple, set, frozenset ) ):
+        return size + sum( estimate_size( item, _seen ) for item in value )
+
+    if hasattr( value, '__dict__' ):
+        return size + estimate_size( vars( value ), _seen )
+
+    return size
+
+
+def train_dictionary( samples, size=16384 ):
+    """
+    Builds a zlib preset dictionary from the most common words of some sample texts.
+
+    Args:
+        samples: Encoded sample values (bytes)
+        size: Maximum dictionary size in bytes
+
+    Returns:
+        The dictionary, most valuable words last (zlib reaches those with the shortest distances)
+    """
+    counts = Counter( word for sample in samples for word in sample.split() )
+    words = []
+    total = 0
+
+    for word, count in sorted( counts.items(), key=lambda item: len( item[0] ) * item[1], reverse=True ):
+        if count < 2 or total + len( word ) + 1 > size:
+            continue
+        words.append( word )
+        total += len( word ) + 1
+
+    return b' '.join( reversed( words ) )
+
+
+class ZlibCodec:
+    """
+    Compresses cache values: encode turns a value into text, which is stored
+    zlib-compressed. Once enough values were seen, a preset dictionary of their
+    common words is trained, so verse text compresses well even in small pieces.
+    """
+
+    def __init__( self, encode, decode, level=6, train_after=64 ):
+        """
+        Initialize the codec.
+
+        Args:
+            encode: Function converting a value to text
+            decode: Function converting text back to a value
+            level: zlib compression level
+            train_after: Number of values collected before training the dictionary (0 = no dictionary)
+        """
+        self.encode = encode
+        self.decode = decode
+        self.level = level
+        self.train_after = train_after
+        self.dictionary = None
+        self._samples = []
+
+    def compress( self, value ):
+        """
+        Compresses a value.
+
+        Returns:
+            A (dictionary, data) pair for decompress()
+        """
+        data = self.encode( value ).encode( 'utf-8' )
+        dictionary = self.dictionary
+
+        if dictionary is None and self.train_after:
+            self._samples.append( data )
+            if len( self._samples ) >= self.train_after:
+                self.dictionary = train_dictionary( self._samples ) or None
+                self._samples = []
+
+        compressor = zlib.compressobj( self.level, zdict=dictionary ) if dictionary else zlib.compressobj( self.level )
+        return dictionary, compressor.compress( data ) + compressor.flush()
+
+    def decompress( self, packed ):
+        """
+        Restores a value from the output of compress().
+        """
+        dictionary, data = packed
+        decompressor = zlib.decompressobj( zdict=dictionary ) if dictionary else zlib.decompressobj()
+        return self.decode( ( decompressor.decompress( data ) + decompressor.flush() ).decode( 'utf-8' ) )
+
+
+class MemoryBudget:
+    """
+    Memory limit shared by several caches.
+    """
+
+    def __init__( self, max_bytes ):
+        """
+        Initialize the budget.
+
+        Args:
+            max_bytes: Bytes all registered caches may hold together
+        """
+        self.max_bytes = max_bytes
+        self._caches = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def register( self, cache ):
+        """
+        Adds a cache to the budget.
+        """
+        with self._lock:
+            self._caches.add( cache )
+
+    @property
+    def bytes( self ):
+        """
+        Bytes held by all registered caches.
+        """
+        return sum( cache.bytes for cache in list( self._caches ) )
+
+    def reclaim( self ):
+        """
+        Evicts entries until the caches fit the budget again, each time the
+        entry with the highest size x idle time among the least recently used
+        entries of each cache.
+        """
+        if self.bytes <= self.max_bytes:
+            return
+
+        with self._lock:
+            while True:
+                caches = list( self._caches )
+                total = sum( cache.bytes for cache in caches )
+
+                if total <= self.max_bytes:
+                    break
+
+                victim = None
+                for cache in caches:
+                    candidate = cache._eviction_candidate()
+                    if candidate and ( victim is None or candidate[0] > victim[0] ):
+                        victim = ( candidate[0], cache, candidate[1] )
+
+                if victim is None:
+                    break
+
+                victim[1]._evict( victim[2] )
+                METRICS.increment( 'cache.budget.evictions' )
+
+            METRICS.set( 'cache.budget.bytes', total )
+
+
+# Budget of all caches in this process
+CACHE_BUDGET = MemoryBudget( CACHE_MEMORY_MB * 1024 * 1024 )
+
+
+class _Entry:
+    """
+    A cached value (compressed if packed) with its size and timestamps.
+    """
+
+    __slots__ = ( 'value', 'stored_at', 'last_used', 'size', 'raw_size', 'packed' )
+
+    def __init__( self, value, size ):
+        self.value = value
+        self.stored_at = self.last_used = time.monotonic()
+        self.size = self.raw_size = size
+        self.packed = False
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with request coalescing.
+
+    Concurrent loads of the same key share a single call to the loader,
+    so a burst of identical requests costs only one upstream fetch.
+
+    Entries older than max_age count as misses but are kept until evicted,
+    so callers can fall back to them with get_stale() when a reload fails.
+    """
+
+    def __init__( self, max_entries=1024, max_age=None, max_bytes=None, name=None,
+                  sizeof=estimate_size, codec=None, compress_min=COMPRESS_MIN_BYTES, budget=CACHE_BUDGET ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept before evicting the least recently used
+            max_age: Seconds after which an entry is stale, or None to keep entries fresh forever
+            max_bytes: Maximum bytes held by this cache, or None for only the shared budget
+            name: Name under which bytes held and compression ratio are exported as metrics
+            sizeof: Function estimating the bytes held by a value
+            codec: Optional ZlibCodec for storing large values compressed
+            compress_min: Size in bytes from which values are compressed
+            budget: MemoryBudget shared with other caches, or None
+        """
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.name = name
+        self.sizeof = sizeof
+        self.codec = codec
+        self.compress_min = compress_min
+        self.budget = budget
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        # Key -> (compressed value, decompressed value) of recently read compressed entries
+        self._decoded = OrderedDict()
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bytes = 0
+        self.raw_bytes = 0
+
+        if budget is not None:
+            budget.register( self )
+
+    @property
+    def compression_ratio( self ):
+        """
+        Uncompressed size of the entries divided by the bytes actually held.
+        """
+        return self.raw_bytes / self.bytes if self.bytes else 1.0
+
+    def get( self, key, default=None ):
+        """
+        Gets a cached value and marks it as recently used.
+
+        Args:
+            key: The cache key
+            default: Value returned if the key is not cached
+
+        Returns:
+            The cached value, or default
+        """
+        with self._lock:
+            entry = self._fresh_entry( key )
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            value, packed = entry.value, entry.packed
+
+        return self._unpack( key, value, packed )
+
+    def get_stale( self, key, default=None ):
+        """
+        Gets a cached value even if it is older than max_age, without counting a hit.
+
+        Args:
+            key: The cache key
+            default: Value returned if the key is not cached
+
+        Returns:
+            The cached value, or default
+        """
+        with self._lock:
+            entry = self._entries.get( key )
+
+            if entry is None:
+                return default
+
+            value, packed = entry.value, entry.packed
+
+        return self._unpack( key, value, packed )
+
+    def _fresh_entry( self, key ):
+        """
+        The entry of a key if it is not older than max_age, marked as recently used. Call with the lock held.
+        """
+        entry = self._entries.get( key )
+
+        if entry is None:
+            return None
+
+        now = time.monotonic()
+        if self.max_age is not None and now - entry.stored_at >= self.max_age:
+            return None
+
+        self._entries.move_to_end( key )
+        entry.last_used = now
+        return entry
+
+    def _unpack( self, key, value, packed ):
+        """
+        A cached value, decompressed if it was stored compressed.
+
+        Recent decompressions are reused as long as the entry still holds the
+        same compressed value.
+        """
+        if not packed:
+            return value
+
+        with self._lock:
+            decoded = self._decoded.get( key )
+            if decoded is not None and decoded[0] is value:
+                self._decoded.move_to_end( key )
+                return decoded[1]
+
+        unpacked = self.codec.decompress( value )
+
+        with self._lock:
+            entry = self._entries.get( key )
+
+            # Not kept for entries removed or replaced meanwhile
+            if entry is not None and entry.value is value:
+                self._decoded[key] = ( value, unpacked )
+                self._decoded.move_to_end( key )
+                if len( self._decoded ) > _DECODED_ENTRIES:
+                    self._decoded.popitem( last=False )
+
+        return unpacked
+
+    def put( self, key, value ):
+        """
+        Stores a value, evicting the least recently used entries if needed.
+        Values too large for this cache's limits are not stored.
+
+        Args:
+            key: The cache key
+            value: The value to store
+        """
+        size = self.sizeof( value )
+        limits = [limit for limit in ( self.max_bytes, self.budget.max_bytes if self.budget else None ) if limit]
+
+        with self._lock:
+            old = self._entries.pop( key, None )
+            if old:
+                self._forget( key, old )
+
+            if limits and size > min( limits ) // 4:
+                self._publish()
+                return
+
+            entry = _Entry( value, size )
+            self._entries[key] = entry
+            self.bytes += size
+            self.raw_bytes += size
+
+            while len( self._entries ) > self.max_entries:
+                self._forget( *self._entries.popitem( last=False ) )
+
+            while self.max_bytes and self.bytes > self.max_bytes:
+                victim = self._eviction_candidate_locked()[1]
+                self._forget( victim, self._entries.pop( victim ) )
+
+            self._publish()
+            compress = self.codec is not None and size >= self.compress_min and key in self._entries
+
+        if compress:
+            _COMPRESSOR.submit( self._compress, key, entry )
+
+        if self.budget is not None:
+            self.budget.reclaim()
+
+    def _compress( self, key, entry ):
+        """
+        Replaces an entry's value by its compressed form (runs on the compression thread).
+        """
+        try:
+            packed = self.codec.compress( entry.value )
+        except Exception as e:
+            print( f"Error compressing cache entry {key}: {e}" )
+            return
+
+        size = len( packed[1] ) + _PACKED_OVERHEAD
+
+        with self._lock:
+            # Replaced, evicted or not worth it
+            if self._entries.get( key ) is not entry or entry.packed or size >= entry.size:
+                return
+
+            self.bytes -= entry.size - size
+            entry.value = packed
+            entry.size = size
+            entry.packed = True
+            self._publish()
+
+    def _forget( self, key, entry ):
+        """
+        Removes a removed entry's bytes from the totals, and its decompressed copy. Call with the lock held.
+        """
+        self.bytes -= entry.size
+        self.raw_bytes -= entry.raw_size
+        self._decoded.pop( key, None )
+
+    def _eviction_candidate_locked( self ):
+        """
+        The least recently used entry with the highest size x idle time. Call with the lock held.
+
+        Returns:
+            A (score, key) pair, or None if the cache is empty
+        """
+        now = time.monotonic()
+        best = None
+
+        for key, entry in islice( self._entries.items(), _EVICTION_SAMPLE ):
+            score = entry.size * ( now - entry.last_used + 1 )
+            if best is None or score > best[0]:
+                best = ( score, key )
+
+        return best
+
+    def _eviction_candidate( self ):
+        with self._lock:
+            return self._eviction_candidate_locked()
+
+    def _evict( self, key ):
+        """
+        Removes an entry chosen by the memory budget.
+        """
+        with self._lock:
+            entry = self._entries.pop( key, None )
+            if entry:
+                self._forget( key, entry )
+                self._publish()
+
+    def _publish( self ):
+        """
+        Exports bytes held and compression ratio of a named cache. Call with the lock held.
+        """
+        if self.name:
+            METRICS.set( f"cache.{self.name}.entries", len( self._entries ) )
+            METRICS.set( f"cache.{self.name}.bytes", self.bytes )
+            METRICS.set( f"cache.{self.name}.compression_ratio", round( self.compression_ratio, 2 ) )
+
+    def get_or_load( self, key, loader, should_cache=None, timeout=None ):
+        """
+        Gets a cached value, or loads it once even if many threads ask at the same time.
+
+        Args:
+            key: The cache key
+            loader: Function without arguments that produces the value
+            should_cache: Optional function deciding whether a loaded value is stored
+            timeout: Seconds to wait for a load another thread started, or None to wait until it ends
+
+        Returns:
+            The cached or freshly loaded value
+
+        Raises:
+            concurrent.futures.TimeoutError: If the other thread's load did not finish within timeout
+        """
+        with self._lock:
+            entry = self._fresh_entry( key )
+
+            if entry is not None:
+                self.hits += 1
+                value, packed = entry.value, entry.packed
+                future = None
+            else:
+                future = self._inflight.get( key )
+
+                if future:
+                    self.coalesced += 1
+                    owner = False
+                else:
+                    self.misses += 1
+                    future = Future()
+                    self._inflight[key] = future
+                    owner = True
+
+        if future is None:
+            return self._unpack( key, value, packed )
+
+        if not owner:
+            return future.result( timeout )
+
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception( e )
+            raise
+
+        if should_cache is None or should_cache( value ):
+            self.put( key, value )
+
+        with self._lock:
+            del self._inflight[key]
+        future.set_result( value )
+
+        return value
+
+    def clear( self ):
+        """
+        Removes all cached entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._decoded.clear()
+            self.bytes = 0
+            self.raw_bytes = 0
+            self._publish()
+
+    def __contains__( self, key ):
+        with self._lock:
+            return key in self._entries
+
+    def __len__( self ):
+        with self._lock:
+            return len( self._entries )
+
+
+def wait_for_compression():
+    """
+    Waits until all values queued for compression are compressed (for tests and benchmarks).
+    """
+    _COMPRESSOR.submit( lambda: None ).result()
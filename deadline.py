@@ -0,0 +1,80 @@
+"""
+Time budgets for handling a command.
+
+A Deadline is created when a command arrives and handed down through every
+stage (parse, translation, cache, fetch, render). Each stage can ask how much
+time is left, e.g. to bound an upstream request, and a stage that runs past
+the deadline is counted in the metrics.
+"""
+
+import os
+import time
+from metrics import METRICS
+
+# Seconds a user waits for an answer before it feels broken (Discord itself allows 3)
+COMMAND_BUDGET = float( os.getenv( 'COMMAND_BUDGET', '2.0' ) )
+
+
+class Deadline:
+    """
+    A point in time by which a piece of work should be done.
+    """
+
+    def __init__( self, budget ):
+        """
+        Initialize the deadline.
+
+        Args:
+            budget: Seconds from now until the deadline
+        """
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining( self ):
+        """
+        Seconds left until the deadline (0 if it has passed).
+        """
+        return max( self.expires_at - time.monotonic(), 0.0 )
+
+    def expired( self ):
+        """
+        Whether the deadline has passed.
+        """
+        return time.monotonic() >= self.expires_at
+
+    def timeout( self, limit ):
+        """
+        Timeout for a blocking call: the remaining time, but at most limit seconds.
+        """
+        return min( self.remaining(), limit )
+
+    def stage( self, name ):
+        """
+        Marks a stage of the work, for use in a with statement. If the deadline
+        passes during the stage, the stage is counted as "deadline.missed.<name>".
+
+        Args:
+            name: The stage name (e.g., "fetch")
+        """
+        return _Stage( self, name )
+
+
+class _Stage:
+    """
+    Context manager returned by Deadline.stage(); a plain class because it runs on every command.
+    """
+
+    __slots__ = ( 'deadline', 'name', 'already_expired' )
+
+    def __init__( self, deadline, name ):
+        self.deadline = deadline
+        self.name = name
+
+    def __enter__( self ):
+        self.already_expired = self.deadline.expired()
+        return self.deadline
+
+    def __exit__( self, *exc_info ):
+        if not self.already_expired and self.deadline.expired():
+            METRICS.increment( f"deadline.missed.{self.name}" )
+        return False
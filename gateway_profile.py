@@ -0,0 +1,99 @@
+"""
+Gateway profiles: which events the bot subscribes to and what the library caches.
+
+Slash commands arrive as interactions and need neither member lists nor
+message history, so the lean profile subscribes to guild events only and
+turns off member caching, the message cache, and chunking and soundboard
+loading at startup. Message events and the privileged message content
+intent are only requested when passive reference detection is enabled. The
+full profile keeps the library defaults for troubleshooting.
+
+Shard settings let launcher.py split the shards over several processes.
+"""
+
+import os
+import discord
+
+PROFILE_LEAN = 'lean'
+PROFILE_FULL = 'full'
+PROFILES = ( PROFILE_LEAN, PROFILE_FULL )
+
+# Which profile the bot connects with
+GATEWAY_PROFILE = os.getenv( 'GATEWAY_PROFILE', PROFILE_LEAN )
+
+# Whether /bible-auto and /bibel-auto can be used (requires the privileged message content intent)
+PASSIVE_DETECTION = os.getenv( 'PASSIVE_DETECTION', 'true' ).lower() in ( '1', 'true', 'yes', 'on' )
+
+# Total number of shards across all processes (unset = Discord's recommendation)
+SHARD_COUNT = os.getenv( 'SHARD_COUNT' )
+
+# Shards run by this process, e.g. "4,5,6,7" (unset = all of them)
+SHARD_IDS = os.getenv( 'SHARD_IDS' )
+
+
+def client_options( profile=GATEWAY_PROFILE, passive_detection=PASSIVE_DETECTION ):
+    """
+    Builds the connection options for a gateway profile.
+
+    Args:
+        profile: One of PROFILES
+        passive_detection: Whether the bot needs to read messages in channels
+
+    Returns:
+        A dictionary of keyword arguments for discord.Bot()
+
+    Raises:
+        ValueError: If the profile is unknown
+    """
+    if profile == PROFILE_FULL:
+        intents = discord.Intents.default()
+        intents.message_content = passive_detection
+        return {'intents': intents}
+
+    if profile != PROFILE_LEAN:
+        raise ValueError( f"Unknown gateway profile '{profile}' (expected one of {', '.join( PROFILES )})" )
+
+    # Guild events keep guilds and channels resolvable; everything else is opt-in
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.guild_messages = passive_detection
+    intents.message_content = passive_detection
+
+    return {
+        'intents': intents,
+        'member_cache_flags': discord.MemberCacheFlags.none(),
+        'max_messages': None,
+        'chunk_guilds_at_startup': False,
+        'cache_default_sounds': False,
+    }
+
+
+def shard_options( shard_count=SHARD_COUNT, shard_ids=SHARD_IDS ):
+    """
+    Builds the sharding options for discord.AutoShardedBot.
+
+    Args:
+        shard_count: Total number of shards as a string, or None
+        shard_ids: Comma-separated shard IDs for this process, or None
+
+    Returns:
+        A dictionary of keyword arguments (empty to let Discord choose)
+
+    Raises:
+        ValueError: If shard IDs are given without a shard count, or are out of range
+    """
+    options = {}
+
+    if shard_count:
+        options['shard_count'] = int( shard_count )
+
+    if shard_ids:
+        if 'shard_count' not in options:
+            raise ValueError( "SHARD_IDS requires SHARD_COUNT" )
+
+        options['shard_ids'] = [int( shard_id ) for shard_id in shard_ids.split( ',' )]
+
+        if any( not 0 <= shard_id < options['shard_count'] for shard_id in options['shard_ids'] ):
+            raise ValueError( f"Shard IDs must be between 0 and {options['shard_count'] - 1}" )
+
+    return options
@@ -0,0 +1,155 @@
+"""
+Per-guild bot settings stored in a small JSON file.
+"""
+
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: only one bot process per settings file
+    fcntl = None
+
+
+class GuildSettings:
+    """
+    Keeps per-guild settings in memory and writes them to disk on change.
+
+    Settings are looked up on every message, so reads only touch
+    in-memory dictionaries. Several bot processes (shard clusters) can share
+    one file: each writes back only the guilds it changed.
+    """
+
+    def __init__( self, path ):
+        """
+        Initialize the settings store.
+
+        Args:
+            path: Path of the JSON file used for persistence
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._guilds = self._read()
+        self._passive_channels = {}
+
+        for settings in self._guilds.values():
+            for channel_id, language in settings.get( 'passive_channels', {} ).items():
+                self._passive_channels[int( channel_id )] = language
+
+    def _read( self ):
+        """
+        Reads the guild settings from disk.
+
+        Returns:
+            The settings by guild ID, empty if the file is missing or unreadable
+        """
+        if not os.path.exists( self.path ):
+            return {}
+
+        try:
+            with open( self.path, 'r', encoding='utf-8' ) as f:
+                return json.load( f ).get( 'guilds', {} )
+        except Exception as e:
+            print( f"Error loading guild settings: {e}" )
+            return {}
+
+    def _save( self, guild_id ):
+        """
+        Writes one guild's settings to disk atomically, keeping the other
+        guilds as they are on disk (other processes may have changed them).
+
+        Args:
+            guild_id: The Discord guild ID whose settings changed
+        """
+        key = str( guild_id )
+        lock_file = open( f"{self.path}.lock", 'w' ) if fcntl else None
+
+        try:
+            if lock_file:
+                fcntl.flock( lock_file, fcntl.LOCK_EX )
+
+            guilds = self._read()
+            guilds[key] = self._guilds[key]
+
+            temp_path = f"{self.path}.tmp"
+            with open( temp_path, 'w', encoding='utf-8' ) as f:
+                json.dump( {'guilds': guilds}, f, indent=2 )
+            os.replace( temp_path, self.path )
+        except Exception as e:
+            print( f"Error saving guild settings: {e}" )
+        finally:
+            if lock_file:
+                lock_file.close()
+
+    def get( self, guild_id, key, default=None ):
+        """
+        Gets a setting for a guild.
+
+        Args:
+            guild_id: The Discord guild ID
+            key: The setting name
+            default: Value returned if the setting is not set
+
+        Returns:
+            The setting value, or default
+        """
+        return self._guilds.get( str( guild_id ), {} ).get( key, default )
+
+    def items( self, key ):
+        """
+        Gets a setting of every guild that has it.
+
+        Args:
+            key: The setting name
+
+        Returns:
+            A list of (guild ID, value) pairs
+        """
+        return [( int( guild_id ), settings[key] ) for guild_id, settings in list( self._guilds.items() ) if key in settings]
+
+    def set( self, guild_id, key, value ):
+        """
+        Changes a setting for a guild and saves it.
+
+        Args:
+            guild_id: The Discord guild ID
+            key: The setting name
+            value: The new value (must be JSON serializable)
+        """
+        with self._lock:
+            self._guilds.setdefault( str( guild_id ), {} )[key] = value
+            self._save( guild_id )
+
+    def passive_language( self, channel_id ):
+        """
+        Gets the language used for passive reference detection in a channel.
+
+        Args:
+            channel_id: The Discord channel ID
+
+        Returns:
+            'en' or 'de', or None if passive detection is off for the channel
+        """
+        return self._passive_channels.get( channel_id )
+
+    def set_passive( self, guild_id, channel_id, language ):
+        """
+        Turns passive reference detection on or off for a channel.
+
+        Args:
+            guild_id: The Discord guild ID
+            channel_id: The Discord channel ID
+            language: 'en' or 'de' to turn detection on, None to turn it off
+        """
+        with self._lock:
+            channels = self._guilds.setdefault( str( guild_id ), {} ).setdefault( 'passive_channels', {} )
+
+            if language:
+                channels[str( channel_id )] = language
+                self._passive_channels[channel_id] = language
+            else:
+                channels.pop( str( channel_id ), None )
+                self._passive_channels.pop( channel_id, None )
+
+            self._save( guild_id )
@@ -0,0 +1,210 @@
+"""
+Runs the bot as several processes ("clusters"), each with a share of the shards.
+
+One process is limited to one CPU core, so larger deployments split their
+shards over several processes. All clusters share one passage and catalog
+cache (SHARED_CACHE_FILE), so a passage fetched by one cluster is a local
+read for the others. Clusters that exit are restarted.
+
+Run with: python launcher.py
+Configuration (environment or .env):
+    SHARD_COUNT: Total number of shards (default: Discord's recommendation)
+    CLUSTERS: Number of processes (default: number of CPU cores)
+    SHARED_CACHE_FILE: Shared cache file (default: shared_cache.sqlite3)
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+import requests
+from dotenv import load_dotenv
+
+# Discord allows one shard to identify every 5 seconds (per concurrency bucket)
+IDENTIFY_INTERVAL = 5
+
+# Seconds to wait before restarting a cluster that exited
+RESTART_DELAY = 10
+
+BOT_SCRIPT = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'bible_bot.py' )
+
+
+def recommended_shard_count( token ):
+    """
+    Asks Discord how many shards the bot should use.
+
+    Args:
+        token: The bot token
+
+    Returns:
+        The recommended number of shards
+    """
+    response = requests.get(
+        'https://discord.com/api/v10/gateway/bot',
+        headers={'Authorization': f"Bot {token}"},
+        timeout=10
+    )
+    response.raise_for_status()
+    return response.json()['shards']
+
+
+def plan_clusters( shard_count, clusters ):
+    """
+    Splits the shards into contiguous groups, one per cluster.
+
+    Args:
+        shard_count: Total number of shards
+        clusters: Number of processes wanted (at most one per shard is used)
+
+    Returns:
+        A list of shard ID lists, one per cluster
+    """
+    clusters = max( 1, min( clusters, shard_count ) )
+    size, extra = divmod( shard_count, clusters )
+
+    plan = []
+    start = 0
+    for cluster in range( clusters ):
+        end = start + size + ( 1 if cluster < extra else 0 )
+        plan.append( list( range( start, end ) ) )
+        start = end
+
+    return plan
+
+
+def cluster_env( base_env, cluster_id, shard_ids, shard_count ):
+    """
+    Builds the environment of one cluster process.
+
+    Args:
+        base_env: The launcher's environment
+        cluster_id: Index of the cluster
+        shard_ids: The shards the cluster runs
+        shard_count: Total number of shards
+
+    Returns:
+        A new environment dictionary
+    """
+    env = dict( base_env )
+    env['SHARD_COUNT'] = str( shard_count )
+    env['SHARD_IDS'] = ','.join( str( shard_id ) for shard_id in shard_ids )
+    env['CLUSTER_ID'] = str( cluster_id )
+    env.setdefault( 'SHARED_CACHE_FILE', 'shared_cache.sqlite3' )
+
+    # Each cluster writes its own metrics, popularity scores and verse of the day state
+    if env.get( 'METRICS_FILE' ):
+        env['METRICS_FILE'] = f"{env['METRICS_FILE']}.{cluster_id}"
+    popularity_file = env.get( 'POPULARITY_FILE', 'popularity.json' )
+    if popularity_file:
+        env['POPULARITY_FILE'] = f"{popularity_file}.{cluster_id}"
+    votd_state_file = env.get( 'VOTD_STATE_FILE', 'votd_state.json' )
+    if votd_state_file:
+        env['VOTD_STATE_FILE'] = f"{votd_state_file}.{cluster_id}"
+
+    return env
+
+
+class Launcher:
+    """
+    Starts the cluster processes and restarts those that exit.
+    """
+
+    def __init__( self, plan, shard_count, base_env ):
+        """
+        Initialize the launcher.
+
+        Args:
+            plan: Shard ID lists from plan_clusters()
+            shard_count: Total number of shards
+            base_env: Environment passed on to the clusters
+        """
+        self.plan = plan
+        self.shard_count = shard_count
+        self.base_env = base_env
+        self.processes = {}
+        self.stopping = False
+
+    def start( self, cluster_id ):
+        """
+        Starts one cluster process.
+        """
+        shard_ids = self.plan[cluster_id]
+        print( f"Starting cluster {cluster_id} with shard(s) {shard_ids[0]}-{shard_ids[-1]}" )
+
+        self.processes[cluster_id] = subprocess.Popen(
+            [sys.executable, BOT_SCRIPT],
+            env=cluster_env( self.base_env, cluster_id, shard_ids, self.shard_count )
+        )
+
+    def run( self ):
+        """
+        Starts all clusters, spacing them so their shards identify one at a time,
+        then supervises them until stopped.
+        """
+        for cluster_id, shard_ids in enumerate( self.plan ):
+            if self.stopping:
+                break
+
+            self.start( cluster_id )
+            time.sleep( IDENTIFY_INTERVAL * len( shard_ids ) )
+
+        while not self.stopping:
+            time.sleep( 1 )
+
+            for cluster_id, process in list( self.processes.items() ):
+                if process.poll() is not None and not self.stopping:
+                    print( f"Cluster {cluster_id} exited with code {process.returncode}, restarting in {RESTART_DELAY}s" )
+                    time.sleep( RESTART_DELAY )
+                    self.start( cluster_id )
+
+        self.shutdown()
+
+    def stop( self, *_ ):
+        """
+        Signal handler: stops supervising so run() shuts the clusters down.
+        """
+        self.stopping = True
+
+    def shutdown( self ):
+        """
+        Terminates all clusters and waits for them to exit.
+        """
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+
+        for cluster_id, process in self.processes.items():
+            try:
+                process.wait( timeout=30 )
+            except subprocess.TimeoutExpired:
+                print( f"Cluster {cluster_id} did not stop, killing it" )
+                process.kill()
+
+
+def main():
+    """
+    Plans the clusters and runs them.
+    """
+    load_dotenv()
+
+    token = os.getenv( 'DISCORD_BOT_TOKEN' )
+    if not token:
+        print( "❌ DISCORD_BOT_TOKEN not found in environment variables" )
+        return 1
+
+    shard_count = int( os.getenv( 'SHARD_COUNT' ) or recommended_shard_count( token ) )
+    clusters = int( os.getenv( 'CLUSTERS' ) or os.cpu_count() or 1 )
+    plan = plan_clusters( shard_count, clusters )
+
+    print( f"Running {shard_count} shard(s) in {len( plan )} cluster(s)" )
+
+    launcher = Launcher( plan, shard_count, os.environ )
+    signal.signal( signal.SIGINT, launcher.stop )
+    signal.signal( signal.SIGTERM, launcher.stop )
+    launcher.run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,95 @@
+"""
+Simple in-process counters for watching what the bot does per command.
+"""
+
+import os
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """
+    Thread-safe named counters and gauges.
+    """
+
+    def __init__( self ):
+        """
+        Initialize an empty set of counters.
+        """
+        self._counts = defaultdict( int )
+        self._lock = threading.Lock()
+
+    def increment( self, name, amount=1 ):
+        """
+        Adds to a counter.
+
+        Args:
+            name: The counter name (e.g., "discord.rest_calls")
+            amount: How much to add
+        """
+        with self._lock:
+            self._counts[name] += amount
+
+    def set( self, name, value ):
+        """
+        Sets a gauge, e.g. the current queue depth.
+
+        Args:
+            name: The gauge name (e.g., "scheduler.queued.interactive")
+            value: The current value
+        """
+        with self._lock:
+            self._counts[name] = value
+
+    def get( self, name ):
+        """
+        Gets the current value of a counter (0 if it was never incremented).
+        """
+        with self._lock:
+            return self._counts.get( name, 0 )
+
+    def ratio( self, numerator, denominator ):
+        """
+        Divides one counter by another, e.g. REST calls per command.
+
+        Returns:
+            The ratio, or 0.0 if the denominator is 0
+        """
+        with self._lock:
+            total = self._counts.get( denominator, 0 )
+            return self._counts.get( numerator, 0 ) / total if total else 0.0
+
+    def snapshot( self ):
+        """
+        Returns a copy of all counters.
+        """
+        with self._lock:
+            return dict( self._counts )
+
+    def write( self, path ):
+        """
+        Writes all counters to a text file, one "name value" line each, replacing it atomically.
+
+        Args:
+            path: The file to write
+        """
+        lines = [f"{name} {value}" for name, value in sorted( self.snapshot().items() )]
+        temp_path = f"{path}.tmp"
+
+        try:
+            with open( temp_path, 'w', encoding='utf-8' ) as f:
+                f.write( "\n".join( lines ) + "\n" )
+            os.replace( temp_path, path )
+        except Exception as e:
+            print( f"Error writing metrics: {e}" )
+
+    def reset( self ):
+        """
+        Sets all counters back to 0.
+        """
+        with self._lock:
+            self._counts.clear()
+
+
+# Counters shared by the whole bot
+METRICS = Metrics()
@@ -0,0 +1,108 @@
+"""
+Utility script to mirror Bible translations to local disk for /bible-search.
+
+Fetches every chapter not mirrored yet from API.Bible (one request per
+chapter, so a whole Bible takes about 1,200 requests of your quota), then
+updates the search index of the translation. Interrupted runs continue where
+they stopped; the bot picks up the new index without a restart.
+
+Only mirror translations whose license allows keeping a local copy.
+
+Run with: python mirror_bible.py TRANSLATION [BOOK ...]
+      or: python mirror_bible.py --index-only TRANSLATION
+"""
+
+import os
+import sys
+import time
+from dotenv import load_dotenv
+from bible_api import BibleAPI, get_bible_id, DISPLAY_NAMES
+from book_mappings import get_book_id, normalize_book_name
+from canon import BOOK_ORDER, chapter_count
+from search_index import SEARCH_INDEX_DIR, mirrored_chapters, store_chapter, update_index
+
+# Load environment variables
+load_dotenv()
+
+BIBLE_API_KEY = os.getenv( 'BIBLE_API_KEY' )
+
+# Seconds between two chapter requests, to stay well within API.Bible's rate limit
+REQUEST_INTERVAL = float( os.getenv( 'MIRROR_REQUEST_INTERVAL', '0.5' ) )
+
+
+def mirror_book( api, bible_id, book ):
+    """
+    Fetches the chapters of a book that are not mirrored yet.
+
+    Returns:
+        The number of chapters fetched, or None if API.Bible refused a request
+    """
+    done = mirrored_chapters( SEARCH_INDEX_DIR, bible_id, book )
+    fetched = 0
+
+    for chapter in range( 1, chapter_count( book ) + 1 ):
+        if chapter in done:
+            continue
+
+        result = api._fetch_passage( bible_id, f"{get_book_id( book )}.{chapter}" )
+
+        if not result['success']:
+            print( f"  {book} {chapter}: {result['error']}" )
+            if 'limit' in result['error'] or 'API key' in result['error']:
+                return None
+            continue
+
+        store_chapter( SEARCH_INDEX_DIR, bible_id, book, chapter, result['passage'].verses )
+        fetched += 1
+        time.sleep( REQUEST_INTERVAL )
+
+    return fetched
+
+
+def main():
+    """
+    Mirrors a translation and updates its search index.
+    """
+    args = sys.argv[1:]
+    index_only = '--index-only' in args
+    args = [arg for arg in args if arg != '--index-only']
+
+    if not args:
+        print( __doc__ )
+        exit( 1 )
+
+    bible_id = get_bible_id( args[0] )
+    name = DISPLAY_NAMES.get( bible_id, bible_id )
+
+    books = [normalize_book_name( book ) for book in args[1:]] or BOOK_ORDER
+    unknown = [book for book, normalized in zip( args[1:], books ) if normalized not in BOOK_ORDER]
+    if unknown:
+        print( f"Error: unknown book(s): {', '.join( unknown )}" )
+        exit( 1 )
+
+    if not index_only:
+        if not BIBLE_API_KEY:
+            print( "Error: BIBLE_API_KEY not found in .env file" )
+            exit( 1 )
+
+        api = BibleAPI( BIBLE_API_KEY )
+        print( f"Mirroring {name} ({bible_id}) to {SEARCH_INDEX_DIR}...\n" )
+
+        try:
+            for book in books:
+                fetched = mirror_book( api, bible_id, book )
+                if fetched is None:
+                    print( "Stopped: API.Bible refused the request. Run again later to continue." )
+                    break
+                if fetched:
+                    print( f"  {book}: {fetched} chapters" )
+        except KeyboardInterrupt:
+            print( "\nInterrupted; indexing the chapters mirrored so far." )
+
+    start = time.perf_counter()
+    rebuilt = update_index( SEARCH_INDEX_DIR, bible_id )
+    print( f"\nSearch index of {name} updated ({rebuilt} books tokenized) in {time.perf_counter() - start:.1f} s" )
+
+
+if __name__ == '__main__':
+    main()
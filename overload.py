@@ -0,0 +1,205 @@
+"""
+Overload detection with a cache-only degraded mode.
+
+The controller watches upstream latency, requests in flight, the scheduler
+queue and the API quota. When one of them crosses its limit, the bot stops
+calling API.Bible and serves passages from its caches only. After a cooldown
+it lets single probe requests through, and returns to normal once every
+signal is comfortably below its limit again.
+"""
+
+import os
+import threading
+import time
+from metrics import METRICS
+from scheduler import SCHEDULER
+
+# Average upstream response time (seconds) that triggers degraded mode
+OVERLOAD_LATENCY = float( os.getenv( 'OVERLOAD_LATENCY', '3.0' ) )
+
+# Number of upstream requests in flight that triggers degraded mode
+OVERLOAD_IN_FLIGHT = int( os.getenv( 'OVERLOAD_IN_FLIGHT', '32' ) )
+
+# Number of queued scheduler jobs that triggers degraded mode
+OVERLOAD_QUEUE = int( os.getenv( 'OVERLOAD_QUEUE', '50' ) )
+
+# Remaining API quota (requests) below which the bot stops calling upstream
+OVERLOAD_QUOTA_MIN = int( os.getenv( 'OVERLOAD_QUOTA_MIN', '50' ) )
+
+# Remaining API quota kept for user commands; optional work (warm-up, prefetching) stops below it
+OVERLOAD_BACKGROUND_RESERVE = int( os.getenv( 'OVERLOAD_BACKGROUND_RESERVE', '1000' ) )
+
+# Minimum seconds in degraded mode, and between probe requests while degraded
+OVERLOAD_COOLDOWN = float( os.getenv( 'OVERLOAD_COOLDOWN', '30' ) )
+
+# Signals must drop below this share of their limits before the bot recovers
+RECOVERY_RATIO = 0.5
+
+# Weight of the newest sample in the moving average of upstream latency
+_LATENCY_WEIGHT = 0.2
+
+
+class OverloadController:
+    """
+    Decides whether upstream requests are allowed, switching between normal and degraded mode.
+    """
+
+    def __init__( self, latency_limit=OVERLOAD_LATENCY, in_flight_limit=OVERLOAD_IN_FLIGHT,
+                  queue_limit=OVERLOAD_QUEUE, quota_min=OVERLOAD_QUOTA_MIN, cooldown=OVERLOAD_COOLDOWN,
+                  queue_depth=lambda: SCHEDULER.queued, background_reserve=OVERLOAD_BACKGROUND_RESERVE ):
+        """
+        Initialize the controller.
+
+        Args:
+            latency_limit: Average upstream latency in seconds that triggers degraded mode
+            in_flight_limit: Upstream requests in flight that trigger degraded mode
+            queue_limit: Queued jobs that trigger degraded mode
+            quota_min: Remaining quota below which degraded mode starts
+            cooldown: Minimum seconds in degraded mode and between probes
+            queue_depth: Function returning the current number of queued jobs
+            background_reserve: Remaining quota below which optional upstream work stops
+        """
+        self.latency_limit = latency_limit
+        self.in_flight_limit = in_flight_limit
+        self.queue_limit = queue_limit
+        self.quota_min = quota_min
+        self.cooldown = cooldown
+        self.queue_depth = queue_depth
+        self.background_reserve = background_reserve
+
+        self.degraded = False
+        self.latency = 0.0
+        self.in_flight = 0
+        self.quota_remaining = None
+
+        self._degraded_since = 0.0
+        self._last_probe = 0.0
+        self._lock = threading.Lock()
+
+    def allow_upstream( self ):
+        """
+        Whether a request may go to the API now. While degraded, one probe
+        request is let through per cooldown period to measure recovery.
+
+        Returns:
+            True if the request may go upstream, False to serve from caches only
+        """
+        with self._lock:
+            self._evaluate()
+
+            if not self.degraded:
+                return True
+
+            now = time.monotonic()
+            if now - self._last_probe >= self.cooldown:
+                self._last_probe = now
+                METRICS.increment( 'overload.probes' )
+                return True
+
+            METRICS.increment( 'overload.cache_only' )
+            return False
+
+    def allow_background( self ):
+        """
+        Whether optional upstream work (cache warm-up, prefetching) may run now:
+        only in normal mode, with spare capacity, and while more quota is left
+        than the reserve kept for user commands. Never uses up a probe.
+
+        Returns:
+            True if the work may go upstream
+        """
+        with self._lock:
+            self._evaluate()
+
+            if self.degraded:
+                return False
+
+            if self.quota_remaining is not None and self.quota_remaining < self.background_reserve:
+                return False
+
+            return self.in_flight < self.in_flight_limit * RECOVERY_RATIO
+
+    def request_started( self ):
+        """
+        Records that an upstream request has started.
+        """
+        with self._lock:
+            self.in_flight += 1
+            METRICS.set( 'overload.in_flight', self.in_flight )
+
+    def request_finished( self, latency, quota_remaining=None, rate_limited=False ):
+        """
+        Records the outcome of an upstream request.
+
+        Args:
+            latency: Seconds the request took
+            quota_remaining: Remaining quota reported by the API, if any
+            rate_limited: Whether the API refused the request for exceeding the quota
+        """
+        with self._lock:
+            self.in_flight -= 1
+            self.latency += _LATENCY_WEIGHT * ( latency - self.latency )
+
+            if rate_limited:
+                self.quota_remaining = 0
+            elif quota_remaining is not None:
+                self.quota_remaining = quota_remaining
+
+            METRICS.set( 'overload.in_flight', self.in_flight )
+            METRICS.set( 'overload.latency_ms', round( self.latency * 1000 ) )
+            if self.quota_remaining is not None:
+                METRICS.set( 'overload.quota_remaining', self.quota_remaining )
+
+            self._evaluate()
+
+    def _evaluate( self ):
+        """
+        Switches modes based on the current signals. Call with the lock held.
+        """
+        if not self.degraded:
+            reason = self._overload_reason( 1.0 )
+            if reason:
+                self._set_degraded( True, reason )
+            return
+
+        if time.monotonic() - self._degraded_since < self.cooldown:
+            return
+
+        if not self._overload_reason( RECOVERY_RATIO ):
+            self._set_degraded( False, "signals back to normal" )
+
+    def _overload_reason( self, ratio ):
+        """
+        Describes the first signal above its limit (scaled by ratio), or returns None.
+        """
+        if self.latency > self.latency_limit * ratio:
+            return f"upstream latency {self.latency:.1f}s"
+
+        if self.in_flight > self.in_flight_limit * ratio:
+            return f"{self.in_flight} requests in flight"
+
+        queued = self.queue_depth()
+        if queued > self.queue_limit * ratio:
+            return f"{queued} jobs queued"
+
+        # Quota only recovers when the API reports more, so it is not scaled
+        if self.quota_remaining is not None and self.quota_remaining < self.quota_min:
+            return f"API quota nearly used up ({self.quota_remaining} left)"
+
+        return None
+
+    def _set_degraded( self, degraded, reason ):
+        """
+        Changes the mode, logging and counting the change.
+        """
+        self.degraded = degraded
+        self._degraded_since = time.monotonic()
+        self._last_probe = self._degraded_since
+
+        print( f"{'Entering' if degraded else 'Leaving'} degraded (cache-only) mode: {reason}" )
+        METRICS.increment( 'overload.mode_changes' )
+        METRICS.set( 'overload.degraded', int( degraded ) )
+
+
+# Controller shared by the whole bot
+OVERLOAD = OverloadController()
@@ -0,0 +1,227 @@
+"""
+Helpers for fitting Bible passages into Discord's message size limit.
+"""
+
+import re
+import threading
+
+# Discord rejects messages longer than this
+DISCORD_MESSAGE_LIMIT = 2000
+
+# Room left on every page for the "**Reference** (Translation) · 2/5" header
+PAGE_HEADER_RESERVE = 150
+
+# Position before each verse number marker like "[16]"
+_VERSE_BOUNDARY = re.compile( r'(?=\[\d+\])' )
+
+
+def _split_long( text, limit ):
+    """
+    Splits text that is longer than the limit at whitespace.
+    """
+    while len( text ) > limit:
+        cut = text.rfind( ' ', 0, limit )
+        if cut <= 0:
+            cut = limit
+        yield text[:cut]
+        text = text[cut:].lstrip()
+
+    if text:
+        yield text
+
+
+def split_pages( text, limit=DISCORD_MESSAGE_LIMIT ):
+    """
+    Splits passage text into pages on verse boundaries.
+
+    Verses start at their number marker (e.g., "[16]"). A single verse longer
+    than a page is split at whitespace.
+
+    Args:
+        text: The passage text
+        limit: Maximum length of a page
+
+    Returns:
+        A list of page strings
+    """
+    pages = []
+    current = ""
+
+    for verse in _VERSE_BOUNDARY.split( text ):
+        for piece in _split_long( verse, limit ):
+            if current and len( current ) + len( piece ) > limit:
+                pages.append( current.rstrip() )
+                current = piece
+            else:
+                current += piece
+
+    if current.strip():
+        pages.append( current.rstrip() )
+
+    return pages
+
+
+def pack_blocks( blocks, limit=DISCORD_MESSAGE_LIMIT, separator="\n\n" ):
+    """
+    Packs text blocks into as few messages as possible.
+
+    Blocks are kept in order and never split across messages unless a single
+    block is longer than the limit; such a block is split on verse boundaries.
+
+    Args:
+        blocks: A list of text blocks (e.g., one per Bible reference)
+        limit: Maximum length of a message
+        separator: Text placed between blocks in the same message
+
+    Returns:
+        A list of message strings
+    """
+    messages = []
+    current = ""
+
+    for block in blocks:
+        for part in split_pages( block, limit ) if len( block ) > limit else [block]:
+            if current and len( current ) + len( separator ) + len( part ) <= limit:
+                current += separator + part
+            else:
+                if current:
+                    messages.append( current )
+                current = part
+
+    if current:
+        messages.append( current )
+
+    return messages
+
+
+class PassagePager:
+    """
+    Splits a long passage into pages, fetching its chunks only when a page needs them.
+
+    The first page is available as soon as the first chunk has been fetched;
+    later chunks are loaded when someone asks for a page beyond what is loaded.
+    """
+
+    def __init__( self, title, chunks, limit=DISCORD_MESSAGE_LIMIT ):
+        """
+        Initialize the pager.
+
+        Args:
+            title: The formatted reference shown on every page
+            chunks: A list of (label, loader) tuples in reading order; each loader
+                takes a Deadline (or None) and returns a result dictionary from fetch_verse()
+            limit: Maximum length of a rendered page
+        """
+        self.title = title
+        self.translation = None
+        self.error = None
+        self.timed_out = False
+
+        # Whether any chunk was served from an expired cache entry because the fetch failed
+        self.stale = False
+
+        self._chunks = list( chunks )
+        self._loaded = 0
+        self._pages = []
+        self._body_limit = limit - PAGE_HEADER_RESERVE
+        self._lock = threading.Lock()
+
+    @property
+    def complete( self ):
+        """
+        Whether every chunk has been loaded, so the number of pages is known.
+        """
+        return self.error is not None or self._loaded >= len( self._chunks )
+
+    @property
+    def page_count( self ):
+        """
+        Number of pages rendered so far.
+        """
+        return len( self._pages )
+
+    def _load_next_chunk( self, deadline ):
+        """
+        Fetches the next chunk and splits it into pages.
+
+        Returns:
+            False if the chunk ran out of time and should be tried again later
+        """
+        label, loader = self._chunks[self._loaded]
+        result = loader( deadline )
+
+        self.timed_out = bool( result.get( 'timed_out' ) )
+        if self.timed_out:
+            return False
+
+        self._loaded += 1
+
+        if not result['success']:
+            if not self._pages:
+                self.error = result['error']
+            else:
+                self._pages.append( f"❌ **{label}**: {result['error']}" )
+            return True
+
+        self.translation = self.translation or result['translation']
+        self.stale = self.stale or bool( result.get( 'stale' ) )
+        text = result['text']
+
+        # Mark where each chunk starts when the passage has several
+        if len( self._chunks ) > 1:
+            text = f"__{label}__\n{text}"
+
+        self._pages.extend( split_pages( text, self._body_limit ) )
+        return True
+
+    def get_page( self, index, deadline=None ):
+        """
+        Renders a page, fetching chunks as needed. Blocking; run it in a worker thread.
+
+        Only the chunks up to the requested page are loaded; whether a next
+        page exists follows from the chunks still to load (see has_page()).
+        If a chunk runs out of time, loading stops and timed_out is set.
+
+        Args:
+            index: The page number (0-based)
+            deadline: Optional Deadline passed on to the chunk loaders
+
+        Returns:
+            The page text, or None if the page does not exist (or is not loaded yet)
+        """
+        with self._lock:
+            while not self.complete and len( self._pages ) <= index:
+                if not self._load_next_chunk( deadline ):
+                    break
+
+            if self.error or index >= len( self._pages ):
+                return None
+
+            return self._render( index )
+
+    def is_ready( self, index ):
+        """
+        Whether get_page() can return a page without fetching anything.
+        """
+        if self.complete:
+            return True
+        return 0 <= index < len( self._pages )
+
+    def has_page( self, index ):
+        """
+        Whether a page exists or will exist once more chunks are loaded
+        (every chunk still to load adds at least one page).
+        """
+        return 0 <= index and ( index < len( self._pages ) or not self.complete )
+
+    def _render( self, index ):
+        """
+        Adds the header to a page.
+        """
+        header = f"**{self.title}** ({self.translation})"
+
+        if len( self._pages ) > 1 or not self.complete:
+            total = len( self._pages ) if self.complete else "…"
+            header += f" · {index + 1}/{total}"
+
+        return f"{header}\n\n{self._pages[index]}"
@@ -0,0 +1,314 @@
+"""
+Structured Bible passages parsed from API.Bible JSON content.
+
+A passage is parsed once into verses and paragraph breaks and cached as is;
+every output format is rendered from that structure on first use and then
+kept on the passage, so repeated commands never touch upstream markup again.
+"""
+
+import re
+
+# Output formats understood by Passage.render()
+FORMATS = ( 'plain', 'superscript', 'compact', 'embed' )
+
+# Discord limit for the value of one embed field
+EMBED_FIELD_LIMIT = 1024
+
+# Tags whose content is not part of the Bible text
+_SKIPPED_TAGS = ( 'verse', 'note' )
+
+_WHITESPACE = re.compile( r'\s+' )
+_SUPERSCRIPT = str.maketrans( '0123456789', '⁰¹²³⁴⁵⁶⁷⁸⁹' )
+
+
+def parse_content( content ):
+    """
+    Parses API.Bible JSON content into verses and paragraph breaks.
+
+    The content is a tree of tags ("para", "char", ...) and text nodes; text
+    nodes carry the ID of the verse they belong to (e.g., "GEN.1.1"). Text
+    outside any verse, such as headings, is ignored.
+
+    Args:
+        content: The "content" list from a passages response with content-type=json
+
+    Returns:
+        A tuple (verses, paragraph_starts): verses is a tuple of (chapter, verse, text)
+        tuples in reading order, paragraph_starts a frozenset of indices into verses
+        where a new paragraph begins
+    """
+    verses = []
+    parts = []
+    paragraph_starts = set()
+    state = {'verse_id': None, 'new_paragraph': False}
+
+    def walk( nodes ):
+        for node in nodes:
+            if node.get( 'type' ) == 'text':
+                verse_id = ( node.get( 'attrs' ) or {} ).get( 'verseId' )
+
+                if not verse_id:
+                    continue
+
+                if verse_id != state['verse_id']:
+                    _, chapter, verse = verse_id.split( '.' )[:3]
+
+                    if state['new_paragraph'] or ( verses and int( chapter ) != verses[-1][0] ):
+                        paragraph_starts.add( len( verses ) )
+
+                    verses.append( ( int( chapter ), int( verse ) ) )
+                    parts.append( [] )
+                    state['verse_id'] = verse_id
+                    state['new_paragraph'] = False
+
+                parts[-1].append( node.get( 'text', '' ) )
+                continue
+
+            if node.get( 'name' ) in _SKIPPED_TAGS:
+                continue
+
+            if node.get( 'name' ) == 'para':
+                state['new_paragraph'] = True
+
+            walk( node.get( 'items', [] ) )
+
+    walk( content )
+
+    paragraph_starts.discard( 0 )
+
+    verses = tuple(
+        ( chapter, verse, _WHITESPACE.sub( ' ', ''.join( texts ) ).strip() )
+        for ( chapter, verse ), texts in zip( verses, parts )
+    )
+    return verses, frozenset( paragraph_starts )
+
+
+class Passage:
+    """
+    A fetched passage: its verses, paragraph breaks and memoized renderings.
+    """
+
+    def __init__( self, reference, translation, verses, paragraph_starts=frozenset() ):
+        """
+        Initialize the passage.
+
+        Args:
+            reference: The reference as reported by the API (e.g., "Genesis 1:1-3")
+            translation: The translation display name
+            verses: A sequence of (chapter, verse, text) tuples in reading order
+            paragraph_starts: Indices into verses where a new paragraph begins
+        """
+        self.reference = reference
+        self.translation = translation
+        self.verses = tuple( verses )
+        self.paragraph_starts = frozenset( paragraph_starts )
+        self._renders = {}
+
+    @classmethod
+    def from_content( cls, reference, translation, content ):
+        """
+        Builds a passage from API.Bible JSON content.
+        """
+        verses, paragraph_starts = parse_content( content )
+        return cls( reference, translation, verses, paragraph_starts )
+
+    @classmethod
+    def join( cls, passages, separate=True ):
+        """
+        Combines consecutive passages into one.
+
+        Args:
+            passages: Passages in reading order
+            separate: Whether each passage starts a new paragraph; otherwise only
+                a change of chapter does (for pieces of one continuous range)
+
+        Returns:
+            A new Passage
+        """
+        verses = []
+        paragraph_starts = set()
+
+        for passage in passages:
+            if verses and passage.verses and ( separate or passage.verses[0][0] != verses[-1][0] ):
+                paragraph_starts.add( len( verses ) )
+            paragraph_starts.update( len( verses ) + index for index in passage.paragraph_starts )
+            verses.extend( passage.verses )
+
+        return cls(
+            '; '.join( passage.reference for passage in passages ),
+            passages[0].translation,
+            verses,
+            paragraph_starts
+        )
+
+    def to_dict( self ):
+        """
+        Converts the passage to JSON-serializable data (without renderings).
+        """
+        return {
+            'reference': self.reference,
+            'translation': self.translation,
+            'verses': [list( verse ) for verse in self.verses],
+            'paragraph_starts': sorted( self.paragraph_starts ),
+        }
+
+    @classmethod
+    def from_dict( cls, data ):
+        """
+        Rebuilds a passage from the output of to_dict().
+        """
+        return cls(
+            data['reference'],
+            data['translation'],
+            ( tuple( verse ) for verse in data['verses'] ),
+            data['paragraph_starts']
+        )
+
+    def to_text( self ):
+        """
+        Converts the passage to a compact text record (without renderings).
+
+        Lines: reference, translation, paragraph starts ("0,4"), then one
+        "chapter<TAB>verse<TAB>text" line per verse. Verse text never contains
+        tabs or line breaks, since parse_content() collapses whitespace.
+        """
+        lines = [self.reference, self.translation, ','.join( str( index ) for index in sorted( self.paragraph_starts ) )]
+        lines.extend( f"{chapter}\t{verse}\t{text}" for chapter, verse, text in self.verses )
+        return "\n".join( lines )
+
+    @classmethod
+    def from_text( cls, text ):
+        """
+        Rebuilds a passage from the output of to_text().
+        """
+        lines = text.split( "\n" )
+        verses = []
+
+        for line in lines[3:]:
+            chapter, verse, verse_text = line.split( "\t", 2 )
+            verses.append( ( int( chapter ), int( verse ), verse_text ) )
+
+        paragraph_starts = [int( index ) for index in lines[2].split( ',' )] if lines[2] else ()
+        return cls( lines[0], lines[1], verses, paragraph_starts )
+
+    def render( self, output_format='plain' ):
+        """
+        Renders the passage, reusing an earlier rendering of the same format.
+
+        Formats:
+            plain: "[1] In the beginning… [2] …", one line per paragraph
+            superscript: "¹In the beginning… ²…", one line per paragraph
+            compact: The text only, without verse numbers or line breaks
+            embed: A tuple of (name, value) pairs for Discord embed fields
+
+        Args:
+            output_format: One of FORMATS
+
+        Returns:
+            The rendered text (a tuple of fields for "embed")
+        """
+        rendered = self._renders.get( output_format )
+
+        if rendered is None:
+            if output_format not in FORMATS:
+                raise ValueError( f"Unknown passage format: {output_format}" )
+
+            rendered = getattr( self, f"_render_{output_format}" )()
+            self._renders[output_format] = rendered
+
+        return rendered
+
+    def _paragraphs( self, numbered ):
+        """
+        Groups the verses into paragraphs of (verse, formatted text) pairs.
+        """
+        paragraphs = []
+
+        for index, ( _, verse, text ) in enumerate( self.verses ):
+            if index == 0 or index in self.paragraph_starts:
+                paragraphs.append( [] )
+            paragraphs[-1].append( ( verse, numbered( verse, text ) ) )
+
+        return paragraphs
+
+    def _render_plain( self ):
+        """
+        "[1] …" verse markers, one line per paragraph.
+        """
+        paragraphs = self._paragraphs( lambda verse, text: f"[{verse}] {text}" )
+        return "\n".join( " ".join( text for _, text in paragraph ) for paragraph in paragraphs )
+
+    def _render_superscript( self ):
+        """
+        Superscript verse numbers, one line per paragraph.
+        """
+        paragraphs = self._paragraphs( lambda verse, text: f"{str( verse ).translate( _SUPERSCRIPT )}{text}" )
+        return "\n".join( " ".join( text for _, text in paragraph ) for paragraph in paragraphs )
+
+    def _render_compact( self ):
+        """
+        Text only, on one line.
+        """
+        return " ".join( text for _, _, text in self.verses )
+
+    def _render_embed( self ):
+        """
+        Embed fields, one per paragraph where it fits.
+        """
+        paragraphs = self._paragraphs( lambda verse, text: f"{str( verse ).translate( _SUPERSCRIPT )}{text}" )
+        fields = []
+
+        # One field per paragraph, split further where a paragraph exceeds the field limit
+        for paragraph in paragraphs:
+            first = paragraph[0][0]
+            value = ""
+
+            for verse, text in paragraph:
+                if value and len( value ) + 1 + len( text ) > EMBED_FIELD_LIMIT:
+                    fields.append( ( _verse_label( first, last ), value ) )
+                    first = verse
+                    value = ""
+
+                value = f"{value} {text}" if value else text[:EMBED_FIELD_LIMIT]
+                last = verse
+
+            fields.append( ( _verse_label( first, last ), value ) )
+
+        return tuple( fields )
+
+
+def render_parallel( passages, labels ):
+    """
+    Lines up several translations of the same passage verse by verse.
+
+    Verses are matched by chapter and verse number; a verse missing from a
+    translation (different versification) is left out for that translation.
+
+    Args:
+        passages: Passages of the same reference in different translations
+        labels: A label per passage (e.g., the translation name)
+
+    Returns:
+        A list of text blocks, one per verse: the verse number, then one line per translation
+    """
+    texts = {}
+
+    for index, passage in enumerate( passages ):
+        for chapter, verse, text in passage.verses:
+            texts.setdefault( ( chapter, verse ), [] ).append( ( index, text ) )
+
+    several_chapters = len( { chapter for chapter, _ in texts } ) > 1
+    blocks = []
+
+    for ( chapter, verse ), lines in sorted( texts.items() ):
+        number = f"{chapter}:{verse}" if several_chapters else f"{verse}"
+        blocks.append( "\n".join( [f"**{number}**"] + [f"**{labels[index]}** {text}" for index, text in lines] ) )
+
+    return blocks
+
+
+def _verse_label( first, last ):
+    """
+    Formats a verse range for an embed field name (e.g., "1-3").
+    """
+    return f"{first}" if first == last else f"{first}-{last}"
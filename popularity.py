@@ -0,0 +1,232 @@
+"""
+Passage popularity and cache warm-up after a restart.
+
+Every passage lookup adds to a popularity score per (bible_id, api_reference)
+that decays with a configurable half-life, so last week's favourites count
+more than last year's. The scores are written to disk periodically; after a
+restart the most popular passages are loaded into the passage cache in the
+background, before users ask for them.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from metrics import METRICS
+from overload import OVERLOAD
+from scheduler import SCHEDULER, JobShed, LANE_BACKGROUND
+
+# File with the popularity scores (unset = scores are not kept across restarts)
+POPULARITY_FILE = os.getenv( 'POPULARITY_FILE', 'popularity.json' )
+
+# Days after which a lookup counts half as much
+POPULARITY_HALF_LIFE_DAYS = float( os.getenv( 'POPULARITY_HALF_LIFE_DAYS', '7' ) )
+
+# Seconds between writes of the scores
+POPULARITY_SAVE_INTERVAL = int( os.getenv( 'POPULARITY_SAVE_INTERVAL', '300' ) )
+
+# Number of passages whose scores are kept
+POPULARITY_MAX_KEYS = int( os.getenv( 'POPULARITY_MAX_KEYS', '5000' ) )
+
+# Most popular passages loaded at startup (0 = no warm-up), and most API requests spent on it
+WARMUP_PASSAGES = int( os.getenv( 'WARMUP_PASSAGES', '200' ) )
+WARMUP_QUOTA = int( os.getenv( 'WARMUP_QUOTA', '100' ) )
+
+# Scores are rescaled before their weights grow beyond this (2^40)
+_RESCALE_EXPONENT = 40
+
+
+class PopularityTracker:
+    """
+    Exponentially decayed lookup counts per passage.
+
+    Lookups are weighted by 2^(age of the tracker / half-life) instead of
+    decaying every score over time (forward decay), so recording a lookup
+    only touches one entry.
+    """
+
+    def __init__( self, path=POPULARITY_FILE, half_life=POPULARITY_HALF_LIFE_DAYS * 86400, max_keys=POPULARITY_MAX_KEYS ):
+        """
+        Initialize the tracker and load the saved scores.
+
+        Args:
+            path: JSON file for the scores, or None to keep them in memory only
+            half_life: Seconds after which a lookup counts half as much
+            max_keys: Number of passages whose scores are kept
+        """
+        self.path = path
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self.epoch = time.time()
+        self._scores = {}
+        self._lock = threading.Lock()
+
+        if path:
+            self.load()
+
+    def _weight( self, now ):
+        """
+        Weight of a lookup at the given time, relative to the epoch.
+        """
+        return 2 ** ( ( now - self.epoch ) / self.half_life )
+
+    def record( self, bible_id, api_ref ):
+        """
+        Counts one lookup of a passage.
+
+        Args:
+            bible_id: The Bible translation ID
+            api_ref: The API reference string (e.g., "JHN.3.16")
+        """
+        key = ( bible_id, api_ref )
+        now = time.time()
+
+        with self._lock:
+            if ( now - self.epoch ) / self.half_life > _RESCALE_EXPONENT:
+                self._rescale( now )
+
+            self._scores[key] = self._scores.get( key, 0.0 ) + self._weight( now )
+
+            if len( self._scores ) > 2 * self.max_keys:
+                self._prune()
+
+    def _rescale( self, now ):
+        """
+        Moves the epoch to now, scaling the scores down accordingly. Call with the lock held.
+        """
+        factor = self._weight( now )
+        self._scores = {key: score / factor for key, score in self._scores.items()}
+        self.epoch = now
+
+    def _prune( self ):
+        """
+        Keeps only the max_keys most popular passages. Call with the lock held.
+        """
+        top = sorted( self._scores.items(), key=lambda item: item[1], reverse=True )[:self.max_keys]
+        self._scores = dict( top )
+
+    def score( self, bible_id, api_ref ):
+        """
+        Current decayed lookup count of a passage.
+        """
+        with self._lock:
+            return self._scores.get( ( bible_id, api_ref ), 0.0 ) / self._weight( time.time() )
+
+    def top( self, count ):
+        """
+        The most popular passages.
+
+        Args:
+            count: Number of passages
+
+        Returns:
+            A list of (bible_id, api_ref) pairs, most popular first
+        """
+        with self._lock:
+            ranked = sorted( self._scores.items(), key=lambda item: item[1], reverse=True )
+
+        return [key for key, _ in ranked[:count]]
+
+    def load( self ):
+        """
+        Reads the saved scores, converting them to this tracker's epoch.
+        """
+        if not os.path.exists( self.path ):
+            return
+
+        try:
+            with open( self.path, 'r', encoding='utf-8' ) as f:
+                data = json.load( f )
+
+            # log2 of the factor, so very old files do not overflow
+            shift = ( data['epoch'] - self.epoch ) / self.half_life
+            scores = {}
+            for bible_id, api_ref, score in data.get( 'scores', [] ):
+                if score > 0:
+                    scores[( bible_id, api_ref )] = 2 ** ( math.log2( score ) + shift )
+
+            with self._lock:
+                self._scores = scores
+                self._prune()
+        except Exception as e:
+            print( f"Error loading popularity scores: {e}" )
+
+    def save( self ):
+        """
+        Writes the scores to disk atomically.
+        """
+        if not self.path:
+            return
+
+        with self._lock:
+            self._prune()
+            data = {
+                'epoch': self.epoch,
+                'scores': [[bible_id, api_ref, score] for ( bible_id, api_ref ), score in self._scores.items()]
+            }
+
+        try:
+            temp_path = f"{self.path}.tmp"
+            with open( temp_path, 'w', encoding='utf-8' ) as f:
+                json.dump( data, f )
+            os.replace( temp_path, self.path )
+        except Exception as e:
+            print( f"Error saving popularity scores: {e}" )
+
+    def __len__( self ):
+        with self._lock:
+            return len( self._scores )
+
+
+# Lookup counts of this process
+POPULARITY = PopularityTracker()
+
+
+async def warm_up( warm, passages, count=WARMUP_PASSAGES, quota=WARMUP_QUOTA, scheduler=SCHEDULER ):
+    """
+    Loads the most popular passages into the cache, one at a time on the
+    background lane, until count passages are done, quota API requests are
+    spent, or optional upstream work is no longer allowed.
+
+    Progress is exported as warmup.done of warmup.total (and warmup.progress, 0-1).
+
+    Args:
+        warm: Blocking function (bible_id, api_ref) loading one passage; returns True if it asked the API
+        passages: The PopularityTracker to take the passages from
+        count: Number of passages to load
+        quota: Maximum number of API requests
+        scheduler: The Scheduler running the loads
+
+    Returns:
+        The number of API requests made
+    """
+    keys = passages.top( count )
+    fetched = 0
+
+    METRICS.set( 'warmup.total', len( keys ) )
+    METRICS.set( 'warmup.done', 0 )
+    METRICS.set( 'warmup.fetched', 0 )
+    METRICS.set( 'warmup.progress', 0.0 if keys else 1.0 )
+
+    for done, ( bible_id, api_ref ) in enumerate( keys, 1 ):
+        if fetched >= quota or not OVERLOAD.allow_background():
+            print( f"Cache warm-up stopped after {done - 1} of {len( keys )} passages ({fetched} API requests)" )
+            return fetched
+
+        try:
+            if await scheduler.run( warm, bible_id, api_ref, lane=LANE_BACKGROUND ):
+                fetched += 1
+                METRICS.set( 'warmup.fetched', fetched )
+        except JobShed:
+            # Users are waiting; leave the rest to them
+            print( f"Cache warm-up stopped after {done - 1} of {len( keys )} passages: bot is busy" )
+            return fetched
+        except Exception as e:
+            print( f"Error warming passage {api_ref}: {e}" )
+
+        METRICS.set( 'warmup.done', done )
+        METRICS.set( 'warmup.progress', round( done / len( keys ), 3 ) )
+
+    print( f"Cache warm-up loaded {len( keys )} popular passages ({fetched} API requests)" )
+    return fetched
@@ -0,0 +1,170 @@
+"""
+Read-ahead: after serving a passage, load the one users usually ask for next.
+
+Study groups read sequentially (John 3:16, then 3:17, then John 4), so the
+passage following the one just served is fetched in the background and is
+a cache hit when the next command arrives. The canon table bounds the read-
+ahead at the end of a book. Prefetched passages that are later looked up are
+counted, so the hit ratio shows whether read-ahead pays for its requests.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from canon import verse_count
+from metrics import METRICS
+from overload import OVERLOAD
+from reference_parser import parse_reference, segment_verse_count, CHUNK_VERSES
+from scheduler import SCHEDULER, JobShed, LANE_BACKGROUND
+
+# Whether passages are read ahead (guilds can turn it off with /bible-prefetch)
+PREFETCH_ENABLED = os.getenv( 'PREFETCH_ENABLED', 'true' ).lower() in ( '1', 'true', 'yes' )
+
+# Most verses read ahead after one passage
+PREFETCH_MAX_VERSES = int( os.getenv( 'PREFETCH_MAX_VERSES', str( CHUNK_VERSES ) ) )
+
+# Prefetched passages remembered for the hit ratio
+PREFETCH_TRACKED = 4096
+
+
+def next_reference( ref, max_verses=PREFETCH_MAX_VERSES ):
+    """
+    Works out the passage that follows a reference in the same book.
+
+    A reference ending inside a chapter is followed by as many verses as it
+    had (John 3:16 -> John 3:17, Rom 8:1-11 -> Rom 8:12-22). Whole chapters,
+    and ranges that end with their chapter, are followed by the next chapter
+    (John 3 -> John 4).
+
+    Args:
+        ref: A reference dictionary from parse_reference()
+        max_verses: Most verses in the following passage
+
+    Returns:
+        The parsed following reference, or None at the end of the book
+    """
+    segment = ( ref.get( 'segments' ) or [ref] )[-1]
+    book = segment['book']
+    chapter = segment.get( 'chapter_end' ) or segment['chapter']
+    verse = segment.get( 'verse_end' ) or segment['verse_start']
+    last_verse = verse_count( book, chapter )
+
+    if not last_verse:
+        return None
+
+    if verse < last_verse:
+        length = max( 1, min( segment_verse_count( segment ), max_verses ) )
+        end = min( verse + length, last_verse )
+        text = f"{book} {chapter}:{verse + 1}" if end == verse + 1 else f"{book} {chapter}:{verse + 1}-{end}"
+    else:
+        following = verse_count( book, chapter + 1 )
+        if not following:
+            return None
+
+        whole_chapter = segment['verse_start'] == 1 and not segment.get( 'chapter_end' )
+        length = following if whole_chapter else min( segment_verse_count( segment ), following )
+        end = min( length, max_verses, following )
+        text = f"{book} {chapter + 1}:1" if end == 1 else f"{book} {chapter + 1}:1-{end}"
+
+    return parse_reference( text )
+
+
+class PrefetchTracker:
+    """
+    Remembers recently prefetched passages and counts those looked up afterwards.
+    """
+
+    def __init__( self, max_entries=PREFETCH_TRACKED ):
+        """
+        Initialize the tracker.
+
+        Args:
+            max_entries: Number of prefetched passages remembered
+        """
+        self.max_entries = max_entries
+        self.issued = 0
+        self.used = 0
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prefetched( self, key ):
+        """
+        Records that a passage was loaded by read-ahead.
+
+        Args:
+            key: The passage cache key (bible_id, api_reference)
+        """
+        with self._lock:
+            self.issued += 1
+            self._keys[key] = True
+            if len( self._keys ) > self.max_entries:
+                self._keys.popitem( last=False )
+            self._publish()
+
+    def looked_up( self, key ):
+        """
+        Records a lookup of a passage, counting a hit if it was prefetched.
+        """
+        if key not in self._keys:
+            return
+
+        with self._lock:
+            if self._keys.pop( key, None ):
+                self.used += 1
+                self._publish()
+
+    @property
+    def hit_ratio( self ):
+        """
+        Share of prefetched passages that were looked up afterwards.
+        """
+        return self.used / self.issued if self.issued else 0.0
+
+    def _publish( self ):
+        """
+        Exports the counts. Call with the lock held.
+        """
+        METRICS.set( 'prefetch.issued', self.issued )
+        METRICS.set( 'prefetch.used', self.used )
+        METRICS.set( 'prefetch.hit_ratio', round( self.hit_ratio, 3 ) )
+
+
+# Read-ahead of this process
+PREFETCH_TRACKER = PrefetchTracker()
+
+
+async def prefetch_next( prefetch, ref, translation, is_german, guild_id=None, scheduler=SCHEDULER ):
+    """
+    Loads the passage following a reference into the cache on the background lane.
+    Skipped when optional upstream work is not allowed (overload, low quota).
+
+    Args:
+        prefetch: Blocking function (reference, translation, is_german) loading a passage
+        ref: The reference dictionary that was just served
+        translation: Optional translation code
+        is_german: Whether the German command was used
+        guild_id: The Discord guild ID, for the scheduler's fairness
+        scheduler: The Scheduler running the load
+
+    Returns:
+        True if the following passage was loaded
+    """
+    following = next_reference( ref )
+
+    if following is None:
+        return False
+
+    if not OVERLOAD.allow_background():
+        METRICS.increment( 'prefetch.skipped' )
+        return False
+
+    try:
+        await scheduler.run( prefetch, following, translation, is_german, lane=LANE_BACKGROUND, guild_id=guild_id )
+    except JobShed:
+        METRICS.increment( 'prefetch.shed' )
+        return False
+    except Exception as e:
+        print( f"Error prefetching passage: {e}" )
+        return False
+
+    return True
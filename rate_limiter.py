@@ -0,0 +1,159 @@
+"""
+Sliding-window rate limits per user, channel and guild.
+
+Every command is counted against limits for its user, channel and guild.
+Cache hits and upstream misses have separate budgets, because only misses
+use the API.Bible quota. Limits can be overridden per guild, and entries of
+users and channels that have been idle for a whole window are evicted.
+"""
+
+import os
+import time
+from collections import deque
+from metrics import METRICS
+
+# Kinds of requests with separate budgets
+KIND_HIT = 'hit'    # Answered from the response cache
+KIND_MISS = 'miss'  # May need API.Bible
+KIND_PREFETCH = 'prefetch'  # Passages read ahead by the bot after a command
+
+# Scopes every request is counted in
+SCOPES = ( 'user', 'channel', 'guild' )
+
+# Length of the sliding window in seconds
+RATE_LIMIT_WINDOW = float( os.getenv( 'RATE_LIMIT_WINDOW', '60' ) )
+
+# Requests allowed per window, by "<scope>.<kind>" (0 = unlimited)
+DEFAULT_RATE_LIMITS = {
+    'user.hit': 30,
+    'user.miss': 10,
+    'channel.hit': 60,
+    'channel.miss': 30,
+    'guild.hit': 300,
+    'guild.miss': 100,
+    'user.prefetch': 10,
+    'channel.prefetch': 20,
+    'guild.prefetch': 50,
+}
+
+
+def parse_limits( text ):
+    """
+    Parses limit overrides like "user.miss=5, guild.miss=50".
+
+    Args:
+        text: Comma-separated "<scope>.<kind>=<count>" pairs
+
+    Returns:
+        A dictionary of limits (unknown names and invalid counts are skipped)
+    """
+    limits = {}
+
+    for item in ( text or '' ).split( ',' ):
+        name, _, count = item.partition( '=' )
+        name = name.strip()
+
+        if name in DEFAULT_RATE_LIMITS and count.strip().isdigit():
+            limits[name] = int( count )
+
+    return limits
+
+
+# Limits for all guilds, e.g. RATE_LIMITS="user.miss=5,guild.miss=50"
+RATE_LIMITS = dict( DEFAULT_RATE_LIMITS, **parse_limits( os.getenv( 'RATE_LIMITS' ) ) )
+
+
+class RateLimiter:
+    """
+    Counts requests in sliding windows and rejects those over a limit.
+    Use from the event loop only.
+    """
+
+    def __init__( self, window=RATE_LIMIT_WINDOW, limits=None, guild_limits=None ):
+        """
+        Initialize the limiter.
+
+        Args:
+            window: Length of the sliding window in seconds
+            limits: Requests allowed per window by "<scope>.<kind>" (RATE_LIMITS if not given)
+            guild_limits: Optional function returning a guild's overrides of limits
+        """
+        self.window = window
+        self.limits = RATE_LIMITS if limits is None else limits
+        self.guild_limits = guild_limits
+
+        # ("<scope>.<kind>", ID) -> timestamps of requests in the window, oldest first
+        self._windows = {}
+        self._next_sweep = time.monotonic() + window
+
+    def __len__( self ):
+        """
+        Number of users, channels and guilds currently tracked.
+        """
+        return len( self._windows )
+
+    def check( self, kind, user_id, channel_id=None, guild_id=None ):
+        """
+        Counts a request if it is within every limit.
+
+        Args:
+            kind: KIND_HIT or KIND_MISS
+            user_id: The Discord user ID
+            channel_id: The Discord channel ID
+            guild_id: The Discord guild ID (None for direct messages)
+
+        Returns:
+            0.0 if the request is allowed, otherwise the seconds until it would be
+        """
+        now = time.monotonic()
+
+        if now >= self._next_sweep:
+            self._sweep( now )
+
+        overrides = self.guild_limits( guild_id ) if self.guild_limits and guild_id is not None else {}
+        windows = []
+        retry_after = 0.0
+
+        for scope, scope_id in zip( SCOPES, ( user_id, channel_id, guild_id ) ):
+            if scope_id is None:
+                continue
+
+            name = f"{scope}.{kind}"
+            limit = overrides.get( name, self.limits.get( name, 0 ) )
+
+            if limit <= 0:
+                continue
+
+            stamps = self._windows.get( ( name, scope_id ) )
+            if stamps is None:
+                stamps = self._windows[( name, scope_id )] = deque()
+
+            while stamps and stamps[0] <= now - self.window:
+                stamps.popleft()
+
+            if len( stamps ) >= limit:
+                # The request fits once enough of the oldest requests have left the window
+                retry_after = max( retry_after, stamps[len( stamps ) - limit] + self.window - now )
+                METRICS.increment( f"rate_limit.rejected.{name}" )
+
+            windows.append( stamps )
+
+        if retry_after:
+            return retry_after
+
+        for stamps in windows:
+            stamps.append( now )
+
+        return 0.0
+
+    def _sweep( self, now ):
+        """
+        Evicts users, channels and guilds without requests in the last window.
+        """
+        cutoff = now - self.window
+
+        for key in [key for key, stamps in self._windows.items() if not stamps or stamps[-1] <= cutoff]:
+            del self._windows[key]
+
+        self._next_sweep = now + self.window
+        METRICS.set( 'rate_limit.tracked', len( self._windows ) )
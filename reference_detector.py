@@ -0,0 +1,122 @@
+"""
+Passive detection of Bible references in ordinary chat messages.
+
+Every message in an opted-in channel passes through find_references(), so
+non-matching messages are rejected by two precompiled prefilters before the
+full reference parser runs:
+
+1. A verse hint ("3:16" or "3,16") that almost no ordinary message contains
+2. One combined regex over all book aliases, built as a trie so matching
+   does not slow down as more aliases are added
+"""
+
+import re
+from book_mappings import get_all_aliases
+from reference_parser import parse_reference_at
+
+# Maximum number of references answered for a single message
+MAX_DETECTED_REFERENCES = 3
+
+# Cheapest check first: a chapter:verse or chapter,verse pair somewhere in the text
+_VERSE_HINT = re.compile( r'\d\s*[:,]\s*\d' )
+
+
+def _trie_pattern( words ):
+    """
+    Builds a regex alternation from words with common prefixes factored out.
+
+    Args:
+        words: An iterable of lowercase words
+
+    Returns:
+        A regex pattern string matching any of the words
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault( char, {} )
+        node[''] = {}
+
+    def build( node ):
+        terminal = '' in node
+        branches = []
+
+        for char in sorted( key for key in node if key ):
+            # Spaces inside aliases ("1. mose") match any amount of whitespace
+            prefix = r'\s*' if char == ' ' else re.escape( char )
+            branches.append( prefix + build( node[char] ) )
+
+        if not branches:
+            return ''
+
+        if len( branches ) == 1 and not terminal:
+            return branches[0]
+
+        pattern = '(?:' + '|'.join( branches ) + ')'
+        return pattern + '?' if terminal else pattern
+
+    return build( trie )
+
+
+def _compile_book_pattern( aliases ):
+    """
+    Compiles the combined book prefilter: an alias at a word start, followed by "chapter:verse".
+    """
+    return re.compile(
+        r'(?<!\w)(?:' + _trie_pattern( aliases ) + r')\.?\s*\d{1,3}\s*[:,]\s*\d',
+        re.IGNORECASE
+    )
+
+
+_BOOK_PATTERN = _compile_book_pattern( get_all_aliases() )
+
+
+def might_contain_reference( text ):
+    """
+    Quickly checks whether a message could contain a Bible reference.
+
+    Args:
+        text: The message text
+
+    Returns:
+        True if the full parser should look at the message
+    """
+    return bool( text ) and _VERSE_HINT.search( text ) is not None and _BOOK_PATTERN.search( text ) is not None
+
+
+def find_references( text, max_references=MAX_DETECTED_REFERENCES ):
+    """
+    Finds Bible references in free text, e.g. "as Paul says in Röm 8,28…".
+
+    Only references with an explicit verse are reported, so phrases like
+    "Am 5" or "Ex 3" in ordinary sentences are not picked up.
+
+    Args:
+        text: The message text
+        max_references: Maximum number of references to return
+
+    Returns:
+        A list of reference dictionaries from parse_reference(), in order of appearance
+    """
+    if not text or not _VERSE_HINT.search( text ):
+        return []
+
+    references = []
+    pos = 0
+
+    while len( references ) < max_references:
+        match = _BOOK_PATTERN.search( text, pos )
+
+        if not match:
+            break
+
+        reference, end = parse_reference_at( text, match.start() )
+
+        if reference:
+            references.append( reference )
+            pos = end
+        else:
+            pos = match.end()
+
+    return references
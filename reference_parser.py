@@ -3,9 +3,311 @@ Bible reference parser supporting both English and German formats.
 """
 
 import re
-from book_mappings import normalize_book_name
+from functools import lru_cache
+from book_mappings import normalize_book_name, BOOK_ALIASES
+from canon import chapter_count, verse_count
 
+# Number of distinct inputs whose parse results are memoized
+PARSE_CACHE_SIZE = 4096
 
+
+# Maximum number of references accepted in one command
+MAX_REFERENCES = 5
+
+# Long passages are fetched in chunks of about this many verses
+CHUNK_VERSES = 60
+
+# Compiled once at import instead of on every call
+_COMMAND_PATTERN = re.compile( r'!(bible|bibel)\s+', re.IGNORECASE )
+_TRANSLATION_PATTERN = re.compile( r'([A-Z]{2,10})\s+' )
+
+# Separators understood by the reference scanner
+_SEPARATORS = ':,.;-–'
+_RANGE_SEPARATORS = ( '-', '–' )
+
+# Most words in a book name, counted as the scanner does (runs of letters), e.g. 4 for "cantar de los cantares"
+_MAX_BOOK_WORDS = max( len( re.findall( r'[^\W\d_]+', alias ) ) for alias in BOOK_ALIASES )
+
+
+class _TokenStream:
+    """
+    Lazily splits reference text into number, word and separator tokens.
+
+    Tokens are produced on demand in a single left-to-right pass, so the
+    parser never looks further into the text than the reference it reads.
+    """
+
+    def __init__( self, text, pos=0 ):
+        self.text = text
+        self.pos = pos
+        self.tokens = []
+
+    def get( self, index ):
+        """
+        Gets a token as a (kind, value, start, end) tuple.
+        Kind is 'num', 'word', 'sep' or 'end'.
+        """
+        while len( self.tokens ) <= index:
+            if self.tokens and self.tokens[-1][0] == 'end':
+                return self.tokens[-1]
+            self.tokens.append( self._next_token() )
+
+        return self.tokens[index]
+
+    def kind( self, index ):
+        return self.get( index )[0]
+
+    def value( self, index ):
+        return self.get( index )[1]
+
+    def is_sep( self, index, separators ):
+        token = self.get( index )
+        return token[0] == 'sep' and token[1] in separators
+
+    def _next_token( self ):
+        text = self.text
+        length = len( text )
+        pos = self.pos
+
+        while pos < length and text[pos].isspace():
+            pos += 1
+
+        if pos >= length:
+            self.pos = pos
+            return ( 'end', None, pos, pos )
+
+        start = pos
+        char = text[pos]
+
+        if '0' <= char <= '9':
+            while pos < length and '0' <= text[pos] <= '9':
+                pos += 1
+            self.pos = pos
+            return ( 'num', int( text[start:pos] ), start, pos )
+
+        if char.isalpha():
+            while pos < length and text[pos].isalpha():
+                pos += 1
+            self.pos = pos
+            return ( 'word', text[start:pos], start, pos )
+
+        if char in _SEPARATORS:
+            self.pos = pos + 1
+            return ( 'sep', char, start, pos + 1 )
+
+        self.pos = length
+        return ( 'end', None, start, start )
+
+
+def _make_segment( book, chapter, verse_start, verse_end=None, chapter_end=None ):
+    """
+    Builds a single passage segment in the reference dictionary format.
+    """
+    if chapter_end == chapter:
+        chapter_end = None
+
+    if verse_end == verse_start and not chapter_end:
+        verse_end = None
+
+    return {
+        'book': book,
+        'chapter': chapter,
+        'verse_start': verse_start,
+        'verse_end': verse_end,
+        'chapter_end': chapter_end
+    }
+
+
+def _parse_book( tokens, index ):
+    """
+    Reads a book name such as "Gen", "1. Mose", "1 Kor" or "Song of Solomon".
+
+    Returns:
+        A tuple of (book, next_index), or (None, index) if no book was found
+    """
+    first = index
+
+    if tokens.kind( index ) == 'num':
+        index += 1
+        if tokens.is_sep( index, '.' ):
+            index += 1
+
+    words_start = index
+    while tokens.kind( index ) == 'word' and index - words_start < _MAX_BOOK_WORDS:
+        index += 1
+
+    # Prefer the longest name, e.g. "Song of Solomon" over "Song"
+    for end in range( index, words_start, -1 ):
+        raw = tokens.text[tokens.get( first )[2]:tokens.get( end - 1 )[3]]
+        book = normalize_book_name( ' '.join( raw.split() ) )
+
+        if book:
+            # Allow an abbreviation dot, e.g. "Ps. 23"
+            if tokens.is_sep( end, '.' ) and tokens.kind( end + 1 ) == 'num':
+                end += 1
+            return book, end
+
+    return None, first
+
+
+def _parse_verse_range( tokens, index, book, chapter, verse, style ):
+    """
+    Reads what follows a starting verse: "-17", "-4:3", an open end "-", or German "f"/"ff".
+
+    Returns:
+        A tuple of (segment, next_index), or (None, index) if a verse is not in the
+        canon or the range ends before it starts
+    """
+    token = tokens.get( index )
+    last = verse_count( book, chapter )
+
+    if not 1 <= verse <= last:
+        return None, index
+
+    # German "3,16f" (one more verse) and "3,16ff" (to the end of the chapter)
+    if token[0] == 'word' and token[1] in ( 'f', 'ff' ) and token[2] == tokens.get( index - 1 )[3]:
+        verse_end = min( verse + 1, last ) if token[1] == 'f' else last
+        return _make_segment( book, chapter, verse, verse_end ), index + 1
+
+    if not tokens.is_sep( index, _RANGE_SEPARATORS ):
+        return _make_segment( book, chapter, verse ), index
+
+    if tokens.kind( index + 1 ) == 'num':
+        if tokens.is_sep( index + 2, style ) and tokens.kind( index + 3 ) == 'num':
+            chapter_end = tokens.value( index + 1 )
+            verse_end = tokens.value( index + 3 )
+
+            if chapter_end < chapter or not 1 <= verse_end <= verse_count( book, chapter_end ):
+                return None, index
+            if chapter_end == chapter and verse_end < verse:
+                return None, index
+
+            return _make_segment( book, chapter, verse, verse_end, chapter_end ), index + 4
+
+        verse_end = tokens.value( index + 1 )
+        if not verse <= verse_end <= last:
+            return None, index
+
+        return _make_segment( book, chapter, verse, verse_end ), index + 2
+
+    # Open-ended range like "John 3:16-"
+    return _make_segment( book, chapter, verse, last ), index + 1
+
+
+def _parse_chapter_range( tokens, index, book, chapter ):
+    """
+    Reads a whole chapter ("Psalm 23") or chapter range ("Matt 5-7").
+
+    Returns:
+        A tuple of (segment, next_index), or (None, index) if a chapter is not in the
+        canon or the range ends before it starts
+    """
+    if not verse_count( book, chapter ):
+        return None, index
+
+    if tokens.is_sep( index, _RANGE_SEPARATORS ) and tokens.kind( index + 1 ) == 'num':
+        chapter_end = tokens.value( index + 1 )
+        last = verse_count( book, chapter_end )
+
+        if not last or chapter_end < chapter:
+            return None, index
+        if chapter_end == chapter:
+            return _make_segment( book, chapter, 1, last ), index + 2
+
+        return _make_segment( book, chapter, 1, last, chapter_end ), index + 2
+
+    return _make_segment( book, chapter, 1, verse_count( book, chapter ) ), index
+
+
+def parse_reference_at( text, start=0 ):
+    """
+    Parses one reference beginning at a position in the text.
+    Text after the reference is ignored.
+
+    The scanner makes a single pass over the tokens with at most four tokens
+    of lookahead. Segments are separated by "," (or "." after a German
+    "Kapitel,Vers") within a chapter and by ";" between chapters.
+
+    Args:
+        text: The text containing the reference
+        start: Position where the book name begins
+
+    Returns:
+        A tuple of (reference_dict, end_position), or (None, start)
+    """
+    tokens = _TokenStream( text, start )
+    book, index = _parse_book( tokens, 0 )
+
+    if not book or tokens.kind( index ) != 'num':
+        return None, start
+
+    single_chapter = chapter_count( book ) == 1
+    style = None
+    segments = []
+    expect_chapter = True
+    chapter = None
+
+    while True:
+        if expect_chapter:
+            number = tokens.value( index )
+            index += 1
+
+            if tokens.is_sep( index, style or ':,' ) and tokens.kind( index + 1 ) == 'num':
+                # "John 3:16" or "Johannes 3,16"
+                style = tokens.value( index )
+                chapter = number
+                segment, index = _parse_verse_range( tokens, index + 2, book, chapter, tokens.value( index + 1 ), style )
+            elif style is None and not segments and tokens.kind( index ) == 'num':
+                # "John 3 16"
+                style = ':'
+                chapter = number
+                segment, index = _parse_verse_range( tokens, index + 1, book, chapter, tokens.value( index ), style )
+            elif single_chapter:
+                # "Jude 3" means verse 3 of the only chapter
+                chapter = 1
+                segment, index = _parse_verse_range( tokens, index, book, chapter, number, style or ':' )
+            else:
+                chapter = number
+                segment, index = _parse_chapter_range( tokens, index, book, chapter )
+        else:
+            segment, index = _parse_verse_range( tokens, index + 1, book, chapter, tokens.value( index ), style )
+
+        if not segment:
+            break
+
+        segments.append( segment )
+        chapter = segment['chapter_end'] or segment['chapter']
+
+        # Look for another segment of the same book; "1 John" after a separator starts a new reference
+        if tokens.kind( index + 1 ) != 'num' or (
+            tokens.kind( index + 2 ) == 'word' and _parse_book( tokens, index + 1 )[0]
+        ):
+            break
+
+        if tokens.is_sep( index, ';' ):
+            expect_chapter = True
+            index += 1
+            continue
+
+        if style and tokens.is_sep( index, '.' if style == ',' else ',' ):
+            index += 1
+            expect_chapter = tokens.is_sep( index + 1, style ) and tokens.kind( index + 2 ) == 'num'
+            continue
+
+        break
+
+    if not segments:
+        return None, start
+
+    end = tokens.get( index - 1 )[3]
+    reference = dict( segments[0] )
+    reference['segments'] = segments
+    reference['original'] = text[tokens.get( 0 )[2]:end]
+
+    return reference, end
+
+
+@lru_cache( maxsize=PARSE_CACHE_SIZE )
 def parse_reference( text ):
     """
     Parses a Bible reference from text.
@@ -17,6 +319,13 @@ def parse_reference( text ):
     - 1 Mose 5,14
     - Gen 1:1-5 (verse ranges)
     - Matthew 5:3-7:12 (chapter ranges)
+    - Psalm 23, Matt 5-7 (whole chapters)
+    - John 3:16-, Joh 3,16ff (open-ended ranges)
+    - Rom 8:28,31-39, Röm 8,28.31-39, Ps 23; 24:1 (multiple segments)
+    
+    Whole chapters and open-ended ranges are resolved into explicit verse
+    ranges using the local canon table. Results are memoized on the raw
+    input and must not be modified.
     
     Args:
         text: The text containing the reference
@@ -28,6 +337,8 @@ def parse_reference( text ):
         - verse_start: The starting verse number (int)
         - verse_end: The ending verse number (int, or None for single verse)
         - chapter_end: The ending chapter (int, or None if same chapter)
+        - segments: A list of segment dictionaries (book, chapter, verse_start,
+          verse_end, chapter_end) in order; the fields above repeat the first one
         - original: The original reference text
         
         Returns None if the reference cannot be parsed.
@@ -35,50 +346,65 @@ def parse_reference( text ):
     if not text:
         return None
     
-    text = text.strip()
-    
-    # Pattern to match Bible references
-    # Supports: "Book Chapter:Verse" or "Book Chapter,Verse" 
-    # With optional ranges: "Book Chapter:Verse-Verse" or "Book Chapter:Verse-Chapter:Verse"
-    # Handles German book names like "1. Mose", "1 Mose", "1.Mose" (with or without spaces)
-    pattern = r'^((?:\d+\.?\s*)?[A-Za-zäöüÄÖÜß]+(?:\s+[A-Za-zäöüÄÖÜß]+)?)\s+(\d+)[\s:,]+(\d+)(?:[-–](?:(\d+)[\s:,])?(\d+))?'
-    
-    match = re.match( pattern, text )
-    
-    if not match:
-        return None
+    reference, _ = parse_reference_at( text.strip() )
+    return reference
+
+
+def parse_references( text, max_references=MAX_REFERENCES ):
+    """
+    Parses several references separated by ";" or "," in one pass.
     
-    book_raw = match.group( 1 )
-    chapter = int( match.group( 2 ) )
-    verse_start = int( match.group( 3 ) )
+    Supports formats like:
+    - Rom 3:23; Rom 6:23; Rom 10:9-10
+    - John 3:16, 1 John 4:8
     
-    # Handle ranges
-    chapter_end = None
-    verse_end = None
+    A ";" followed by a chapter (e.g. "Ps 23; 24") continues the previous
+    reference as another segment instead of starting a new one.
     
-    if match.group( 5 ):  # Has a range
-        if match.group( 4 ):  # Chapter:Verse-Chapter:Verse format
-            chapter_end = int( match.group( 4 ) )
-            verse_end = int( match.group( 5 ) )
-        else:  # Chapter:Verse-Verse format
-            verse_end = int( match.group( 5 ) )
+    Args:
+        text: The text containing the references
+        max_references: Parsing stops once more than this many references were found,
+            so callers can reject the request without scanning the rest
+        
+    Returns:
+        A list of reference dictionaries from parse_reference(), in order.
+        Returns an empty list if any reference cannot be parsed.
+    """
+    if not text:
+        return []
     
-    # Normalize the book name
-    book = normalize_book_name( book_raw )
+    return list( _parse_references( text, max_references ) )
+
+
+@lru_cache( maxsize=PARSE_CACHE_SIZE )
+def _parse_references( text, max_references ):
+    """
+    Memoized worker for parse_references(); returns a tuple.
+    """
+    references = []
+    length = len( text )
+    pos = 0
     
-    if not book:
-        return None
+    while len( references ) <= max_references:
+        reference, pos = parse_reference_at( text, pos )
+        
+        if not reference:
+            return ()
+        
+        references.append( reference )
+        
+        while pos < length and text[pos].isspace():
+            pos += 1
+        
+        if pos >= length or text[pos] not in ';,':
+            break
+        
+        pos += 1
     
-    return {
-        'book': book,
-        'chapter': chapter,
-        'verse_start': verse_start,
-        'verse_end': verse_end,
-        'chapter_end': chapter_end,
-        'original': text
-    }
+    return tuple( references )
 
 
+@lru_cache( maxsize=PARSE_CACHE_SIZE )
 def extract_command_and_reference( message ):
     """
     Extracts the command (!bible or !bibel), optional translation, and reference from a message.
@@ -89,6 +415,10 @@ def extract_command_and_reference( message ):
     - !bible ESV Gen 1:1
     - !bibel Luther 1. Mose 5,14
     
+    The message is read in a single pass: an all-uppercase word after the
+    command is a translation code unless it is itself a book name (e.g. "JOHN").
+    Results are memoized on the raw message and must not be modified.
+    
     Args:
         message: The full message text
         
@@ -105,36 +435,156 @@ def extract_command_and_reference( message ):
     
     message = message.strip()
     
-    # First, extract just the command
-    command_match = re.match( r'^!(bible|bibel)\s+(.+)$', message, re.IGNORECASE )
+    # Extract the command
+    command_match = _COMMAND_PATTERN.match( message )
     
     if not command_match:
         return None, None, None
     
     command = command_match.group( 1 ).lower()
-    rest = command_match.group( 2 )
-    
-    # Try to parse the entire rest as a reference first (no translation specified)
-    reference = parse_reference( rest )
+    pos = command_match.end()
+    translation = None
     
-    if reference:
-        # Successfully parsed without translation
-        return command, None, reference
-    
-    # If that didn't work, try with an optional translation code
     # Translation codes are typically all uppercase (KJV, ESV, NIV, etc.)
-    trans_pattern = r'^([A-Z]{2,10})\s+(.+)$'
-    trans_match = re.match( trans_pattern, rest )
+    trans_match = _TRANSLATION_PATTERN.match( message, pos )
     
-    if trans_match:
+    if trans_match and not normalize_book_name( trans_match.group( 1 ) ):
         translation = trans_match.group( 1 )
-        reference_text = trans_match.group( 2 )
-        reference = parse_reference( reference_text )
+        pos = trans_match.end()
+    
+    reference, _ = parse_reference_at( message, pos )
+    
+    if not reference:
+        return None, None, None
+    
+    return command, translation, reference
+
+
+def segment_verse_count( segment ):
+    """
+    Counts the verses in a segment using the canon table.
+    
+    Args:
+        segment: A segment dictionary (or single-segment reference)
         
-        if reference:
-            return command, translation, reference
+    Returns:
+        The number of verses
+    """
+    chapter = segment['chapter']
+    verse_start = segment['verse_start']
+    verse_end = segment.get( 'verse_end' ) or verse_start
+    chapter_end = segment.get( 'chapter_end' )
+    
+    if not chapter_end:
+        return max( verse_end - verse_start + 1, 1 )
+    
+    count = max( verse_count( segment['book'], chapter ) - verse_start + 1, 1 )
+    for middle in range( chapter + 1, chapter_end ):
+        count += verse_count( segment['book'], middle )
     
-    return None, None, None
+    return count + verse_end
+
+
+def _make_reference( segments ):
+    """
+    Builds a reference dictionary from a list of segments.
+    """
+    reference = dict( segments[0] )
+    reference['segments'] = list( segments )
+    reference['original'] = ''
+    return reference
+
+
+def split_segment( segment, max_verses=None ):
+    """
+    Cuts a segment at chapter boundaries and, optionally, into runs of at most max_verses.
+    
+    Runs are aligned to multiples of max_verses within each chapter (1-40, 41-80, ...),
+    so overlapping passages are cut the same way and share cached pieces.
+    
+    Args:
+        segment: A segment dictionary (or single-segment reference)
+        max_verses: Maximum number of verses per piece, or None to cut at chapters only
+        
+    Returns:
+        A list of segment dictionaries in reading order
+    """
+    book = segment['book']
+    chapter_end = segment.get( 'chapter_end' ) or segment['chapter']
+    pieces = []
+    
+    for chapter in range( segment['chapter'], chapter_end + 1 ):
+        first = segment['verse_start'] if chapter == segment['chapter'] else 1
+        if chapter == chapter_end:
+            last = segment.get( 'verse_end' ) or segment['verse_start']
+        else:
+            last = verse_count( book, chapter )
+        
+        if not max_verses:
+            pieces.append( _make_segment( book, chapter, first, last ) )
+            continue
+        
+        while first <= last:
+            run_end = min( last, ( ( first - 1 ) // max_verses + 1 ) * max_verses )
+            pieces.append( _make_segment( book, chapter, first, run_end ) )
+            first = run_end + 1
+    
+    return pieces
+
+
+def split_reference( ref, max_verses=CHUNK_VERSES ):
+    """
+    Splits a long reference into smaller references that can be fetched one at a time.
+    
+    Segments are cut at chapter boundaries and into runs of at most max_verses,
+    then consecutive pieces are grouped while they stay under max_verses.
+    A short reference comes back unchanged as a single chunk.
+    
+    Args:
+        ref: A reference dictionary from parse_reference()
+        max_verses: Maximum number of verses per chunk
+        
+    Returns:
+        A list of reference dictionaries in reading order
+    """
+    segments = ref.get( 'segments' ) or [ref]
+    
+    if sum( segment_verse_count( segment ) for segment in segments ) <= max_verses:
+        return [ref]
+    
+    chunks = []
+    current = []
+    current_verses = 0
+    
+    for segment in segments:
+        for piece in split_segment( segment, max_verses ):
+            verses = segment_verse_count( piece )
+            
+            if current and current_verses + verses > max_verses:
+                chunks.append( _make_reference( current ) )
+                current = []
+                current_verses = 0
+            
+            current.append( piece )
+            current_verses += verses
+    
+    chunks.append( _make_reference( current ) )
+    return chunks
+
+
+def _format_verses( segment ):
+    """
+    Formats the verse part of a segment (e.g., "16", "1-3" or "3-7:12").
+    """
+    result = f"{segment['verse_start']}"
+    
+    if segment.get( 'verse_end' ):
+        if segment.get( 'chapter_end' ):
+            result += f"-{segment['chapter_end']}:{segment['verse_end']}"
+        else:
+            result += f"-{segment['verse_end']}"
+    
+    return result
 
 
 def format_reference( ref ):
@@ -145,18 +595,19 @@ def format_reference( ref ):
         ref: A reference dictionary from parse_reference()
         
     Returns:
-        A formatted reference string (e.g., "Genesis 1:1")
+        A formatted reference string (e.g., "Genesis 1:1" or "Romans 8:28, 31-39")
     """
     if not ref:
         return ""
     
-    result = f"{ref['book']} {ref['chapter']}:{ref['verse_start']}"
+    segments = ref.get( 'segments' ) or [ref]
+    result = f"{ref['book']} {segments[0]['chapter']}:{_format_verses( segments[0] )}"
     
-    if ref.get( 'verse_end' ):
-        if ref.get( 'chapter_end' ):
-            result += f"-{ref['chapter_end']}:{ref['verse_end']}"
+    for previous, segment in zip( segments, segments[1:] ):
+        if segment['chapter'] == ( previous.get( 'chapter_end' ) or previous['chapter'] ):
+            result += f", {_format_verses( segment )}"
         else:
-            result += f"-{ref['verse_end']}"
+            result += f"; {segment['chapter']}:{_format_verses( segment )}"
     
     return result
 
@@ -164,9 +615,10 @@ def format_reference( ref ):
 def format_api_reference( ref ):
     """
     Formats a parsed reference for API calls.
+    Only the first segment is used; multi-segment references are fetched segment by segment.
     
     Args:
-        ref: A reference dictionary from parse_reference()
+        ref: A reference dictionary from parse_reference(), or one of its segments
         
     Returns:
         A formatted reference string for API calls (e.g., "GEN.1.1")
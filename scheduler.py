@@ -0,0 +1,222 @@
+"""
+Bounded scheduler between the command handlers and the passage layer.
+
+Blocking work (fetching passages, listing translations) runs in threads, but
+never more than max_concurrency jobs at once. Waiting jobs are queued in
+lanes by priority, and within a lane served round-robin per guild, so one
+busy guild cannot starve the others. When the queue is full, the oldest job
+of the lowest-priority lane is dropped.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from metrics import METRICS
+
+# Lanes in order of priority
+LANE_INTERACTIVE = 'interactive'  # /bible, /bibel and page turns
+LANE_LIST = 'list'                # /bible-list, /bibel-list
+LANE_BACKGROUND = 'background'    # Automatic replies and prefetching
+LANES = ( LANE_INTERACTIVE, LANE_LIST, LANE_BACKGROUND )
+
+# Maximum number of jobs running at once
+SCHEDULER_CONCURRENCY = int( os.getenv( 'SCHEDULER_CONCURRENCY', '8' ) )
+
+# Maximum number of jobs waiting before the oldest low-priority job is dropped
+SCHEDULER_QUEUE_LIMIT = int( os.getenv( 'SCHEDULER_QUEUE_LIMIT', '100' ) )
+
+
+class JobShed( Exception ):
+    """
+    Raised for a job that was dropped from the queue because the bot is overloaded.
+    """
+
+
+class _Job:
+    """
+    A job waiting for a free slot.
+    """
+
+    __slots__ = ( 'lane', 'guild_id', 'future', 'enqueued_at' )
+
+    def __init__( self, lane, guild_id, future ):
+        self.lane = lane
+        self.guild_id = guild_id
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class Scheduler:
+    """
+    Runs blocking functions in threads with bounded concurrency, priority lanes
+    and per-guild fairness. Use from the event loop only.
+    """
+
+    def __init__( self, max_concurrency=SCHEDULER_CONCURRENCY, max_queued=SCHEDULER_QUEUE_LIMIT ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrency: Maximum number of jobs running at once
+            max_queued: Maximum number of waiting jobs
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.running = 0
+
+        # Per lane: guild ID -> waiting jobs, in round-robin order
+        self._lanes = {lane: OrderedDict() for lane in LANES}
+        self._queued = {lane: 0 for lane in LANES}
+
+    @property
+    def queued( self ):
+        """
+        Number of jobs waiting for a slot.
+        """
+        return sum( self._queued.values() )
+
+    def queue_depth( self, lane ):
+        """
+        Number of jobs waiting in one lane.
+        """
+        return self._queued[lane]
+
+    async def run( self, func, *args, lane=LANE_INTERACTIVE, guild_id=None, **kwargs ):
+        """
+        Runs a blocking function in a thread once a slot is free.
+
+        Args:
+            func: The blocking function
+            *args, **kwargs: Passed on to func
+            lane: One of LANES
+            guild_id: The guild the work is for (None for direct messages)
+
+        Returns:
+            The return value of func
+
+        Raises:
+            JobShed: If the job was dropped from the queue under overload
+        """
+        await self._acquire( lane, guild_id )
+
+        try:
+            return await asyncio.to_thread( func, *args, **kwargs )
+        finally:
+            self._release()
+
+    async def _acquire( self, lane, guild_id ):
+        """
+        Waits until the job may run.
+        """
+        if self.running < self.max_concurrency and not self.queued:
+            self._start( lane, 0.0 )
+            self._update_gauges()
+            return
+
+        job = _Job( lane, guild_id, asyncio.get_running_loop().create_future() )
+        self._lanes[lane].setdefault( guild_id, deque() ).append( job )
+        self._queued[lane] += 1
+
+        if self.queued > self.max_queued:
+            self._shed()
+
+        self._update_gauges()
+
+        try:
+            await job.future
+        except asyncio.CancelledError:
+            # The slot may have been granted just before the caller went away
+            if job.future.done() and not job.future.cancelled() and job.future.exception() is None:
+                self._release()
+            raise
+
+    def _start( self, lane, waited ):
+        """
+        Takes a slot and records how long the job waited for it.
+        """
+        self.running += 1
+        METRICS.increment( f"scheduler.started.{lane}" )
+        METRICS.increment( f"scheduler.wait_ms.{lane}", round( waited * 1000 ) )
+
+    def _release( self ):
+        """
+        Frees a slot and starts the next waiting job.
+        """
+        self.running -= 1
+        self._dispatch()
+
+    def _dispatch( self ):
+        """
+        Starts waiting jobs while slots are free, highest-priority lane first.
+        """
+        while self.running < self.max_concurrency:
+            job = self._next_job()
+
+            if job is None:
+                break
+
+            # The caller gave up while waiting
+            if job.future.done():
+                continue
+
+            self._start( job.lane, time.monotonic() - job.enqueued_at )
+            job.future.set_result( None )
+
+        self._update_gauges()
+
+    def _next_job( self ):
+        """
+        Takes the next job: first non-empty lane, then the next guild in turn.
+        """
+        for lane in LANES:
+            guilds = self._lanes[lane]
+
+            if guilds:
+                guild_id, jobs = next( iter( guilds.items() ) )
+                return self._pop( lane, guild_id, jobs )
+
+        return None
+
+    def _shed( self ):
+        """
+        Drops the oldest job of the lowest-priority lane that has waiting jobs.
+        """
+        for lane in reversed( LANES ):
+            guilds = self._lanes[lane]
+
+            if guilds:
+                guild_id, jobs = min( guilds.items(), key=lambda item: item[1][0].enqueued_at )
+                job = self._pop( lane, guild_id, jobs )
+
+                METRICS.increment( f"scheduler.shed.{lane}" )
+                if not job.future.done():
+                    job.future.set_exception( JobShed( f"Dropped {lane} job under overload" ) )
+                return
+
+    def _pop( self, lane, guild_id, jobs ):
+        """
+        Removes the first job of a guild's queue and moves the guild to the back.
+        """
+        guilds = self._lanes[lane]
+        job = jobs.popleft()
+
+        if jobs:
+            guilds.move_to_end( guild_id )
+        else:
+            del guilds[guild_id]
+
+        self._queued[lane] -= 1
+        return job
+
+    def _update_gauges( self ):
+        """
+        Exports the current queue depths and number of running jobs.
+        """
+        METRICS.set( 'scheduler.running', self.running )
+        for lane in LANES:
+            METRICS.set( f"scheduler.queued.{lane}", self._queued[lane] )
+
+
+# Scheduler shared by all handlers
+SCHEDULER = Scheduler()
@@ -0,0 +1,674 @@
+"""
+Full-text search over translations mirrored to local disk.
+
+mirror_bible.py stores the text of a translation chapter by chapter, one JSON
+file per book. From these an inverted index is built: each book is tokenized
+in a worker process into a segment file, and the segments are merged into one
+binary file per translation that is memory-mapped for queries:
+
+    header      magic, verse and term counts, section offsets, total tokens
+    verses      (verse id, text offset, text length, tokens) per verse, in canonical order
+    terms       (term offset, term length, verses, postings offset, postings length), sorted by term
+    data        verse texts, term strings and postings
+
+A term's postings are the verses containing it, as varint-encoded gaps
+between verse numbers, each followed by the number of occurrences. Queries
+(all words must occur; quoted words must occur as a phrase) are answered
+from the file alone, ranked with BM25, without calling API.Bible.
+
+When chapters are added to the mirror, only the books that changed are
+tokenized again before the segments are merged into a new file.
+"""
+
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from cache import LRUCache
+from canon import BOOK_ORDER
+
+# Directory with the mirrored translations and their search indexes
+SEARCH_INDEX_DIR = os.getenv( 'SEARCH_INDEX_DIR', 'search_index' )
+
+# Worker processes building the index (one book per task)
+SEARCH_BUILD_WORKERS = int( os.getenv( 'SEARCH_BUILD_WORKERS', str( os.cpu_count() or 1 ) ) )
+
+# Most verses returned for one query, and verses per result page
+SEARCH_MAX_RESULTS = int( os.getenv( 'SEARCH_MAX_RESULTS', '500' ) )
+SEARCH_PAGE_SIZE = int( os.getenv( 'SEARCH_PAGE_SIZE', '8' ) )
+
+# Characters of a verse shown in the results, and most words highlighted in it,
+# so a full page stays within Discord's message limit
+SNIPPET_LENGTH = 150
+SNIPPET_HIGHLIGHTS = 5
+
+# BM25 parameters: how quickly repeated words stop counting, and how much verse length matters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_MAGIC = b'BBSIDX01'
+_HEADER = struct.Struct( '<8sIIIIIQ' )
+_VERSE = struct.Struct( '<IIIH' )
+_TERM = struct.Struct( '<IHIII' )
+
+# Words are letters and digits; apostrophes inside words ("LORD's") are dropped
+_WORD = re.compile( r"\w+(?:['’]\w+)*" )
+_APOSTROPHES = re.compile( r"['’]" )
+_QUOTED = re.compile( r'"([^"]*)"|“([^”]*)”|„([^“”]*)[“”]' )
+
+
+def tokenize( text ):
+    """
+    Splits text into lower-case search terms.
+
+    Args:
+        text: Verse or query text
+
+    Returns:
+        A list of terms in order
+    """
+    return [_APOSTROPHES.sub( '', word ) for word in _WORD.findall( text.casefold() )]
+
+
+def verse_id( book, chapter, verse ):
+    """
+    Number of a verse that sorts in canonical order (book, chapter and verse in 16, 8 and 8 bits).
+    """
+    return ( BOOK_ORDER.index( book ) << 16 ) | ( chapter << 8 ) | verse
+
+
+def verse_location( number ):
+    """
+    The (book, chapter, verse) of a verse number from verse_id().
+    """
+    return BOOK_ORDER[number >> 16], ( number >> 8 ) & 0xFF, number & 0xFF
+
+
+def encode_postings( postings ):
+    """
+    Encodes postings as varint gaps between verse numbers, each followed by the occurrence count.
+
+    Args:
+        postings: (verse number, occurrences) pairs in ascending order
+
+    Returns:
+        The encoded bytes
+    """
+    data = bytearray()
+    previous = 0
+
+    for number, count in postings:
+        for value in ( number - previous, count ):
+            while value >= 0x80:
+                data.append( ( value & 0x7F ) | 0x80 )
+                value >>= 7
+            data.append( value )
+        previous = number
+
+    return bytes( data )
+
+
+def decode_postings( data ):
+    """
+    Decodes postings from encode_postings().
+
+    Returns:
+        A dictionary mapping verse numbers to occurrence counts, in ascending order
+    """
+    postings = {}
+    values = []
+    value = 0
+    shift = 0
+
+    for byte in data:
+        value |= ( byte & 0x7F ) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+
+        values.append( value )
+        value = 0
+        shift = 0
+
+    number = 0
+    for gap, count in zip( values[::2], values[1::2] ):
+        number += gap
+        postings[number] = count
+
+    return postings
+
+
+def parse_query( text ):
+    """
+    Splits a query into the terms and phrases that must all occur.
+
+    Args:
+        text: The query, e.g. 'faith hope "love never fails"'
+
+    Returns:
+        A list of term lists; lists with more than one term are phrases
+    """
+    groups = []
+
+    def phrase( match ):
+        terms = tokenize( next( group for group in match.groups() if group is not None ) )
+        if terms:
+            groups.append( terms )
+        return ' '
+
+    rest = _QUOTED.sub( phrase, text )
+    groups.extend( [term] for term in tokenize( rest ) )
+    return groups
+
+
+def snippet( text, terms, length=SNIPPET_LENGTH ):
+    """
+    Shortens a verse to the part around the first query term and puts the terms in bold.
+
+    Args:
+        text: The verse text
+        terms: The query terms
+        length: Most characters kept (without the bold markers)
+
+    Returns:
+        The snippet with Markdown bold markers
+    """
+    words = [match for match in _WORD.finditer( text ) if tokenize( match.group() )[0] in terms]
+    start = 0
+
+    if len( text ) > length and words and words[0].start() > length // 3:
+        start = text.rfind( ' ', 0, words[0].start() - length // 4 ) + 1
+
+    end = len( text ) if len( text ) - start <= length else text.rfind( ' ', start, start + length )
+    if end <= start:
+        end = start + length
+
+    parts = ['…' if start else '']
+    position = start
+
+    for match in [word for word in words if start <= word.start() and word.end() <= end][:SNIPPET_HIGHLIGHTS]:
+        parts.append( text[position:match.start()] )
+        parts.append( f"**{match.group()}**" )
+        position = match.end()
+
+    parts.append( text[position:end] )
+    parts.append( '…' if end < len( text ) else '' )
+    return ''.join( parts )
+
+
+def _phrase_pattern( phrase ):
+    """
+    Regular expression finding a phrase in lower-case text, allowing apostrophes inside words.
+    """
+    words = ["['’]?".join( re.escape( char ) for char in term ) for term in phrase]
+    return re.compile( r'(?<!\w)' + r'\W+'.join( words ) + r'(?!\w)' )
+
+
+def _contains_phrase( terms, phrase ):
+    """
+    Whether a list of terms contains a phrase as consecutive terms.
+    """
+    length = len( phrase )
+    first = phrase[0]
+
+    return any(
+        terms[start:start + length] == phrase
+        for start, term in enumerate( terms )
+        if term == first
+    )
+
+
+# Decoded postings of frequent query terms, shared by all indexes of this process
+_POSTINGS_CACHE = LRUCache(
+    max_entries=1024,
+    name='search_postings',
+    sizeof=lambda postings: 100 * len( postings ) + 200
+)
+
+
+# Results of recent queries, so turning a page does not search again
+_RESULTS_CACHE = LRUCache(
+    max_entries=256,
+    name='search_results',
+    sizeof=lambda result: 8 * len( result[0] ) + 200
+)
+
+
+class SearchIndex:
+    """
+    Read-only view of a translation's memory-mapped index file. Safe to use from several threads.
+    """
+
+    def __init__( self, path ):
+        """
+        Open an index file.
+
+        Args:
+            path: Path of the index file written by update_index()
+
+        Raises:
+            ValueError: If the file is not a search index
+        """
+        self.path = path
+        self.mtime = os.stat( path ).st_mtime
+
+        with open( path, 'rb' ) as f:
+            self._map = mmap.mmap( f.fileno(), 0, access=mmap.ACCESS_READ )
+
+        magic, self.verse_count, self.term_count, self._verses_offset, self._terms_offset, self._data_offset, tokens = (
+            _HEADER.unpack_from( self._map, 0 )
+        )
+
+        if magic != _MAGIC:
+            self._map.close()
+            raise ValueError( f"{path} is not a search index" )
+
+        self.average_length = tokens / self.verse_count if self.verse_count else 0.0
+
+        # Verse lengths are needed for every match, so they are read once
+        table = self._map[self._verses_offset:self._verses_offset + self.verse_count * _VERSE.size]
+        self._lengths = [entry[3] for entry in _VERSE.iter_unpack( table )]
+
+    def close( self ):
+        """
+        Unmaps the file.
+        """
+        self._map.close()
+
+    def _term_entry( self, position ):
+        """
+        The term string and its table entry at a position in the sorted term table.
+        """
+        entry = _TERM.unpack_from( self._map, self._terms_offset + position * _TERM.size )
+        start = self._data_offset + entry[0]
+        return self._map[start:start + entry[1]], entry
+
+    def postings( self, term ):
+        """
+        The verses containing a term.
+
+        Args:
+            term: A term from tokenize()
+
+        Returns:
+            A dictionary mapping verse numbers (positions in this index) to occurrence counts
+        """
+        key = ( self.path, self.mtime, term )
+        cached = _POSTINGS_CACHE.get( key )
+
+        if cached is not None:
+            return cached
+
+        wanted = term.encode( 'utf-8' )
+        low, high = 0, self.term_count
+
+        while low < high:
+            middle = ( low + high ) // 2
+            if self._term_entry( middle )[0] < wanted:
+                low = middle + 1
+            else:
+                high = middle
+
+        postings = {}
+
+        if low < self.term_count:
+            found, entry = self._term_entry( low )
+            if found == wanted:
+                start = self._data_offset + entry[3]
+                postings = decode_postings( self._map[start:start + entry[4]] )
+
+        _POSTINGS_CACHE.put( key, postings )
+        return postings
+
+    def verse( self, number ):
+        """
+        A verse of the index.
+
+        Args:
+            number: The verse's position in this index
+
+        Returns:
+            A tuple (book, chapter, verse, text)
+        """
+        vid, offset, length, _ = _VERSE.unpack_from( self._map, self._verses_offset + number * _VERSE.size )
+        start = self._data_offset + offset
+        return verse_location( vid ) + ( self._map[start:start + length].decode( 'utf-8' ), )
+
+    def search( self, query, limit=SEARCH_MAX_RESULTS ):
+        """
+        Finds the verses containing every term and phrase of a query, best matches first.
+
+        Args:
+            query: The query text (see parse_query())
+            limit: Most verses returned
+
+        Returns:
+            A tuple (matches, total): up to limit verse numbers for verse(), and the number of matching verses
+        """
+        groups = parse_query( query )
+        terms = list( dict.fromkeys( term for group in groups for term in group ) )
+
+        if not terms:
+            return [], 0
+
+        # Paging through the results repeats the query
+        key = ( self.path, self.mtime, tuple( tuple( group ) for group in groups ), limit )
+        cached = _RESULTS_CACHE.get( key )
+
+        if cached is None:
+            cached = self._search( groups, terms, limit )
+            _RESULTS_CACHE.put( key, cached )
+
+        return cached
+
+    def _search( self, groups, terms, limit ):
+        """
+        Runs a parsed query; see search().
+        """
+
+        postings = {term: self.postings( term ) for term in terms}
+        ordered = sorted( terms, key=lambda term: len( postings[term] ) )
+
+        # Intersect starting with the rarest term
+        candidates = postings[ordered[0]].keys()
+        for term in ordered[1:]:
+            if not candidates:
+                break
+            candidates = candidates & postings[term].keys()
+
+        # A regular expression rules out most verses before the exact check on their terms
+        phrases = [( _phrase_pattern( group ), group ) for group in groups if len( group ) > 1]
+        if phrases:
+            candidates = [number for number in candidates if self._has_phrases( number, phrases )]
+
+        # Ties are broken by canonical order
+        best = heapq.nlargest( limit, self._scores( candidates, terms, postings ), key=lambda item: ( item[1], -item[0] ) )
+        return [number for number, _ in best], len( candidates )
+
+    def _has_phrases( self, number, phrases ):
+        """
+        Whether a verse contains every phrase, given as (pattern, terms) pairs.
+        """
+        text = self.verse( number )[3].casefold()
+
+        for pattern, phrase in phrases:
+            if not pattern.search( text ) or not _contains_phrase( tokenize( text ), phrase ):
+                return False
+
+        return True
+
+    def _scores( self, candidates, terms, postings ):
+        """
+        BM25 scores of the matching verses for the query terms.
+
+        Yields:
+            (verse number, score) pairs
+        """
+        weights = [
+            ( postings[term], math.log( 1 + ( self.verse_count - len( postings[term] ) + 0.5 ) / ( len( postings[term] ) + 0.5 ) ) )
+            for term in terms
+        ]
+        scale = BM25_B / ( self.average_length or 1 )
+
+        for number in candidates:
+            norm = BM25_K1 * ( 1 - BM25_B + scale * self._lengths[number] )
+            yield number, sum( idf * counts[number] * ( BM25_K1 + 1 ) / ( counts[number] + norm ) for counts, idf in weights )
+
+
+def _book_path( directory, bible_id, book ):
+    return os.path.join( directory, bible_id, 'books', f"{book}.json" )
+
+
+def _segment_path( directory, bible_id, book ):
+    return os.path.join( directory, bible_id, 'segments', f"{book}.json" )
+
+
+def index_path( directory, bible_id ):
+    """
+    Path of a translation's index file.
+    """
+    return os.path.join( directory, bible_id, 'index.bin' )
+
+
+def _write_json( path, data ):
+    """
+    Writes a JSON file atomically.
+    """
+    os.makedirs( os.path.dirname( path ), exist_ok=True )
+    temp_path = f"{path}.tmp"
+    with open( temp_path, 'w', encoding='utf-8' ) as f:
+        json.dump( data, f, ensure_ascii=False )
+    os.replace( temp_path, path )
+
+
+def store_chapter( directory, bible_id, book, chapter, verses ):
+    """
+    Adds a chapter to the mirror of a translation, replacing an older copy.
+
+    Args:
+        directory: The search index directory
+        bible_id: The Bible translation ID
+        book: The normalized English book name
+        chapter: The chapter number
+        verses: (chapter, verse, text) tuples, e.g. Passage.verses
+    """
+    path = _book_path( directory, bible_id, book )
+    data = {'chapters': {}}
+
+    if os.path.exists( path ):
+        with open( path, 'r', encoding='utf-8' ) as f:
+            data = json.load( f )
+
+    data['chapters'][str( chapter )] = [[verse, text] for verse_chapter, verse, text in verses if verse_chapter == chapter]
+    _write_json( path, data )
+
+
+def mirrored_chapters( directory, bible_id, book ):
+    """
+    Chapters of a book already in the mirror.
+
+    Returns:
+        A set of chapter numbers
+    """
+    path = _book_path( directory, bible_id, book )
+
+    if not os.path.exists( path ):
+        return set()
+
+    with open( path, 'r', encoding='utf-8' ) as f:
+        return {int( chapter ) for chapter in json.load( f )['chapters']}
+
+
+def build_segment( directory, bible_id, book ):
+    """
+    Tokenizes one mirrored book into a segment file. Runs in a worker process.
+
+    Args:
+        directory: The search index directory
+        bible_id: The Bible translation ID
+        book: The normalized English book name
+
+    Returns:
+        The book name
+    """
+    with open( _book_path( directory, bible_id, book ), 'r', encoding='utf-8' ) as f:
+        chapters = json.load( f )['chapters']
+
+    verses = []
+    postings = {}
+
+    for chapter in sorted( chapters, key=int ):
+        for verse, text in sorted( chapters[chapter] ):
+            terms = tokenize( text )
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get( term, 0 ) + 1
+
+            for term, count in counts.items():
+                postings.setdefault( term, [] ).append( [len( verses ), count] )
+
+            verses.append( [verse_id( book, int( chapter ), verse ), text, len( terms )] )
+
+    _write_json( _segment_path( directory, bible_id, book ), {'verses': verses, 'postings': postings} )
+    return book
+
+
+def _stale_books( directory, bible_id ):
+    """
+    Mirrored books whose segment is missing or older than the book.
+    """
+    stale = []
+
+    for book in BOOK_ORDER:
+        book_path = _book_path( directory, bible_id, book )
+        if not os.path.exists( book_path ):
+            continue
+
+        segment_path = _segment_path( directory, bible_id, book )
+        if not os.path.exists( segment_path ) or os.stat( segment_path ).st_mtime < os.stat( book_path ).st_mtime:
+            stale.append( book )
+
+    return stale
+
+
+def update_index( directory, bible_id, workers=SEARCH_BUILD_WORKERS ):
+    """
+    Brings a translation's index up to date with its mirror.
+
+    Books added or changed since the last update are tokenized again, one
+    book per worker process; then all segments are merged into a new index
+    file that replaces the old one atomically.
+
+    Args:
+        directory: The search index directory
+        bible_id: The Bible translation ID
+        workers: Number of worker processes (1 = tokenize in this process)
+
+    Returns:
+        The number of books tokenized again
+    """
+    stale = _stale_books( directory, bible_id )
+
+    if not stale and os.path.exists( index_path( directory, bible_id ) ):
+        return 0
+
+    if workers > 1 and len( stale ) > 1:
+        with ProcessPoolExecutor( max_workers=min( workers, len( stale ) ) ) as pool:
+            list( pool.map( build_segment, [directory] * len( stale ), [bible_id] * len( stale ), stale ) )
+    else:
+        for book in stale:
+            build_segment( directory, bible_id, book )
+
+    _merge_segments( directory, bible_id )
+    return len( stale )
+
+
+def _merge_segments( directory, bible_id ):
+    """
+    Writes the index file from the segments of all mirrored books.
+    """
+    verses = []
+    postings = {}
+
+    for book in BOOK_ORDER:
+        segment_path = _segment_path( directory, bible_id, book )
+        if not os.path.exists( segment_path ):
+            continue
+
+        with open( segment_path, 'r', encoding='utf-8' ) as f:
+            segment = json.load( f )
+
+        # Segments number their verses from 0; books follow each other in canonical order
+        offset = len( verses )
+        verses.extend( segment['verses'] )
+        for term, entries in segment['postings'].items():
+            postings.setdefault( term, [] ).extend( ( offset + number, count ) for number, count in entries )
+
+    data = bytearray()
+    verse_table = bytearray()
+    term_table = bytearray()
+    tokens = 0
+
+    for vid, text, length in verses:
+        encoded = text.encode( 'utf-8' )
+        verse_table += _VERSE.pack( vid, len( data ), len( encoded ), min( length, 0xFFFF ) )
+        data += encoded
+        tokens += length
+
+    for term in sorted( postings, key=lambda term: term.encode( 'utf-8' ) ):
+        encoded_term = term.encode( 'utf-8' )
+        encoded_postings = encode_postings( postings[term] )
+        term_table += _TERM.pack( len( data ), len( encoded_term ), len( postings[term] ), len( data ) + len( encoded_term ),
+                                  len( encoded_postings ) )
+        data += encoded_term + encoded_postings
+
+    verses_offset = _HEADER.size
+    terms_offset = verses_offset + len( verse_table )
+    data_offset = terms_offset + len( term_table )
+
+    path = index_path( directory, bible_id )
+    temp_path = f"{path}.tmp"
+    with open( temp_path, 'wb' ) as f:
+        f.write( _HEADER.pack( _MAGIC, len( verses ), len( postings ), verses_offset, terms_offset, data_offset, tokens ) )
+        f.write( verse_table )
+        f.write( term_table )
+        f.write( data )
+    os.replace( temp_path, path )
+
+
+class SearchIndexes:
+    """
+    The open index of every mirrored translation, reopened when update_index() replaces a file.
+    """
+
+    def __init__( self, directory=SEARCH_INDEX_DIR ):
+        """
+        Initialize the registry.
+
+        Args:
+            directory: The search index directory
+        """
+        self.directory = directory
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get( self, bible_id ):
+        """
+        Gets the index of a translation.
+
+        Args:
+            bible_id: The Bible translation ID
+
+        Returns:
+            The SearchIndex, or None if the translation is not mirrored
+        """
+        path = index_path( self.directory, bible_id )
+
+        try:
+            mtime = os.stat( path ).st_mtime
+        except OSError:
+            return None
+
+        with self._lock:
+            index = self._indexes.get( bible_id )
+
+            if index is None or index.mtime != mtime:
+                try:
+                    index = SearchIndex( path )
+                except ( OSError, ValueError ) as e:
+                    print( f"Error opening search index {path}: {e}" )
+                    return None
+
+                # The old map stays valid for searches still using it and is closed when collected
+                self._indexes[bible_id] = index
+
+            return index
+
+
+# Search indexes of this process
+SEARCH_INDEXES = SearchIndexes()
@@ -0,0 +1,159 @@
+"""
+Cache shared by all bot processes on one machine, kept in an SQLite file.
+
+Each shard cluster keeps its own in-memory LRUCache in front of this store,
+so a passage fetched by one process is a local read for all the others
+instead of another API.Bible request. Values are stored as JSON.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# SQLite file shared by all processes (unset = no shared cache)
+SHARED_CACHE_FILE = os.getenv( 'SHARED_CACHE_FILE' )
+
+# Maximum number of entries before the oldest are removed
+SHARED_CACHE_ENTRIES = int( os.getenv( 'SHARED_CACHE_ENTRIES', '100000' ) )
+
+# Puts between two checks of the entry limit
+_PRUNE_EVERY = 256
+
+
+class SharedCache:
+    """
+    Key-value store with expiry in an SQLite file, safe to use from several
+    threads and processes at once.
+
+    Like LRUCache, entries older than max_age count as misses but stay
+    available through get_stale() until they are pruned.
+    """
+
+    def __init__( self, path, max_entries=SHARED_CACHE_ENTRIES, max_age=None ):
+        """
+        Initialize the store, creating the file if needed.
+
+        Args:
+            path: Path of the SQLite file
+            max_entries: Maximum number of entries before the oldest are removed
+            max_age: Seconds after which an entry is stale, or None to keep entries fresh forever
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._local = threading.local()
+        self._puts = 0
+
+        # Statistics for this process
+        self.hits = 0
+        self.misses = 0
+
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS cache ( key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL )"
+        )
+        self._execute( "CREATE INDEX IF NOT EXISTS cache_stored_at ON cache ( stored_at )" )
+
+    def _connection( self ):
+        """
+        Gets this thread's connection to the file.
+        """
+        connection = getattr( self._local, 'connection', None )
+
+        if connection is None:
+            connection = sqlite3.connect( self.path, timeout=5, isolation_level=None )
+            # Readers do not block the writer, and commits need not wait for the disk
+            connection.execute( "PRAGMA journal_mode=WAL" )
+            connection.execute( "PRAGMA synchronous=NORMAL" )
+            self._local.connection = connection
+
+        return connection
+
+    def _execute( self, sql, parameters=() ):
+        """
+        Runs one statement, returning the rows, or None if the file cannot be used.
+        """
+        try:
+            return self._connection().execute( sql, parameters ).fetchall()
+        except sqlite3.Error as e:
+            print( f"Error using shared cache: {e}" )
+            return None
+
+    def _read( self, key ):
+        """
+        Reads an entry as (value, stored_at), or None.
+        """
+        rows = self._execute( "SELECT value, stored_at FROM cache WHERE key = ?", ( key, ) )
+
+        if not rows:
+            return None
+
+        value, stored_at = rows[0]
+        return json.loads( value ), stored_at
+
+    def get( self, key, default=None ):
+        """
+        Gets a fresh value.
+
+        Args:
+            key: The cache key (a string)
+            default: Value returned if the key is missing or stale
+
+        Returns:
+            The cached value, or default
+        """
+        entry = self._read( key )
+
+        if entry is None or ( self.max_age is not None and time.time() - entry[1] > self.max_age ):
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return entry[0]
+
+    def get_stale( self, key, default=None ):
+        """
+        Gets a value however old it is, e.g. as a fallback when a reload failed.
+        """
+        entry = self._read( key )
+        return default if entry is None else entry[0]
+
+    def put( self, key, value ):
+        """
+        Stores a value, replacing any older one.
+
+        Args:
+            key: The cache key (a string)
+            value: A JSON-serializable value
+        """
+        self._execute(
+            "INSERT OR REPLACE INTO cache ( key, value, stored_at ) VALUES ( ?, ?, ? )",
+            ( key, json.dumps( value, ensure_ascii=False ), time.time() )
+        )
+
+        self._puts += 1
+        if self._puts % _PRUNE_EVERY == 0:
+            self._prune()
+
+    def _prune( self ):
+        """
+        Removes the oldest entries beyond max_entries.
+        """
+        self._execute(
+            "DELETE FROM cache WHERE key IN ( SELECT key FROM cache ORDER BY stored_at DESC LIMIT -1 OFFSET ? )",
+            ( self.max_entries, )
+        )
+
+    def __len__( self ):
+        """
+        Number of entries in the store (across all processes).
+        """
+        rows = self._execute( "SELECT COUNT(*) FROM cache" )
+        return rows[0][0] if rows else 0
+
+    def clear( self ):
+        """
+        Removes every entry.
+        """
+        self._execute( "DELETE FROM cache" )
@@ -0,0 +1,455 @@
+"""
+Passage cache in shared memory, for several bot processes on one host.
+
+All processes map the same file (ideally on a RAM-backed filesystem such as
+/dev/shm), so a hot passage is kept once per host instead of once per
+process, and a process starting up finds the cache already warm.
+
+Layout of the file:
+    header   magic, slot count, arena size, arena head, write clock
+    slots    fixed-size hash table entries pointing into the arena
+    arena    append-only ring of "key + value" records (UTF-8 text)
+
+Records are appended at the arena head; when the head wraps around, the
+oldest records are overwritten and the slots pointing at them become
+invalid. Entries read while in the oldest quarter of the ring are appended
+again, and a full probe window gives up its least recently used slot, so
+eviction approximates LRU.
+
+Readers take no lock: each slot carries a sequence number that writers make
+odd while they change it, and readers retry if it changed or the arena
+overtook the record while they copied it. Writers serialize on a file lock
+(and a thread lock within the process).
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:  # Windows: only one bot process per cache file
+    fcntl = None
+
+# File holding the cache (unset = each process keeps its own in-memory cache)
+SHM_CACHE_FILE = os.getenv( 'SHM_CACHE_FILE' )
+
+# Number of hash table slots, and arena size in MiB (used when the file is created)
+SHM_CACHE_SLOTS = int( os.getenv( 'SHM_CACHE_SLOTS', '16384' ) )
+SHM_CACHE_ARENA_MB = int( os.getenv( 'SHM_CACHE_ARENA_MB', '64' ) )
+
+_MAGIC = b'BBSHM001'
+
+# magic, slot count, (unused), arena size, arena head, write clock
+_HEADER = struct.Struct( '<8sIIQQQ' )
+_HEADER_SIZE = 64
+_HEAD_OFFSET = 24
+_CLOCK_OFFSET = 32
+
+# sequence, record length, key hash, record offset, key length, last use, stored at
+_SLOT = struct.Struct( '<IIQQIId' )
+_SEQ = struct.Struct( '<I' )
+_U64 = struct.Struct( '<Q' )
+_TICK_OFFSET = 28
+
+# Slots searched per key, and read attempts per slot while a writer is busy
+_PROBES = 8
+_RETRIES = 16
+
+# Decoded values kept per process, so repeated hits skip decoding
+_DECODED_ENTRIES = 512
+
+
+class ShmCache:
+    """
+    Cache in a memory-mapped file shared by several processes, with the
+    interface of LRUCache (get, get_stale, put, get_or_load, clear).
+
+    Keys are strings or tuples of strings; values are converted to and from
+    text with the encode and decode functions.
+    """
+
+    def __init__( self, path, encode=str, decode=str, max_age=None,
+                  slots=SHM_CACHE_SLOTS, arena_size=SHM_CACHE_ARENA_MB * 1024 * 1024 ):
+        """
+        Opens the cache file, creating it if needed. An existing file keeps its
+        own slot count and arena size.
+
+        Args:
+            path: Path of the cache file (e.g., "/dev/shm/biblebot-passages")
+            encode: Function converting a value to text
+            decode: Function converting text back to a value
+            max_age: Seconds after which an entry is stale, or None to keep entries fresh forever
+            slots: Number of hash table slots for a new file
+            arena_size: Size of the record arena in bytes for a new file
+        """
+        self.path = path
+        self.encode = encode
+        self.decode = decode
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+        # Values decoded by this process; shared by the fetch threads, so guarded by its own lock
+        self._decoded = OrderedDict()
+        self._decoded_lock = threading.Lock()
+
+        # Statistics for this process
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._fd = os.open( path, os.O_RDWR | os.O_CREAT, 0o600 )
+
+        with self._write_lock():
+            header = os.pread( self._fd, _HEADER.size, 0 )
+
+            if len( header ) < _HEADER.size or not header.startswith( _MAGIC ):
+                size = _HEADER_SIZE + slots * _SLOT.size + arena_size
+                os.ftruncate( self._fd, 0 )
+                os.ftruncate( self._fd, size )
+                os.pwrite( self._fd, _HEADER.pack( _MAGIC, slots, 0, arena_size, 0, 0 ), 0 )
+            else:
+                _, slots, _, arena_size, _, _ = _HEADER.unpack( header )
+
+            self.slots = slots
+            self.arena_size = arena_size
+            self._arena = _HEADER_SIZE + slots * _SLOT.size
+            self._mm = mmap.mmap( self._fd, self._arena + arena_size )
+
+    def _write_lock( self ):
+        """
+        Lock held by writers: the thread lock, and the file lock across processes.
+        """
+        return _WriteLock( self._lock, self._fd )
+
+    def _key_bytes( self, key ):
+        """
+        Encodes a key and computes its hash (stable across processes, never 0).
+        """
+        text = '\x1f'.join( key ) if isinstance( key, tuple ) else key
+        data = text.encode( 'utf-8' )
+        key_hash = int.from_bytes( hashlib.blake2b( data, digest_size=8 ).digest(), 'little' )
+        return data, key_hash or 1
+
+    def _head( self ):
+        return _U64.unpack_from( self._mm, _HEAD_OFFSET )[0]
+
+    def _find( self, data, key_hash ):
+        """
+        Looks up a key without locking.
+
+        Returns:
+            (slot index, record offset, record length, stored at), or None
+        """
+        mm = self._mm
+
+        for probe in range( _PROBES ):
+            index = ( key_hash + probe ) % self.slots
+            base = _HEADER_SIZE + index * _SLOT.size
+
+            for _ in range( _RETRIES ):
+                seq, length, slot_hash, offset, key_length, _, stored_at = _SLOT.unpack_from( mm, base )
+
+                # A writer is changing this slot
+                if seq & 1:
+                    continue
+
+                if slot_hash == 0:
+                    return None
+
+                if slot_hash != key_hash or key_length != len( data ):
+                    break
+
+                start = self._arena + offset % self.arena_size
+                matches = mm[start:start + key_length] == data
+
+                # Retry if the slot changed or the arena overtook the record while reading
+                if _SEQ.unpack_from( mm, base )[0] != seq:
+                    continue
+                if offset + self.arena_size < self._head():
+                    break
+
+                if matches:
+                    return index, offset, length, stored_at
+                break
+
+        return None
+
+    def _read_value( self, data, found ):
+        """
+        Decodes the value of a record found by _find(), reusing an earlier decode.
+
+        Returns:
+            The value, or None if the record was overwritten meanwhile
+        """
+        index, offset, length, _ = found
+
+        with self._decoded_lock:
+            value = self._decoded.get( offset )
+            if value is not None:
+                self._decoded.move_to_end( offset )
+
+        if value is None:
+            start = self._arena + offset % self.arena_size
+            text = self._mm[start + len( data ):start + length]
+
+            if offset + self.arena_size < self._head():
+                return None
+
+            value = self.decode( text.decode( 'utf-8' ) )
+
+            with self._decoded_lock:
+                self._decoded[offset] = value
+                if len( self._decoded ) > _DECODED_ENTRIES:
+                    self._decoded.popitem( last=False )
+
+        # Mark the slot as recently used; a lost update only affects eviction order
+        clock = _U64.unpack_from( self._mm, _CLOCK_OFFSET )[0]
+        _SEQ.pack_into( self._mm, _HEADER_SIZE + index * _SLOT.size + _TICK_OFFSET, clock & 0xFFFFFFFF )
+
+        # Records about to be overwritten are kept by appending them again
+        if offset + self.arena_size * 3 // 4 < self._head():
+            self._promote( data, found )
+
+        return value
+
+    def _lookup( self, key, fresh_only ):
+        """
+        Finds and decodes a value, or returns None.
+        """
+        data, key_hash = self._key_bytes( key )
+        found = self._find( data, key_hash )
+
+        if found is None:
+            return None
+
+        if fresh_only and self.max_age is not None and time.time() - found[3] >= self.max_age:
+            return None
+
+        return self._read_value( data, found )
+
+    def get( self, key, default=None ):
+        """
+        Gets a cached value and marks it as recently used.
+
+        Args:
+            key: The cache key
+            default: Value returned if the key is not cached or stale
+
+        Returns:
+            The cached value, or default
+        """
+        value = self._lookup( key, fresh_only=True )
+
+        if value is None:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return value
+
+    def get_stale( self, key, default=None ):
+        """
+        Gets a cached value even if it is older than max_age, without counting a hit.
+        """
+        value = self._lookup( key, fresh_only=False )
+        return default if value is None else value
+
+    def put( self, key, value ):
+        """
+        Stores a value, overwriting the oldest records if the arena is full.
+
+        Args:
+            key: The cache key
+            value: The value to store
+        """
+        data, key_hash = self._key_bytes( key )
+        record = data + self.encode( value ).encode( 'utf-8' )
+
+        with self._write_lock():
+            self._append( record, len( data ), key_hash, time.time() )
+
+    def _promote( self, data, found ):
+        """
+        Appends a record again at the arena head, if it is still current.
+        """
+        index, offset, length, stored_at = found
+
+        with self._write_lock():
+            base = _HEADER_SIZE + index * _SLOT.size
+            if _SLOT.unpack_from( self._mm, base )[3] != offset or offset + self.arena_size < self._head():
+                return
+
+            start = self._arena + offset % self.arena_size
+            self._append( self._mm[start:start + length], len( data ), _SLOT.unpack_from( self._mm, base )[2], stored_at )
+
+    def _append( self, record, key_length, key_hash, stored_at ):
+        """
+        Writes a record at the arena head and points a slot at it. Call with the write lock held.
+        """
+        length = len( record )
+
+        # Very large records would push out too much of the cache
+        if length > self.arena_size // 4:
+            return
+
+        mm = self._mm
+        offset = self._head()
+        position = offset % self.arena_size
+
+        # Records never wrap around the end of the arena
+        if position + length > self.arena_size:
+            offset += self.arena_size - position
+            position = 0
+
+        # Move the head first, so readers of the records being overwritten see them as gone
+        _U64.pack_into( mm, _HEAD_OFFSET, offset + length )
+        mm[self._arena + position:self._arena + position + length] = record
+
+        clock = _U64.unpack_from( mm, _CLOCK_OFFSET )[0] + 1
+        _U64.pack_into( mm, _CLOCK_OFFSET, clock )
+
+        index = self._choose_slot( record[:key_length], key_hash )
+        base = _HEADER_SIZE + index * _SLOT.size
+        seq = _SEQ.unpack_from( mm, base )[0]
+
+        _SEQ.pack_into( mm, base, seq + 1 )
+        _SLOT.pack_into( mm, base, seq + 1, length, key_hash, offset, key_length, clock & 0xFFFFFFFF, stored_at )
+        _SEQ.pack_into( mm, base, seq + 2 )
+
+    def _choose_slot( self, data, key_hash ):
+        """
+        Picks the slot for a key: its current slot, else a free or invalid one,
+        else the least recently used one in the probe window.
+        """
+        head = self._head()
+        free = None
+        oldest = None
+
+        for probe in range( _PROBES ):
+            index = ( key_hash + probe ) % self.slots
+            _, _, slot_hash, offset, key_length, tick, _ = _SLOT.unpack_from( self._mm, _HEADER_SIZE + index * _SLOT.size )
+
+            if slot_hash == 0 or offset + self.arena_size < head:
+                if free is None:
+                    free = index
+                continue
+
+            if slot_hash == key_hash and key_length == len( data ):
+                start = self._arena + offset % self.arena_size
+                if self._mm[start:start + key_length] == data:
+                    return index
+
+            if oldest is None or tick < oldest[1]:
+                oldest = ( index, tick )
+
+        return free if free is not None else oldest[0]
+
+    def get_or_load( self, key, loader, should_cache=None, timeout=None ):
+        """
+        Gets a cached value, or loads it once even if many threads of this process ask at the same time.
+
+        Args:
+            key: The cache key
+            loader: Function without arguments that produces the value
+            should_cache: Optional function deciding whether a loaded value is stored
+            timeout: Seconds to wait for a load another thread started, or None to wait until it ends
+
+        Returns:
+            The cached or freshly loaded value
+
+        Raises:
+            concurrent.futures.TimeoutError: If the other thread's load did not finish within timeout
+        """
+        value = self._lookup( key, fresh_only=True )
+        if value is not None:
+            self.hits += 1
+            return value
+
+        with self._lock:
+            future = self._inflight.get( key )
+
+            if future:
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = Future()
+                self._inflight[key] = future
+                owner = True
+
+        if not owner:
+            return future.result( timeout )
+
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception( e )
+            raise
+
+        if should_cache is None or should_cache( value ):
+            self.put( key, value )
+
+        with self._lock:
+            del self._inflight[key]
+        future.set_result( value )
+
+        return value
+
+    def clear( self ):
+        """
+        Removes all entries, for every process, by moving the arena head a full ring ahead.
+        """
+        with self._write_lock():
+            _U64.pack_into( self._mm, _HEAD_OFFSET, self._head() + self.arena_size )
+            with self._decoded_lock:
+                self._decoded.clear()
+
+    def __contains__( self, key ):
+        return self._find( *self._key_bytes( key ) ) is not None
+
+    def __len__( self ):
+        """
+        Number of valid entries (scans all slots).
+        """
+        head = self._head()
+        count = 0
+
+        for index in range( self.slots ):
+            _, _, slot_hash, offset, _, _, _ = _SLOT.unpack_from( self._mm, _HEADER_SIZE + index * _SLOT.size )
+            if slot_hash and offset + self.arena_size >= head:
+                count += 1
+
+        return count
+
+
+class _WriteLock:
+    """
+    Context manager holding a thread lock and, where available, an exclusive file lock.
+    """
+
+    __slots__ = ( 'lock', 'fd' )
+
+    def __init__( self, lock, fd ):
+        self.lock = lock
+        self.fd = fd
+
+    def __enter__( self ):
+        self.lock.acquire()
+        if fcntl:
+            fcntl.flock( self.fd, fcntl.LOCK_EX )
+
+    def __exit__( self, *exc_info ):
+        if fcntl:
+            fcntl.flock( self.fd, fcntl.LOCK_UN )
+        self.lock.release()
+        return False
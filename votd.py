@@ -0,0 +1,315 @@
+"""
+Verse of the day: posts a daily passage to the channels guilds subscribed.
+
+Each subscription has a channel, a local time (with a time zone) and an
+optional translation. Every VOTD_TICK seconds the subscriptions that came
+due since the last tick are grouped by (passage, translation, language);
+every group's passage is fetched once, through the passage cache, and its
+message is sent to all channels of the group in batches paced below
+Discord's global rate limit. Deliveries whose passage could not be loaded
+are retried on the next tick, and how late each message went out is
+exported as the delivery lag.
+"""
+
+import asyncio
+import datetime
+import json
+import os
+import time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from metrics import METRICS
+
+# Guild setting with a guild's subscription:
+# {'channel_id': ..., 'time': 'HH:MM', 'timezone': 'Europe/Berlin', 'translation': 'KJV' or None, 'language': 'en' or 'de'}
+VOTD_SETTING = 'votd'
+
+# Seconds between checks for subscriptions that came due
+VOTD_TICK = int( os.getenv( 'VOTD_TICK', '30' ) )
+
+# Messages sent per second and per batch; Discord allows a bot 50 requests per second in total,
+# so the rest is left for commands
+VOTD_SENDS_PER_SECOND = float( os.getenv( 'VOTD_SENDS_PER_SECOND', '30' ) )
+VOTD_BATCH_SIZE = int( os.getenv( 'VOTD_BATCH_SIZE', '10' ) )
+
+# Seconds after which a delivery is given up (e.g., after the bot was down for a long time)
+VOTD_MAX_LAG = int( os.getenv( 'VOTD_MAX_LAG', '3600' ) )
+
+# File remembering the last tick, so deliveries due during a restart are sent late instead of never
+VOTD_STATE_FILE = os.getenv( 'VOTD_STATE_FILE', 'votd_state.json' )
+
+# Passages in the order they are posted, one per day; the same for every guild on a date
+VOTD_PASSAGES = [
+    "John 3:16", "Jeremiah 29:11", "Philippians 4:13", "Romans 8:28", "Psalms 23:1-3", "Proverbs 3:5-6",
+    "Isaiah 40:31", "Joshua 1:9", "Matthew 11:28-30", "Romans 12:2", "Galatians 5:22-23", "Psalms 46:1",
+    "2 Timothy 1:7", "Hebrews 11:1", "1 Corinthians 13:4-7", "Matthew 6:33", "Psalms 119:105", "Isaiah 41:10",
+    "Romans 5:8", "Ephesians 2:8-9", "Philippians 4:6-7", "John 14:6", "Lamentations 3:22-23", "Micah 6:8",
+    "Psalms 27:1", "2 Corinthians 5:17", "1 John 4:19", "Matthew 5:14-16", "Colossians 3:23", "James 1:5",
+    "Psalms 37:4", "Deuteronomy 31:6", "1 Peter 5:7", "Hebrews 12:1-2", "Romans 15:13", "John 16:33",
+    "Psalms 34:8", "Zephaniah 3:17", "Isaiah 26:3", "Matthew 28:19-20", "Psalms 121:1-2", "John 15:5",
+    "2 Corinthians 12:9", "Romans 10:9", "Psalms 51:10", "Galatians 2:20", "1 Thessalonians 5:16-18",
+    "Numbers 6:24-26", "Ecclesiastes 3:1", "Revelation 21:4",
+]
+
+
+def passage_of_the_day( date ):
+    """
+    The passage posted on a date.
+
+    Args:
+        date: A datetime.date (the subscriber's local date)
+
+    Returns:
+        A reference string from VOTD_PASSAGES
+    """
+    return VOTD_PASSAGES[date.toordinal() % len( VOTD_PASSAGES )]
+
+
+def parse_time( text ):
+    """
+    Parses a time of day like "7:30" or "07:30".
+
+    Returns:
+        A datetime.time, or None if the text is not a valid time
+    """
+    hours, _, minutes = ( text or '' ).strip().partition( ':' )
+
+    if not hours.isdigit() or not minutes.isdigit() or not 0 <= int( hours ) <= 23 or not 0 <= int( minutes ) <= 59:
+        return None
+
+    return datetime.time( int( hours ), int( minutes ) )
+
+
+def get_zone( name ):
+    """
+    Looks up a time zone by its IANA name (e.g., "Europe/Berlin").
+
+    Returns:
+        A ZoneInfo, or None if the zone is unknown
+    """
+    try:
+        return ZoneInfo( name or 'UTC' )
+    except ( ZoneInfoNotFoundError, ValueError ):
+        return None
+
+
+def due_deliveries( subscriptions, start, end ):
+    """
+    Finds the subscriptions that came due in a period of time.
+
+    Subscriptions are grouped by time zone and time first, so the schedule
+    is worked out once per group however many guilds share it.
+
+    Args:
+        subscriptions: (guild_id, settings) pairs, settings as stored under VOTD_SETTING
+        start: Start of the period (Unix time, exclusive)
+        end: End of the period (Unix time, inclusive)
+
+    Returns:
+        A list of delivery dictionaries (guild_id, channel_id, reference, translation,
+        language, scheduled), earliest first
+    """
+    schedules = {}
+
+    for guild_id, settings in subscriptions:
+        key = ( settings.get( 'timezone' ) or 'UTC', settings['time'] )
+        schedules.setdefault( key, [] ).append( ( guild_id, settings ) )
+
+    deliveries = []
+
+    for ( zone_name, time_text ), members in schedules.items():
+        zone = get_zone( zone_name )
+        at = parse_time( time_text )
+
+        if zone is None or at is None:
+            continue
+
+        # The period can span two local dates
+        dates = {
+            datetime.datetime.fromtimestamp( start, zone ).date(),
+            datetime.datetime.fromtimestamp( end, zone ).date()
+        }
+
+        for date in sorted( dates ):
+            scheduled = datetime.datetime.combine( date, at, zone ).timestamp()
+            if not start < scheduled <= end:
+                continue
+
+            reference = passage_of_the_day( date )
+            deliveries.extend(
+                {
+                    'guild_id': guild_id,
+                    'channel_id': settings['channel_id'],
+                    'reference': reference,
+                    'translation': settings.get( 'translation' ),
+                    'language': settings.get( 'language', 'en' ),
+                    'scheduled': scheduled
+                }
+                for guild_id, settings in members
+            )
+
+    deliveries.sort( key=lambda delivery: delivery['scheduled'] )
+    return deliveries
+
+
+class VotdScheduler:
+    """
+    Delivers the verse of the day to all subscribed channels. Use from the event loop only.
+    """
+
+    def __init__( self, subscriptions, render, send, rate=VOTD_SENDS_PER_SECOND, batch_size=VOTD_BATCH_SIZE,
+                  max_lag=VOTD_MAX_LAG, state_file=VOTD_STATE_FILE, clock=time.time ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            subscriptions: Function returning the current (guild_id, settings) pairs
+            render: Coroutine function (reference, translation, language) returning the message
+                text, or None if the passage could not be loaded
+            send: Coroutine function (channel_id, content) returning True if the message was sent
+            rate: Most messages sent per second
+            batch_size: Messages sent at once
+            max_lag: Seconds after which an undelivered message is given up
+            state_file: File remembering the last tick, or None
+            clock: Function returning the current Unix time
+        """
+        self.subscriptions = subscriptions
+        self.render = render
+        self.send = send
+        self.rate = rate
+        self.batch_size = batch_size
+        self.max_lag = max_lag
+        self.state_file = state_file
+        self.clock = clock
+        self.last_tick = self._load_last_tick()
+
+        # Deliveries whose passage could not be loaded, retried on the next tick
+        self._pending = []
+
+    def _load_last_tick( self ):
+        """
+        The last tick saved by a previous run, if recent enough to catch up from; otherwise now.
+        """
+        now = self.clock()
+
+        if not self.state_file or not os.path.exists( self.state_file ):
+            return now
+
+        try:
+            with open( self.state_file, 'r', encoding='utf-8' ) as f:
+                last_tick = float( json.load( f )['last_tick'] )
+        except Exception as e:
+            print( f"Error loading verse of the day state: {e}" )
+            return now
+
+        return last_tick if now - self.max_lag <= last_tick <= now else now
+
+    def _save_last_tick( self ):
+        """
+        Writes the last tick to the state file atomically.
+        """
+        if not self.state_file:
+            return
+
+        try:
+            temp_path = f"{self.state_file}.tmp"
+            with open( temp_path, 'w', encoding='utf-8' ) as f:
+                json.dump( {'last_tick': self.last_tick}, f )
+            os.replace( temp_path, self.state_file )
+        except Exception as e:
+            print( f"Error saving verse of the day state: {e}" )
+
+    async def tick( self ):
+        """
+        Delivers everything that came due since the last tick, plus earlier retries.
+
+        Returns:
+            The number of messages sent
+        """
+        now = self.clock()
+        deliveries = self._pending + due_deliveries( self.subscriptions(), self.last_tick, now )
+        self._pending = []
+        self.last_tick = now
+        self._save_last_tick()
+
+        expired = [delivery for delivery in deliveries if now - delivery['scheduled'] > self.max_lag]
+        if expired:
+            METRICS.increment( 'votd.expired', len( expired ) )
+            deliveries = [delivery for delivery in deliveries if now - delivery['scheduled'] <= self.max_lag]
+
+        if not deliveries:
+            return 0
+
+        # One fetch per passage, translation and language, however many channels get it
+        groups = {}
+        for delivery in deliveries:
+            groups.setdefault( ( delivery['reference'], delivery['translation'], delivery['language'] ), [] ).append( delivery )
+
+        contents = await asyncio.gather( *( self.render( *key ) for key in groups ), return_exceptions=True )
+        METRICS.increment( 'votd.fetches', len( groups ) )
+
+        ready = []
+        for ( key, members ), content in zip( groups.items(), contents ):
+            if content is None or isinstance( content, Exception ):
+                if isinstance( content, Exception ):
+                    print( f"Error loading verse of the day {key[0]}: {content}" )
+                self._pending.extend( members )
+            else:
+                ready.extend( ( delivery, content ) for delivery in members )
+
+        ready.sort( key=lambda item: item[0]['scheduled'] )
+        return await self._fan_out( ready )
+
+    async def _fan_out( self, ready ):
+        """
+        Sends the messages in batches, pacing the batches to the configured rate.
+
+        Args:
+            ready: (delivery, content) pairs, earliest first
+
+        Returns:
+            The number of messages sent
+        """
+        start = time.monotonic()
+        sent = 0
+        lags = []
+
+        for offset in range( 0, len( ready ), self.batch_size ):
+            # Batch n may start n * batch_size / rate seconds after the first
+            wait = offset / self.rate - ( time.monotonic() - start )
+            if wait > 0:
+                await asyncio.sleep( wait )
+
+            batch = ready[offset:offset + self.batch_size]
+            results = await asyncio.gather(
+                *( self.send( delivery['channel_id'], content ) for delivery, content in batch ),
+                return_exceptions=True
+            )
+
+            now = self.clock()
+            for ( delivery, _ ), result in zip( batch, results ):
+                if result is True:
+                    sent += 1
+                    lags.append( now - delivery['scheduled'] )
+                else:
+                    METRICS.increment( 'votd.failed' )
+                    if isinstance( result, Exception ):
+                        print( f"Error sending verse of the day to channel {delivery['channel_id']}: {result}" )
+
+        METRICS.increment( 'votd.delivered', sent )
+        if lags:
+            METRICS.set( 'votd.lag_max', round( max( lags ), 3 ) )
+            METRICS.set( 'votd.lag_avg', round( sum( lags ) / len( lags ), 3 ) )
+
+        return sent
+
+    async def run( self, interval=VOTD_TICK ):
+        """
+        Ticks forever, every interval seconds.
+        """
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                print( f"Error delivering verse of the day: {e}" )
+
+            await asyncio.sleep( interval )
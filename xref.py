@@ -0,0 +1,372 @@
+"""
+Cross references between Bible passages.
+
+The data comes from a tab-separated file in the format of the public
+OpenBible.info cross reference dataset ("From Verse", "To Verse", "Votes",
+e.g. "Gen.1.1	Prov.8.22-Prov.8.30	59"). With several hundred thousand
+edges it is kept as compressed sparse rows over verse numbers instead of
+dictionaries of lists:
+
+    offsets     per verse, where its edges start (one more entry than verses)
+    starts      first verse of each edge's target passage
+    ends        last verse of each edge's target passage
+    votes       how useful readers found the edge
+
+The edges of a verse are offsets[n]:offsets[n + 1], sorted by votes, so a
+lookup only touches the verse's own edges. The arrays are saved next to the
+TSV file as a binary snapshot that later starts load without parsing.
+"""
+
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from canon import BOOK_ORDER, VERSE_COUNTS
+from reference_parser import parse_reference
+
+# Cross reference dataset (e.g., cross_references.txt from openbible.info)
+XREF_FILE = os.getenv( 'XREF_FILE', 'cross_references.txt' )
+
+# Binary snapshot of the dataset, rebuilt when the TSV file is newer
+XREF_SNAPSHOT = os.getenv( 'XREF_SNAPSHOT', f"{XREF_FILE}.bin" )
+
+# Most related passages shown for one reference
+XREF_MAX_RESULTS = int( os.getenv( 'XREF_MAX_RESULTS', '10' ) )
+
+_MAGIC = b'BBXREF01'
+_HEADER = struct.Struct( '<8sII' )
+
+# OSIS book abbreviations used by the dataset, in canonical order
+OSIS_BOOKS = dict( zip( [
+    'Gen', 'Exod', 'Lev', 'Num', 'Deut', 'Josh', 'Judg', 'Ruth', '1Sam', '2Sam', '1Kgs', '2Kgs', '1Chr', '2Chr',
+    'Ezra', 'Neh', 'Esth', 'Job', 'Ps', 'Prov', 'Eccl', 'Song', 'Isa', 'Jer', 'Lam', 'Ezek', 'Dan', 'Hos', 'Joel',
+    'Amos', 'Obad', 'Jonah', 'Mic', 'Nah', 'Hab', 'Zeph', 'Hag', 'Zech', 'Mal',
+    'Matt', 'Mark', 'Luke', 'John', 'Acts', 'Rom', '1Cor', '2Cor', 'Gal', 'Eph', 'Phil', 'Col', '1Thess', '2Thess',
+    '1Tim', '2Tim', 'Titus', 'Phlm', 'Heb', 'Jas', '1Pet', '2Pet', '1John', '2John', '3John', 'Jude', 'Rev',
+], BOOK_ORDER ) )
+
+
+def _chapter_table():
+    """
+    Number of the first verse of every chapter, in canonical order.
+
+    Returns:
+        A tuple (starts, chapters, total): the first verse numbers, the matching
+        (book, chapter) pairs, and the number of verses in the canon
+    """
+    starts = []
+    chapters = []
+    total = 0
+
+    for book in BOOK_ORDER:
+        for chapter, verses in enumerate( VERSE_COUNTS[book], 1 ):
+            starts.append( total )
+            chapters.append( ( book, chapter ) )
+            total += verses
+
+    return starts, chapters, total
+
+
+_CHAPTER_STARTS, _CHAPTERS, VERSE_TOTAL = _chapter_table()
+_FIRST_VERSE = dict( zip( _CHAPTERS, _CHAPTER_STARTS ) )
+
+
+def verse_number( book, chapter, verse ):
+    """
+    Position of a verse in the canon (0 = Genesis 1:1).
+
+    Returns:
+        The verse number, or None if the verse is not in the canon table
+    """
+    first = _FIRST_VERSE.get( ( book, chapter ) )
+
+    if first is None or not 1 <= verse <= VERSE_COUNTS[book][chapter - 1]:
+        return None
+
+    return first + verse - 1
+
+
+def verse_at( number ):
+    """
+    The (book, chapter, verse) at a position from verse_number().
+    """
+    index = bisect_right( _CHAPTER_STARTS, number ) - 1
+    book, chapter = _CHAPTERS[index]
+    return book, chapter, number - _CHAPTER_STARTS[index] + 1
+
+
+def _parse_osis( text ):
+    """
+    Verse number of an OSIS verse reference (e.g., "1Cor.13.4"), or None.
+    """
+    parts = text.split( '.' )
+
+    if len( parts ) != 3 or parts[0] not in OSIS_BOOKS or not parts[1].isdigit() or not parts[2].isdigit():
+        return None
+
+    return verse_number( OSIS_BOOKS[parts[0]], int( parts[1] ), int( parts[2] ) )
+
+
+def target_reference( start, end ):
+    """
+    Parsed reference for a target passage given by its first and last verse numbers.
+    """
+    book, chapter, verse = verse_at( start )
+    end_book, end_chapter, end_verse = verse_at( end )
+
+    if end <= start or end_book != book:
+        return parse_reference( f"{book} {chapter}:{verse}" )
+
+    if end_chapter == chapter:
+        return parse_reference( f"{book} {chapter}:{verse}-{end_verse}" )
+
+    return parse_reference( f"{book} {chapter}:{verse}-{end_chapter}:{end_verse}" )
+
+
+class CrossReferences:
+    """
+    Cross reference edges as compressed sparse rows over verse numbers.
+    """
+
+    def __init__( self, offsets, starts, ends, votes ):
+        """
+        Initialize from the row arrays (see the module description).
+        """
+        self.offsets = offsets
+        self.starts = starts
+        self.ends = ends
+        self.votes = votes
+
+    @classmethod
+    def from_tsv( cls, path ):
+        """
+        Parses a dataset file. Lines with verses missing from the canon table are skipped.
+
+        Args:
+            path: Path of the TSV file
+
+        Returns:
+            A CrossReferences instance
+        """
+        edges = []
+
+        with open( path, 'r', encoding='utf-8' ) as f:
+            for line in f:
+                fields = line.rstrip( '\n' ).split( '\t' )
+                if len( fields ) < 3 or line.startswith( ( 'From', '#' ) ):
+                    continue
+
+                target_start, _, target_end = fields[1].partition( '-' )
+                source = _parse_osis( fields[0] )
+                start = _parse_osis( target_start )
+                end = _parse_osis( target_end ) if target_end else start
+
+                try:
+                    votes = int( fields[2] )
+                except ValueError:
+                    continue
+
+                if source is None or start is None or end is None:
+                    continue
+
+                edges.append( ( source, -votes, start, max( start, end ) ) )
+
+        edges.sort()
+
+        offsets = array( 'I', [0] * ( VERSE_TOTAL + 1 ) )
+        for source, _, _, _ in edges:
+            offsets[source + 1] += 1
+        for number in range( VERSE_TOTAL ):
+            offsets[number + 1] += offsets[number]
+
+        return cls(
+            offsets,
+            array( 'I', ( edge[2] for edge in edges ) ),
+            array( 'I', ( edge[3] for edge in edges ) ),
+            array( 'i', ( -edge[1] for edge in edges ) )
+        )
+
+    def save( self, path ):
+        """
+        Writes the arrays to a binary snapshot atomically.
+        """
+        temp_path = f"{path}.tmp"
+
+        with open( temp_path, 'wb' ) as f:
+            f.write( _HEADER.pack( _MAGIC, len( self.offsets ) - 1, len( self.starts ) ) )
+            for values in ( self.offsets, self.starts, self.ends, self.votes ):
+                if sys.byteorder == 'big':
+                    values = array( values.typecode, values )
+                    values.byteswap()
+                values.tofile( f )
+
+        os.replace( temp_path, path )
+
+    @classmethod
+    def load( cls, path ):
+        """
+        Reads a binary snapshot written by save().
+
+        Raises:
+            ValueError: If the file is not a snapshot for this canon table
+        """
+        with open( path, 'rb' ) as f:
+            magic, verses, edges = _HEADER.unpack( f.read( _HEADER.size ) )
+
+            if magic != _MAGIC or verses != VERSE_TOTAL:
+                raise ValueError( f"{path} is not a cross reference snapshot" )
+
+            arrays = []
+            for typecode, count in ( ( 'I', verses + 1 ), ( 'I', edges ), ( 'I', edges ), ( 'i', edges ) ):
+                values = array( typecode )
+                values.fromfile( f, count )
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                arrays.append( values )
+
+        return cls( *arrays )
+
+    def edges( self, number ):
+        """
+        Related passages of one verse, most votes first.
+
+        Args:
+            number: The verse number from verse_number()
+
+        Returns:
+            A list of (first verse, last verse, votes) tuples
+        """
+        low, high = self.offsets[number], self.offsets[number + 1]
+        return list( zip( self.starts[low:high], self.ends[low:high], self.votes[low:high] ) )
+
+    def related( self, first, last=None, limit=XREF_MAX_RESULTS ):
+        """
+        Related passages of a verse or a range of verses, most votes first.
+
+        Targets found for several verses of the range count with their most
+        votes; targets inside the range itself are left out.
+
+        Args:
+            first: Number of the first verse
+            last: Number of the last verse, or None for a single verse
+            limit: Most passages returned
+
+        Returns:
+            A list of (first verse, last verse, votes) tuples
+        """
+        last = first if last is None else last
+        best = {}
+
+        for number in range( first, last + 1 ):
+            for start, end, votes in self.edges( number ):
+                if first <= start and end <= last:
+                    continue
+                if votes > best.get( ( start, end ), float( '-inf' ) ):
+                    best[( start, end )] = votes
+
+        ranked = sorted( best.items(), key=lambda item: ( -item[1], item[0] ) )
+        return [( start, end, votes ) for ( start, end ), votes in ranked[:limit]]
+
+    def __len__( self ):
+        return len( self.starts )
+
+
+def reference_range( ref ):
+    """
+    First and last verse numbers covered by a parsed reference.
+
+    Returns:
+        A list of (first, last) tuples, one per segment; empty if a verse is not in the canon table
+    """
+    ranges = []
+
+    for segment in ref.get( 'segments' ) or [ref]:
+        first = verse_number( segment['book'], segment['chapter'], segment['verse_start'] )
+        last = verse_number(
+            segment['book'],
+            segment.get( 'chapter_end' ) or segment['chapter'],
+            segment.get( 'verse_end' ) or segment['verse_start']
+        )
+
+        if first is None or last is None:
+            return []
+
+        ranges.append( ( first, last ) )
+
+    return ranges
+
+
+def related_references( xrefs, ref, limit=XREF_MAX_RESULTS ):
+    """
+    Related passages of a parsed reference, most votes first.
+
+    Args:
+        xrefs: The CrossReferences
+        ref: A reference dictionary from parse_reference()
+        limit: Most passages returned
+
+    Returns:
+        A list of (reference dictionary, votes) tuples
+    """
+    best = {}
+
+    for first, last in reference_range( ref ):
+        for start, end, votes in xrefs.related( first, last, limit=None ):
+            if votes > best.get( ( start, end ), float( '-inf' ) ):
+                best[( start, end )] = votes
+
+    ranked = sorted( best.items(), key=lambda item: ( -item[1], item[0] ) )[:limit]
+    return [( target_reference( start, end ), votes ) for ( start, end ), votes in ranked]
+
+
+def load_cross_references( path=XREF_FILE, snapshot=XREF_SNAPSHOT ):
+    """
+    Loads the dataset from its snapshot if it is up to date, otherwise parses
+    the TSV file and writes a new snapshot.
+
+    Returns:
+        A CrossReferences instance, or None if there is no dataset
+    """
+    start = time.perf_counter()
+    source_mtime = os.stat( path ).st_mtime if os.path.exists( path ) else None
+
+    if os.path.exists( snapshot ) and ( source_mtime is None or os.stat( snapshot ).st_mtime >= source_mtime ):
+        try:
+            xrefs = CrossReferences.load( snapshot )
+            print( f"Loaded {len( xrefs )} cross references in {( time.perf_counter() - start ) * 1000:.1f} ms (snapshot)" )
+            return xrefs
+        except ( OSError, EOFError, ValueError ) as e:
+            print( f"Error loading cross reference snapshot: {e}" )
+
+    if source_mtime is None:
+        return None
+
+    xrefs = CrossReferences.from_tsv( path )
+    print( f"Loaded {len( xrefs )} cross references in {( time.perf_counter() - start ) * 1000:.1f} ms (parsed)" )
+
+    try:
+        xrefs.save( snapshot )
+    except OSError as e:
+        print( f"Could not write cross reference snapshot: {e}" )
+
+    return xrefs
+
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def get_cross_references():
+    """
+    The cross references of this process, loaded on first use.
+
+    Returns:
+        A CrossReferences instance, or None if no dataset is installed
+    """
+    with _load_lock:
+        if 'xrefs' not in _loaded:
+            _loaded['xrefs'] = load_cross_references()
+        return _loaded['xrefs']